@@ -1,13 +1,20 @@
 """
 Analyzer - Analisa múltiplas moedas para identificar oportunidades de entrada
 """
-import ccxt
+import numpy as np
 import pandas as pd
 import ta
 import json
+import math
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
+import exchange_session
+import candle_buffer
+import indicator_engine
+
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
 
@@ -18,6 +25,11 @@ SUPPORTED_SYMBOLS = [
     "LINK/USDT", "UNI/USDT", "AAVE/USDT", "XRP/USDT", "DOGE/USDT"
 ]
 
+# --- Scanner concorrente ---
+MAX_WORKERS = 8          # Requisições simultâneas à Binance
+SYMBOL_TIMEOUT = 10      # Timeout por símbolo (s), incluindo a espera no rate limit
+SCAN_TIMEOUT = 30        # Tempo máximo da varredura completa (s); o que não terminar fica de fora
+
 def load_entry_filters():
     """Carrega filtros de entrada do bot_config.json"""
     try:
@@ -44,204 +56,409 @@ def calculate_indicators(df):
     """Calcula indicadores técnicos para análise"""
     if df.empty or len(df) < 50:
         return None
-    
+
+    close = df['close']
+    cols = {}
+
     # EMA 8 e 21
-    df['ema_8'] = df['close'].ewm(span=8, adjust=False).mean()
-    df['ema_21'] = df['close'].ewm(span=21, adjust=False).mean()
+    cols['ema_8'] = close.ewm(span=8, adjust=False).mean()
+    cols['ema_21'] = close.ewm(span=21, adjust=False).mean()
     
     # RSI
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], window=14).rsi()
+    cols['rsi'] = ta.momentum.RSIIndicator(close, window=14).rsi()
     
     # MACD
-    df['macd_fast'] = df['close'].ewm(span=12, adjust=False).mean()
-    df['macd_slow'] = df['close'].ewm(span=26, adjust=False).mean()
-    df['macd_line'] = df['macd_fast'] - df['macd_slow']
-    df['macd_signal'] = df['macd_line'].ewm(span=9, adjust=False).mean()
-    df['macd_hist'] = df['macd_line'] - df['macd_signal']
+    cols['macd_fast'] = close.ewm(span=12, adjust=False).mean()
+    cols['macd_slow'] = close.ewm(span=26, adjust=False).mean()
+    cols['macd_line'] = cols['macd_fast'] - cols['macd_slow']
+    cols['macd_signal'] = cols['macd_line'].ewm(span=9, adjust=False).mean()
+    cols['macd_hist'] = cols['macd_line'] - cols['macd_signal']
     
     # ADX
     try:
-        adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'], window=14)
-        df['adx'] = adx.adx()
-        df['plus_di'] = adx.adx_pos()
-        df['minus_di'] = adx.adx_neg()
+        adx = ta.trend.ADXIndicator(df['high'], df['low'], close, window=14)
+        cols['adx'] = adx.adx()
+        cols['plus_di'] = adx.adx_pos()
+        cols['minus_di'] = adx.adx_neg()
     except:
-        df['adx'] = 0
-        df['plus_di'] = 0
-        df['minus_di'] = 0
+        cols['adx'] = 0
+        cols['plus_di'] = 0
+        cols['minus_di'] = 0
     
     # Volume MA
-    df['vol_ma'] = df['volume'].rolling(window=20).mean()
+    cols['vol_ma'] = df['volume'].rolling(window=20).mean()
+
+    # Colunas montadas de uma vez (inserir uma a uma realoca o DataFrame a cada coluna)
+    return pd.concat([df, pd.DataFrame(cols, index=df.index)], axis=1)
+
+def calculate_indicators_batch(high, low, close, volume):
+    """
+    Mesmos indicadores de calculate_indicators para vários símbolos de uma vez:
+    matrizes (símbolos × candles), todas com a mesma quantidade de candles.
+    Retorna {coluna: matriz}.
+    """
+    cols = {}
+    cols['ema_8'] = indicator_engine.ema_batch(close, 8)
+    cols['ema_21'] = indicator_engine.ema_batch(close, 21)
+    cols['rsi'] = indicator_engine.rsi_batch(close, 14)
+    cols['macd_fast'] = indicator_engine.ema_batch(close, 12)
+    cols['macd_slow'] = indicator_engine.ema_batch(close, 26)
+    cols['macd_line'] = cols['macd_fast'] - cols['macd_slow']
+    cols['macd_signal'] = indicator_engine.ema_batch(cols['macd_line'], 9)
+    cols['macd_hist'] = cols['macd_line'] - cols['macd_signal']
+    cols['adx'], cols['plus_di'], cols['minus_di'] = indicator_engine.adx_batch(high, low, close, 14)
+    cols['vol_ma'] = indicator_engine.rolling_mean_batch(volume, 20)
+    cols['close'] = close
+    cols['volume'] = volume
+    return cols
+
+def evaluate_filters(last, prev, filters):
+    """
+    Crossover/crossunder e filtros de entrada do último candle. `last` e `prev` trazem
+    escalares (um símbolo) ou arrays (um valor por símbolo, varredura em lote).
+    """
+    vol_ok = np.logical_or(not filters['USE_VOL'], last['volume'] > last['vol_ma'] * 1.15)
+    adx_ok = np.logical_or(not filters['USE_ADX'], last['adx'] > filters['ADX_THRESH'])
+    return {
+        'crossover': (prev['ema_8'] <= prev['ema_21']) & (last['ema_8'] > last['ema_21']),
+        'crossunder': (prev['ema_8'] >= prev['ema_21']) & (last['ema_8'] < last['ema_21']),
+        'long': {
+            'rsi': last['rsi'] > filters['RSI_LONG'],
+            'vol': vol_ok,
+            'adx': adx_ok,
+            'trend': last['close'] > last['ema_21'],
+        },
+        'short': {
+            'rsi': last['rsi'] < filters['RSI_SHORT'],
+            'vol': vol_ok,
+            'adx': adx_ok,
+            'trend': last['close'] < last['ema_21'],
+        },
+    }
+
+def _signal_result(symbol, last, checks, filters):
+    """Monta o resultado (sinal, motivos, bloqueios, score) a partir dos filtros avaliados"""
+    crossover = bool(checks['crossover'])
+    crossunder = bool(checks['crossunder'])
+
+    # Não há sinal se não houve crossover/crossunder
+    if not (crossover or crossunder):
+        return None
+    
+    # Filtros para LONG
+    long_signal = False
+    long_reasons = []
+    long_blocked_by = []
+    
+    if crossover:
+        rsi_ok, vol_ok, adx_ok, trend_ok = (bool(checks['long'][k]) for k in ('rsi', 'vol', 'adx', 'trend'))
+        
+        if rsi_ok and vol_ok and adx_ok and trend_ok:
+            long_signal = True
+            long_reasons = [
+                f"RSI {last['rsi']:.1f} > {filters['RSI_LONG']}",
+                f"Volume {last['volume']:.0f} > {last['vol_ma']:.0f}×1.15" if filters['USE_VOL'] else "Volume: OK",
+                f"ADX {last['adx']:.1f} > {filters['ADX_THRESH']}" if filters['USE_ADX'] else "ADX: OK",
+                f"Preço {last['close']:.4f} > EMA21 {last['ema_21']:.4f}"
+            ]
+        else:
+            if not rsi_ok:
+                long_blocked_by.append(f"RSI {last['rsi']:.1f} precisa ser > {filters['RSI_LONG']}")
+            if not vol_ok:
+                long_blocked_by.append("Volume precisa estar 15% acima da média")
+            if not adx_ok:
+                long_blocked_by.append(f"ADX {last['adx']:.1f} precisa ser > {filters['ADX_THRESH']}")
+            if not trend_ok:
+                long_blocked_by.append(f"Preço {last['close']:.4f} precisa estar acima da EMA21 {last['ema_21']:.4f}")
+    
+    # Filtros para SHORT
+    short_signal = False
+    short_reasons = []
+    short_blocked_by = []
+    
+    if crossunder:
+        rsi_ok, vol_ok, adx_ok, trend_ok = (bool(checks['short'][k]) for k in ('rsi', 'vol', 'adx', 'trend'))
+        
+        if rsi_ok and vol_ok and adx_ok and trend_ok:
+            short_signal = True
+            short_reasons = [
+                f"RSI {last['rsi']:.1f} < {filters['RSI_SHORT']}",
+                f"Volume {last['volume']:.0f} > {last['vol_ma']:.0f}×1.15" if filters['USE_VOL'] else "Volume: OK",
+                f"ADX {last['adx']:.1f} > {filters['ADX_THRESH']}" if filters['USE_ADX'] else "ADX: OK",
+                f"Preço {last['close']:.4f} < EMA21 {last['ema_21']:.4f}"
+            ]
+        else:
+            if not rsi_ok:
+                short_blocked_by.append(f"RSI {last['rsi']:.1f} precisa ser < {filters['RSI_SHORT']}")
+            if not vol_ok:
+                short_blocked_by.append("Volume precisa estar 15% acima da média")
+            if not adx_ok:
+                short_blocked_by.append(f"ADX {last['adx']:.1f} precisa ser > {filters['ADX_THRESH']}")
+            if not trend_ok:
+                short_blocked_by.append(f"Preço {last['close']:.4f} precisa estar abaixo da EMA21 {last['ema_21']:.4f}")
+    
+    # Retorna resultado se houver sinal ou se estiver próximo
+    signal_type = None
+    proximity_score = 0
+    reasons = []
+    blocked_by = []
+    
+    if long_signal:
+        signal_type = "LONG"
+        reasons = long_reasons
+        proximity_score = 100
+    elif short_signal:
+        signal_type = "SHORT"
+        reasons = short_reasons
+        proximity_score = 100
+    elif crossover and long_blocked_by:
+        # Próximo de LONG mas bloqueado
+        signal_type = "LONG (PRÓXIMO)"
+        blocked_by = long_blocked_by
+        # Calcula score de proximidade (quantos filtros passaram)
+        passed_filters = 4 - len(long_blocked_by)
+        proximity_score = (passed_filters / 4) * 100
+    elif crossunder and short_blocked_by:
+        # Próximo de SHORT mas bloqueado
+        signal_type = "SHORT (PRÓXIMO)"
+        blocked_by = short_blocked_by
+        passed_filters = 4 - len(short_blocked_by)
+        proximity_score = (passed_filters / 4) * 100
     
-    return df
+    if signal_type:
+        return {
+            'symbol': symbol,
+            'signal': signal_type,
+            'price': float(last['close']),
+            'rsi': float(last['rsi']),
+            'adx': float(last['adx']),
+            'volume': float(last['volume']),
+            'vol_ma': float(last['vol_ma']),
+            'ema_8': float(last['ema_8']),
+            'ema_21': float(last['ema_21']),
+            'proximity_score': round(proximity_score, 1),
+            'reasons': reasons,
+            'blocked_by': blocked_by,
+            'macd_hist': float(last['macd_hist']) if 'macd_hist' in last else 0,
+        }
+    
+    return None
+
+def analyze_frame(symbol, df, filters):
+    """Sinal de entrada de um símbolo a partir do DataFrame OHLCV (caminho por símbolo)"""
+    df = calculate_indicators(df)
+    if df is None:
+        return None
+    
+    last = df.iloc[-1]
+    prev = df.iloc[-2] if len(df) > 1 else last
+    return _signal_result(symbol, last, evaluate_filters(last, prev, filters), filters)
 
 def analyze_symbol(exchange, symbol, timeframe, filters):
     """Analisa um símbolo específico e retorna sinal de entrada se houver"""
     try:
         # Busca dados OHLCV
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=100)
+        df = candle_buffer.fetch_frame(exchange, symbol, timeframe, limit=100)
         
-        if not ohlcv or len(ohlcv) < 50:
+        if df is None or len(df) < 50:
             return None
         
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df.set_index('timestamp', inplace=True)
-        
-        # Calcula indicadores
-        df = calculate_indicators(df)
-        if df is None:
-            return None
-        
-        last = df.iloc[-1]
-        prev = df.iloc[-2] if len(df) > 1 else last
-        
-        # Verifica crossover/crossunder
-        crossover = prev['ema_8'] <= prev['ema_21'] and last['ema_8'] > last['ema_21']
-        crossunder = prev['ema_8'] >= prev['ema_21'] and last['ema_8'] < last['ema_21']
-        
-        # Não há sinal se não houve crossover/crossunder
-        if not (crossover or crossunder):
-            return None
-        
-        # Filtros para LONG
-        long_signal = False
-        long_reasons = []
-        long_blocked_by = []
-        
-        if crossover:
-            rsi_ok = last['rsi'] > filters['RSI_LONG']
-            vol_ok = not filters['USE_VOL'] or (last['volume'] > last['vol_ma'] * 1.15)
-            adx_ok = not filters['USE_ADX'] or (last['adx'] > filters['ADX_THRESH'])
-            trend_ok = last['close'] > last['ema_21']
-            
-            if rsi_ok and vol_ok and adx_ok and trend_ok:
-                long_signal = True
-                long_reasons = [
-                    f"RSI {last['rsi']:.1f} > {filters['RSI_LONG']}",
-                    f"Volume {last['volume']:.0f} > {last['vol_ma']:.0f}×1.15" if filters['USE_VOL'] else "Volume: OK",
-                    f"ADX {last['adx']:.1f} > {filters['ADX_THRESH']}" if filters['USE_ADX'] else "ADX: OK",
-                    f"Preço {last['close']:.4f} > EMA21 {last['ema_21']:.4f}"
-                ]
-            else:
-                if not rsi_ok:
-                    long_blocked_by.append(f"RSI {last['rsi']:.1f} precisa ser > {filters['RSI_LONG']}")
-                if not vol_ok:
-                    long_blocked_by.append("Volume precisa estar 15% acima da média")
-                if not adx_ok:
-                    long_blocked_by.append(f"ADX {last['adx']:.1f} precisa ser > {filters['ADX_THRESH']}")
-                if not trend_ok:
-                    long_blocked_by.append(f"Preço {last['close']:.4f} precisa estar acima da EMA21 {last['ema_21']:.4f}")
-        
-        # Filtros para SHORT
-        short_signal = False
-        short_reasons = []
-        short_blocked_by = []
-        
-        if crossunder:
-            rsi_ok = last['rsi'] < filters['RSI_SHORT']
-            vol_ok = not filters['USE_VOL'] or (last['volume'] > last['vol_ma'] * 1.15)
-            adx_ok = not filters['USE_ADX'] or (last['adx'] > filters['ADX_THRESH'])
-            trend_ok = last['close'] < last['ema_21']
-            
-            if rsi_ok and vol_ok and adx_ok and trend_ok:
-                short_signal = True
-                short_reasons = [
-                    f"RSI {last['rsi']:.1f} < {filters['RSI_SHORT']}",
-                    f"Volume {last['volume']:.0f} > {last['vol_ma']:.0f}×1.15" if filters['USE_VOL'] else "Volume: OK",
-                    f"ADX {last['adx']:.1f} > {filters['ADX_THRESH']}" if filters['USE_ADX'] else "ADX: OK",
-                    f"Preço {last['close']:.4f} < EMA21 {last['ema_21']:.4f}"
-                ]
-            else:
-                if not rsi_ok:
-                    short_blocked_by.append(f"RSI {last['rsi']:.1f} precisa ser < {filters['RSI_SHORT']}")
-                if not vol_ok:
-                    short_blocked_by.append("Volume precisa estar 15% acima da média")
-                if not adx_ok:
-                    short_blocked_by.append(f"ADX {last['adx']:.1f} precisa ser > {filters['ADX_THRESH']}")
-                if not trend_ok:
-                    short_blocked_by.append(f"Preço {last['close']:.4f} precisa estar abaixo da EMA21 {last['ema_21']:.4f}")
-        
-        # Retorna resultado se houver sinal ou se estiver próximo
-        signal_type = None
-        proximity_score = 0
-        reasons = []
-        blocked_by = []
-        
-        if long_signal:
-            signal_type = "LONG"
-            reasons = long_reasons
-            proximity_score = 100
-        elif short_signal:
-            signal_type = "SHORT"
-            reasons = short_reasons
-            proximity_score = 100
-        elif crossover and long_blocked_by:
-            # Próximo de LONG mas bloqueado
-            signal_type = "LONG (PRÓXIMO)"
-            blocked_by = long_blocked_by
-            # Calcula score de proximidade (quantos filtros passaram)
-            passed_filters = 4 - len(long_blocked_by)
-            proximity_score = (passed_filters / 4) * 100
-        elif crossunder and short_blocked_by:
-            # Próximo de SHORT mas bloqueado
-            signal_type = "SHORT (PRÓXIMO)"
-            blocked_by = short_blocked_by
-            passed_filters = 4 - len(short_blocked_by)
-            proximity_score = (passed_filters / 4) * 100
-        
-        if signal_type:
-            return {
-                'symbol': symbol,
-                'signal': signal_type,
-                'price': float(last['close']),
-                'rsi': float(last['rsi']),
-                'adx': float(last['adx']),
-                'volume': float(last['volume']),
-                'vol_ma': float(last['vol_ma']),
-                'ema_8': float(last['ema_8']),
-                'ema_21': float(last['ema_21']),
-                'proximity_score': round(proximity_score, 1),
-                'reasons': reasons,
-                'blocked_by': blocked_by,
-                'macd_hist': float(last['macd_hist']) if 'macd_hist' in last else 0,
-            }
-        
-        return None
+        return analyze_frame(symbol, df, filters)
         
     except Exception as e:
         log.error(f"Erro ao analisar {symbol}: {e}")
         return None
 
-def analyze_all_symbols(timeframe):
-    """Analisa todos os símbolos suportados no timeframe especificado"""
-    try:
-        exchange = ccxt.binance({
-            'enableRateLimit': True,
-            'options': {'defaultType': 'future'},
-            'timeout': 15000,
-        })
-        exchange.load_markets()
-        
-        filters = load_entry_filters()
-        
-        results = []
-        
-        for symbol in SUPPORTED_SYMBOLS:
+def analyze_blocks(blocks, filters):
+    """
+    Varredura em lote: {símbolo: matriz OHLCV (candle_buffer.block)} -> lista de sinais.
+    Símbolos com a mesma quantidade de candles são empilhados e calculados juntos;
+    só os que cruzaram as EMAs viram resultado (mensagens montadas por símbolo).
+    """
+    groups = {}
+    for symbol, block in blocks.items():
+        if block is not None and block.shape[1] >= 50:
+            groups.setdefault(block.shape[1], []).append(symbol)
+
+    results = []
+    for group in groups.values():
+        stacked = np.stack([blocks[symbol] for symbol in group])  # símbolos × colunas × candles
+        _, high, low, close, volume = (stacked[:, i] for i in range(len(candle_buffer.COLUMNS)))
+        cols = calculate_indicators_batch(high, low, close, volume)
+        last = {name: values[:, -1] for name, values in cols.items()}
+        prev = {name: values[:, -2] for name, values in cols.items()}
+        checks = evaluate_filters(last, prev, filters)
+
+        for i in np.flatnonzero(checks['crossover'] | checks['crossunder']):
             try:
-                result = analyze_symbol(exchange, symbol, timeframe, filters)
+                row = {name: values[i] for name, values in last.items()}
+                row_checks = {
+                    'crossover': checks['crossover'][i],
+                    'crossunder': checks['crossunder'][i],
+                    'long': {name: np.broadcast_to(ok, close.shape[:1])[i] for name, ok in checks['long'].items()},
+                    'short': {name: np.broadcast_to(ok, close.shape[:1])[i] for name, ok in checks['short'].items()},
+                }
+                result = _signal_result(group[i], row, row_checks, filters)
                 if result:
                     results.append(result)
             except Exception as e:
-                log.warning(f"Erro ao processar {symbol}: {e}")
-                continue
-        
+                log.error(f"Erro ao analisar {group[i]}: {e}")
+    return results
+
+def get_usdt_perpetuals(exchange):
+    """Lista os contratos perpétuos USDT ativos (para varrer o mercado inteiro)"""
+    symbols = []
+    for market in exchange.markets.values():
+        if market.get('swap') and market.get('linear') and market.get('quote') == 'USDT' and market.get('active', True):
+            # Usa o formato 'BTC/USDT' (igual ao SUPPORTED_SYMBOLS)
+            symbols.append(f"{market['base']}/{market['quote']}")
+    return sorted(set(symbols))
+
+def analyze_all_symbols(timeframe, symbols=None):
+    """
+    Analisa os símbolos (padrão: SUPPORTED_SYMBOLS) no timeframe especificado.
+
+    As buscas rodam em paralelo num pool limitado de threads, com rate limit
+    compartilhado. Símbolos que estouram o timeout ficam de fora (resultado parcial).
+    Retorna (resultados, estatísticas da varredura): cada requisição recebe as suas.
+    """
+    started = time.monotonic()
+    stats = {'scanned': 0, 'total': 0, 'timed_out': 0, 'errors': 0, 'elapsed': 0.0}
+    try:
+        # Cliente compartilhado: markets em cache e rate limit thread-safe
+        exchange = exchange_session.get_exchange()
+
+        if symbols is None:
+            symbols = SUPPORTED_SYMBOLS
+        elif symbols == 'all':
+            symbols = get_usdt_perpetuals(exchange)
+
+        filters = load_entry_filters()
+        scan_deadline = started + SCAN_TIMEOUT
+
+        def task(symbol):
+            remaining = min(SYMBOL_TIMEOUT, scan_deadline - time.monotonic())
+            with exchange_session.deadline(max(0, remaining)):
+                try:
+                    return candle_buffer.fetch_block(exchange, symbol, timeframe, limit=100)
+                except Exception as e:
+                    log.error(f"Erro ao analisar {symbol}: {e}")
+                    return None
+
+        # Threads só para as buscas (I/O); indicadores e filtros de todos os símbolos
+        # são calculados juntos em analyze_blocks
+        blocks = {}
+        errors = 0
+        executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+        try:
+            futures = {executor.submit(task, symbol): symbol for symbol in symbols}
+            done, not_done = wait(futures, timeout=max(0, scan_deadline - time.monotonic()))
+
+            for future in done:
+                try:
+                    block = future.result()
+                except Exception as e:
+                    block = None
+                    log.warning(f"Erro ao processar {futures[future]}: {e}")
+                # task() já registra a falha e devolve None: conta como erro
+                if block is None:
+                    errors += 1
+                blocks[futures[future]] = block
+
+            for future in not_done:
+                future.cancel()
+            if not_done:
+                log.warning(f"Varredura parcial: {len(not_done)} símbolos não terminaram em {SCAN_TIMEOUT}s")
+        finally:
+            executor.shutdown(wait=False)
+
+        results = analyze_blocks(blocks, filters)
+
         # Ordena por score de proximidade (maior primeiro)
         results.sort(key=lambda x: x['proximity_score'], reverse=True)
-        
-        return results
-        
+
+        stats.update({
+            'scanned': len(done),
+            'total': len(symbols),
+            'timed_out': len(not_done),
+            'errors': errors,
+            'elapsed': round(time.monotonic() - started, 2),
+        })
+        return results, stats
+
     except Exception as e:
         log.error(f"Erro na análise geral: {e}")
-        return []
+        stats.update({'error': str(e), 'elapsed': round(time.monotonic() - started, 2)})
+        return [], stats
+
+def _synthetic_blocks(symbols, seed=11):
+    """Candles sintéticos (random walk) por símbolo, com quantidades variadas de candles"""
+    rng = np.random.default_rng(seed)
+    blocks = {}
+    for i in range(symbols):
+        n = 100 if i % 4 else int(rng.integers(50, 100))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+        open_ = np.concatenate(([close[0]], close[:-1]))
+        high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n))
+        low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n))
+        volume = rng.uniform(50, 500, n)
+        blocks[f"S{i}/USDT"] = np.vstack([open_, high, low, close, volume])
+    return blocks
+
+def _same_result(a, b):
+    if a.keys() != b.keys():
+        return False
+    for key, value in a.items():
+        if isinstance(value, float):
+            if not math.isclose(value, b[key], rel_tol=1e-9, abs_tol=1e-9):
+                return False
+        elif value != b[key]:
+            return False
+    return True
+
+def check_batch(symbols=2000):
+    """
+    Compara analyze_blocks com o caminho por símbolo (analyze_frame) em candles sintéticos,
+    com os filtros padrão e com volume/ADX desligados. Retorna [(sinais, s por símbolo, s em lote)].
+    """
+    blocks = _synthetic_blocks(symbols)
+    frames = {symbol: pd.DataFrame(block.T, columns=list(candle_buffer.COLUMNS),
+                                   index=pd.date_range('2025-01-01', periods=block.shape[1], freq='5min'))
+              for symbol, block in blocks.items()}
+    variants = [
+        {'RSI_LONG': 60, 'RSI_SHORT': 35, 'USE_VOL': True, 'USE_ADX': True, 'ADX_THRESH': 20},
+        {'RSI_LONG': 50, 'RSI_SHORT': 50, 'USE_VOL': False, 'USE_ADX': False, 'ADX_THRESH': 20},
+    ]
+    report = []
+    for filters in variants:
+        started = time.perf_counter()
+        expected = [r for r in (analyze_frame(symbol, df, filters) for symbol, df in frames.items()) if r]
+        per_symbol = time.perf_counter() - started
+
+        started = time.perf_counter()
+        got = analyze_blocks(blocks, filters)
+        batched = time.perf_counter() - started
+
+        expected = {r['symbol']: r for r in expected}
+        got = {r['symbol']: r for r in got}
+        if expected.keys() != got.keys():
+            raise AssertionError(f"Sinais diferentes: {sorted(expected.keys() ^ got.keys())[:10]}")
+        for symbol, result in expected.items():
+            if not _same_result(result, got[symbol]):
+                raise AssertionError(f"Resultado diferente em {symbol}:\n{result}\n{got[symbol]}")
+        report.append((len(got), per_symbol, batched))
+    return report
+
 
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Analyzer de oportunidades')
+    parser.add_argument('--check', action='store_true', help='compara a varredura em lote com o caminho por símbolo')
+    parser.add_argument('--symbols', type=int, default=2000, help='símbolos sintéticos no --check')
+    args = parser.parse_args()
+    if not args.check:
+        parser.print_help()
+    else:
+        for signals, per_symbol, batched in check_batch(args.symbols):
+            print(f"✅ {args.symbols} símbolos, {signals} sinais iguais | por símbolo: {per_symbol * 1000:.0f}ms | "
+                  f"em lote: {batched * 1000:.0f}ms")
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+backtest.py - Backtest das regras do Da Vinci Bot sobre candles históricos
+
+Reproduz as regras de entrada de davinci_bot.generate_signal e de saída de
+davinci_bot.check_exit_conditions:
+  - indicadores calculados uma vez sobre a série inteira (indicator_engine, ADX vetorizado)
+  - sinais de entrada e componentes de saída que não dependem da posição: NumPy vetorizado
+  - cooldown, stop, take profit, trailing (pico/fundo desde a entrada) e saídas por
+    tempo/volume: simulação candle a candle, só enquanto há posição aberta
+
+Cada candle é avaliado uma vez, no fechamento (o bot ao vivo avalia o candle em formação
+a cada tick; no histórico só existe o candle fechado). Entrada e saída no preço de fechamento.
+
+Uso:
+    python backtest.py candles.csv                       # config do bot_config.json
+    python backtest.py candles.parquet --set RSI_LONG=60 --set TRAILING_STOP=0.01
+    python backtest.py --synthetic 525600 --timeframe 1m # um ano de candles de 1m sintéticos
+    python backtest.py --check                           # compara com davinci_bot candle a candle
+
+CSV/Parquet com colunas timestamp (ms ou data), open, high, low, close, volume.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import indicator_engine
+
+# Mesmos padrões de davinci_bot.reload_config
+DEFAULT_CONFIG = {
+    'POSITION_SIZE_USD': 50,
+    'LEVERAGE': 10,
+    'DEMO_BALANCE': 1000.0,
+    'RSI_LONG': 55,
+    'RSI_SHORT': 40,
+    'USE_VOL': False,
+    'USE_ADX': True,
+    'ADX_THRESH': 18,
+    'SIGNAL_COOLDOWN': 300,
+    'STOP_LOSS': 0.008,
+    'TAKE_PROFIT': 0.018,
+    'TRAILING_STOP': 0.005,
+    'USE_FIXED_EXIT': True,
+    'USE_TRAILING': True,
+    'EXIT_RSI_LONG': 70,
+    'EXIT_RSI_SHORT': 30,
+    'USE_EXIT_RSI': False,
+    'EXIT_ADX_THRESHOLD': 25,
+    'USE_EXIT_ADX': False,
+    'EXIT_AFTER_MINUTES': 60,
+    'USE_TIME_EXIT': False,
+    'EXIT_ON_VOLUME_SPIKE': True,
+    'EXIT_VOLUME_MULTIPLIER': 2.0,
+}
+
+MIN_CANDLES = 50  # generate_signal exige pelo menos 50 candles
+
+
+def load_config(path='bot_config.json', overrides=None):
+    """Config do bot (se existir) sobre os padrões, mais overrides"""
+    config = dict(DEFAULT_CONFIG)
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    if overrides:
+        config.update(overrides)
+    return config
+
+
+def load_candles(path):
+    """Lê candles de CSV ou Parquet no formato de davinci_bot.fetch_ohlcv"""
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df.columns = [c.lower() for c in df.columns]
+    if 'timestamp' in df.columns:
+        if pd.api.types.is_numeric_dtype(df['timestamp']):
+            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        else:
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df = df.set_index('timestamp')
+    df = df[['open', 'high', 'low', 'close', 'volume']].astype(float)
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+def prepare(df, params=None):
+    """Calcula os indicadores do bot sobre a série inteira"""
+    return indicator_engine.calculate_indicators_full(df.copy(), params, vectorized_adx=True)
+
+
+def entry_signals(df, config):
+    """
+    Regras de generate_signal (sem o cooldown) para todos os candles de uma vez.
+    Retorna (long, short) como arrays booleanos.
+    """
+    ema_s = df['ema_short'].to_numpy()
+    ema_m = df['ema_mid'].to_numpy()
+    close = df['close'].to_numpy()
+    rsi = df['rsi'].to_numpy()
+    prev_s = np.concatenate(([np.nan], ema_s[:-1]))
+    prev_m = np.concatenate(([np.nan], ema_m[:-1]))
+
+    crossover = (prev_s <= prev_m) & (ema_s > ema_m)
+    crossunder = (prev_s >= prev_m) & (ema_s < ema_m)
+    vol_ok = df['high_vol'].to_numpy(dtype=bool) if config['USE_VOL'] else True
+    adx_ok = df['adx'].to_numpy() > config['ADX_THRESH'] if config['USE_ADX'] else True
+
+    long_signal = crossover & vol_ok & adx_ok & (close > ema_m) & (rsi > config['RSI_LONG'])
+    short_signal = crossunder & vol_ok & adx_ok & (close < ema_m) & (rsi < config['RSI_SHORT'])
+    long_signal[:MIN_CANDLES - 1] = False
+    short_signal[:MIN_CANDLES - 1] = False
+    return long_signal, short_signal
+
+
+def apply_cooldown(signal_idx, seconds, cooldown):
+    """Sinais aceitos: ignora os que chegam antes de `cooldown` segundos do último aceito"""
+    accepted = []
+    last = None
+    for i in signal_idx:
+        if last is not None and seconds[i] - last < cooldown:
+            continue
+        accepted.append(i)
+        last = seconds[i]
+    return np.array(accepted, dtype=np.int64)
+
+
+def simulate(df, config, fee=0.0):
+    """
+    Simula entradas/saídas com as regras do bot. `df` já com indicadores (prepare).
+    fee: taxa por lado sobre o notional (0.0004 = 0,04% taker); o bot não desconta taxas.
+    Retorna a lista de trades.
+    """
+    long_sig, short_sig = entry_signals(df, config)
+    seconds = (df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+    seconds = np.asarray(seconds, dtype=np.int64)
+    signals = apply_cooldown(np.flatnonzero(long_sig | short_sig), seconds, config['SIGNAL_COOLDOWN'])
+
+    close = df['close'].to_numpy()
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+
+    # Componentes de saída que não dependem da posição
+    ema_below = (df['ema_short'] < df['ema_mid']).to_numpy()
+    ema_above = (df['ema_short'] > df['ema_mid']).to_numpy()
+    macd_hist = df['macd_hist'].to_numpy()
+    rsi = df['rsi'].to_numpy()
+    adx = df['adx'].to_numpy()
+    rsi_exit_long = (rsi >= config['EXIT_RSI_LONG']) if config['USE_EXIT_RSI'] else np.zeros(len(df), bool)
+    rsi_exit_short = (rsi <= config['EXIT_RSI_SHORT']) if config['USE_EXIT_RSI'] else np.zeros(len(df), bool)
+    adx_exit = (adx < config['EXIT_ADX_THRESHOLD']) if config['USE_EXIT_ADX'] else np.zeros(len(df), bool)
+    volume = df['volume'].to_numpy()
+    vol_ma = df['vol_ma'].to_numpy()
+    with np.errstate(invalid='ignore'):
+        vol_spike = volume > vol_ma * config['EXIT_VOLUME_MULTIPLIER'] if config['EXIT_ON_VOLUME_SPIKE'] \
+            else np.zeros(len(df), bool)
+
+    stop_loss = config['STOP_LOSS']
+    take_profit = config['TAKE_PROFIT']
+    trail = config['TRAILING_STOP']            # TRAIL_OFFSET no bot
+    macd_threshold = config['TRAILING_STOP'] * 2
+    use_fixed = config['USE_FIXED_EXIT']
+    use_trailing = config['USE_TRAILING']
+    use_time = config['USE_TIME_EXIT']
+    max_minutes = config['EXIT_AFTER_MINUTES']
+    notional = config['POSITION_SIZE_USD'] * config['LEVERAGE']
+
+    trades = []
+    n = len(df)
+    position = 0
+    while position < len(signals):
+        i = int(signals[position])
+        side = 'long' if long_sig[i] else 'short'
+        entry = close[i]
+        entry_sec = seconds[i]
+        peak = trough = entry
+        exit_idx = None
+        reasons = []
+
+        # Mesma ordem do process_tick: entra e já verifica saída no mesmo candle
+        for j in range(i, n):
+            price = close[j]
+            minutes = (seconds[j] - entry_sec) / 60
+            reasons = []
+            if side == 'long':
+                peak = max(peak, high[j])
+                if use_fixed:
+                    if price <= entry * (1 - stop_loss):
+                        reasons.append('Stop Loss')
+                    if price >= entry * (1 + take_profit):
+                        reasons.append('Take Profit')
+                if use_trailing and price <= peak * (1 - trail):
+                    reasons.append('Trailing Stop')
+                if ema_below[j] and price >= entry * 1.01:
+                    reasons.append('EMA Crossunder')
+                if macd_hist[j] < 0 and (price < peak * (1 - macd_threshold) or price < entry * 0.995):
+                    reasons.append('MACD Negativo')
+                if rsi_exit_long[j]:
+                    reasons.append('RSI Sobrecompra')
+                volume_reason = bool(vol_spike[j] and (price >= entry * 1.005 or minutes >= 5))
+            else:
+                trough = min(trough, low[j])
+                if use_fixed:
+                    if price >= entry * (1 + stop_loss):
+                        reasons.append('Stop Loss')
+                    if price <= entry * (1 - take_profit):
+                        reasons.append('Take Profit')
+                if use_trailing and price >= trough * (1 + trail):
+                    reasons.append('Trailing Stop')
+                if ema_above[j] and price <= entry * 0.99:
+                    reasons.append('EMA Crossover')
+                if macd_hist[j] > 0 and (price > trough * (1 + macd_threshold) or price > entry * 1.005):
+                    reasons.append('MACD Positivo')
+                if rsi_exit_short[j]:
+                    reasons.append('RSI Sobrevenda')
+                volume_reason = bool(vol_spike[j] and (price <= entry * 0.995 or minutes >= 5))
+            if adx_exit[j]:
+                reasons.append('ADX Fraco')
+            if use_time and minutes >= max_minutes:
+                reasons.append('Timeout')
+            if volume_reason:
+                reasons.append('Volume Spike')
+            if reasons:
+                exit_idx = j
+                break
+
+        if exit_idx is None:
+            break  # Posição ainda aberta no fim dos dados
+
+        exit_price = close[exit_idx]
+        amount = notional / entry
+        if side == 'long':
+            pnl_usd = (exit_price - entry) * amount
+            pnl = (exit_price - entry) / entry * 100
+        else:
+            pnl_usd = (entry - exit_price) * amount
+            pnl = (entry - exit_price) / entry * 100
+        pnl_usd -= fee * (entry + exit_price) * amount
+
+        trades.append({
+            'side': side.upper(),
+            'entry_index': i,
+            'exit_index': exit_idx,
+            'entry_time': str(df.index[i]),
+            'exit_time': str(df.index[exit_idx]),
+            'entry_price': float(entry),
+            'exit_price': float(exit_price),
+            'quantity': float(amount),
+            'pnl': float(pnl_usd),
+            'pnl_percent': float(pnl),
+            'duration': f"{int((seconds[exit_idx] - entry_sec) / 60)}min",
+            'reason': ' | '.join(reasons),
+        })
+
+        # Próxima entrada: primeiro sinal aceito depois da saída
+        position = int(np.searchsorted(signals, exit_idx, side='right'))
+
+    return trades
+
+
+def summarize(trades, initial_balance):
+    """PnL, win rate, drawdown e profit factor da lista de trades"""
+    pnls = np.array([t['pnl'] for t in trades], dtype=float)
+    equity = initial_balance + np.cumsum(pnls) if len(pnls) else np.array([initial_balance])
+    peaks = np.maximum.accumulate(np.concatenate(([initial_balance], equity)))[1:]
+    drawdown = peaks - equity
+    worst = int(np.argmax(drawdown)) if len(drawdown) else 0
+    gains = pnls[pnls > 0].sum()
+    losses = -pnls[pnls < 0].sum()
+    return {
+        'total_pnl': round(float(pnls.sum()), 4),
+        'total_operations': int(len(pnls)),
+        'winning_ops': int((pnls > 0).sum()),
+        'losing_ops': int((pnls < 0).sum()),
+        'win_rate': round(float((pnls > 0).mean() * 100), 1) if len(pnls) else 0.0,
+        'avg_pnl': round(float(pnls.mean()), 4) if len(pnls) else 0.0,
+        'profit_factor': round(float(gains / losses), 2) if losses > 0 else None,
+        'max_drawdown': round(float(drawdown.max()), 4) if len(drawdown) else 0.0,
+        'max_drawdown_pct': round(float(drawdown[worst] / peaks[worst] * 100), 2) if len(drawdown) else 0.0,
+        'final_balance': round(float(equity[-1]), 4),
+    }
+
+
+def run_backtest(df, config=None, fee=0.0, params=None):
+    """
+    Backtest completo: indicadores + simulação + métricas.
+    `df` com colunas open/high/low/close/volume e índice de datas.
+    """
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    started = time.time()
+    data = prepare(df, params)
+    trades = simulate(data, config, fee)
+    summary = summarize(trades, config['DEMO_BALANCE'])
+    summary['candles'] = len(df)
+    summary['elapsed'] = round(time.time() - started, 3)
+    return {'summary': summary, 'trades': trades}
+
+
+def format_report(result):
+    s = result['summary']
+    pf = f"{s['profit_factor']:.2f}" if s['profit_factor'] is not None else '-'
+    lines = [
+        f"Candles: {s['candles']} | Tempo: {s['elapsed']:.2f}s",
+        f"Operações: {s['total_operations']} | Ganhos: {s['winning_ops']} | Perdas: {s['losing_ops']} | Win rate: {s['win_rate']:.1f}%",
+        f"PnL total: ${s['total_pnl']:+.2f} | Médio: ${s['avg_pnl']:+.2f} | Profit factor: {pf}",
+        f"Drawdown máx: ${s['max_drawdown']:.2f} ({s['max_drawdown_pct']:.2f}%) | Saldo final: ${s['final_balance']:.2f}",
+    ]
+    return '\n'.join(lines)
+
+
+def check_parity(df=None, config=None):
+    """
+    Reproduz o histórico candle a candle com as funções do próprio davinci_bot
+    (generate_signal + check_exit_conditions, relógio simulado) e compara os trades
+    com os do backtest vetorizado. Retorna o número de trades comparados.
+    """
+    import davinci_bot as bot
+
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    if df is None:
+        df = indicator_engine._synthetic_candles(3000, 5, seed=11)
+    data = prepare(df)
+    expected = [(t['side'], t['entry_index'], t['exit_index']) for t in simulate(data, config)]
+
+    clock = {'now': None}
+
+    class _Clock(bot.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock['now']
+
+    original = {name: getattr(bot, name) for name in
+                ('datetime', 'exit_position', 'SIGNAL_COOLDOWN', 'TRAIL_OFFSET', *DEFAULT_CONFIG)
+                if hasattr(bot, name)}
+    got = []
+    current = {}
+
+    def fake_exit(reason="Manual"):
+        got.append((bot.position_side.upper(), current['entry'], current['index']))
+        bot.in_position = False
+        bot.position_side = None
+
+    try:
+        bot.datetime = _Clock
+        bot.exit_position = fake_exit
+        for name, value in config.items():
+            if name in DEFAULT_CONFIG and hasattr(bot, name):
+                setattr(bot, name, value)
+        bot.SIGNAL_COOLDOWN = config['SIGNAL_COOLDOWN']
+        bot.TRAIL_OFFSET = config['TRAILING_STOP']
+        bot.in_position = False
+        bot.last_signal_time = None
+
+        for i in range(MIN_CANDLES - 1, len(data)):
+            window = data.iloc[i - MIN_CANDLES + 1:i + 1]
+            clock['now'] = data.index[i].to_pydatetime()
+            current['index'] = i
+            long_sig, short_sig = bot.generate_signal(window, verbose=False)
+            if (long_sig or short_sig) and not bot.in_position:
+                price = data['close'].iloc[i]
+                bot.in_position = True
+                bot.position_side = 'long' if long_sig else 'short'
+                bot.entry_price = price
+                bot.entry_time = clock['now']
+                bot.highest_price = bot.lowest_price = price
+                current['entry'] = i
+            bot.check_exit_conditions(window)
+    finally:
+        for name, value in original.items():
+            setattr(bot, name, value)
+        bot.in_position = False
+
+    if got != expected:
+        first = next((k for k, (a, b) in enumerate(zip(got, expected)) if a != b), min(len(got), len(expected)))
+        raise AssertionError(f"Trades divergem a partir do #{first}: bot={got[first:first + 3]} "
+                             f"backtest={expected[first:first + 3]}")
+    return len(got)
+
+
+def _parse_overrides(items):
+    overrides = {}
+    for item in items or []:
+        key, _, value = item.partition('=')
+        try:
+            overrides[key.strip()] = json.loads(value)
+        except ValueError:
+            overrides[key.strip()] = value
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest do Da Vinci Bot')
+    parser.add_argument('candles', nargs='?', help='arquivo CSV ou Parquet de candles')
+    parser.add_argument('--config', default='bot_config.json')
+    parser.add_argument('--set', action='append', metavar='CHAVE=VALOR', help='sobrescreve uma configuração')
+    parser.add_argument('--fee', type=float, default=0.0, help='taxa por lado (ex: 0.0004)')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='usa N candles sintéticos')
+    parser.add_argument('--archive', metavar='SÍMBOLO', help='usa os candles do arquivo local (candle_archive)')
+    parser.add_argument('--timeframe', default='1m', help='timeframe dos candles sintéticos/arquivados')
+    parser.add_argument('--trades', action='store_true', help='lista os trades')
+    parser.add_argument('--json', metavar='ARQUIVO', help='salva resultado completo em JSON')
+    parser.add_argument('--check', action='store_true', help='compara com davinci_bot candle a candle')
+    args = parser.parse_args()
+
+    config = load_config(args.config, _parse_overrides(args.set))
+
+    if args.check:
+        count = check_parity(config=config)
+        print(f"✅ Backtest idêntico ao bot candle a candle ({count} trades)")
+        return
+
+    if args.synthetic:
+        from market_stream import timeframe_to_ms
+        df = indicator_engine._synthetic_candles(args.synthetic, timeframe_to_ms(args.timeframe) // 60_000)
+    elif args.archive:
+        import candle_archive
+        df = candle_archive.load_frame(args.archive, args.timeframe)
+        if len(df) < MIN_CANDLES:
+            parser.error(f'arquivo local sem candles suficientes de {args.archive} {args.timeframe} '
+                         f'(python candle_archive.py --backfill {args.archive} --timeframe {args.timeframe} --days 30)')
+    elif args.candles:
+        df = load_candles(args.candles)
+    else:
+        parser.error('informe o arquivo de candles ou --synthetic N')
+
+    result = run_backtest(df, config, fee=args.fee)
+    print(format_report(result))
+    if args.trades:
+        for t in result['trades']:
+            print(f"{t['entry_time']} {t['side']:5} ${t['entry_price']:.4f} -> ${t['exit_price']:.4f} "
+                  f"({t['duration']}) PnL ${t['pnl']:+.2f} | {t['reason']}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,437 @@
+"""
+benchmark.py - Micro-benchmarks dos caminhos quentes do bot
+
+Casos (fixtures fixas: candles sintéticos com semente, ou gravados no arquivo local):
+  - davinci_bot.calculate_indicators (tick com a engine quente) e o recálculo completo
+  - davinci_bot.generate_signal / check_exit_conditions (LONG e SHORT)
+  - analyzer.analyze_symbol (cache de candles quente) e a varredura em lote
+  - operations_history.save_to_history com 1k / 10k / 100k operações no histórico
+  - web_interface.get_logs (/api/logs) com logs de vários MB: primeira leitura e refresh
+
+Cada caso roda num diretório temporário próprio: nenhum arquivo do bot é tocado
+(check_exit_conditions não chama exit_position - a saída só é contada).
+O tempo de cada caso é a mediana de ROUNDS rodadas; a baseline (benchmark_baseline.json)
+guarda os resultados e a comparação mostra a diferença percentual por caso.
+
+Uso:
+    python benchmark.py                       # roda e compara com a baseline
+    python benchmark.py --save                # grava os resultados como baseline
+    python benchmark.py -k history --quick    # só casos com "history" no nome, menos rodadas
+    python benchmark.py --archive BTC/USDT --timeframe 5m   # candles gravados (market_data/)
+
+Sai com código 1 se algum caso ficou mais de --threshold % acima da baseline.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import tempfile
+import statistics
+from itertools import cycle
+from datetime import datetime, timedelta
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+THRESHOLD = 15.0          # % acima da baseline considerado regressão
+ROUNDS = 7
+ROUND_TIME = 0.05         # Segundos mínimos por rodada (calibra o número de chamadas)
+WARMUP = 3
+FIXTURE_CANDLES = 2000
+TICK_CANDLES = 100        # Candles por tick (igual a davinci_bot.fetch_ohlcv)
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+LOG_BYTES = 8 * 1024 * 1024
+SCAN_SYMBOLS = 500
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'BNB/USDT']
+BENCH_CONFIG = {'SYMBOL': 'BTC/USDT', 'POSITION_SIZE_USD': 50, 'LEVERAGE': 10, 'USE_DEMO': True}
+
+
+# ===================== FIXTURES =====================
+def load_candles(archive=None, timeframe='5m'):
+    """Candles da fixture: arquivo local (--archive) ou sintéticos com semente fixa"""
+    import indicator_engine
+    from market_stream import timeframe_to_ms
+    if archive:
+        import candle_archive
+        df = candle_archive.load_frame(archive, timeframe, limit=FIXTURE_CANDLES)
+        if len(df) < TICK_CANDLES + 50:
+            raise SystemExit(f"Arquivo de {archive} {timeframe} com {len(df)} candles (mínimo {TICK_CANDLES + 50})")
+        return df, f"archive:{archive} {timeframe}"
+    minutes = timeframe_to_ms(timeframe) // 60_000
+    return indicator_engine._synthetic_candles(FIXTURE_CANDLES, minutes), f"synthetic:{timeframe}"
+
+
+def tick_frames(candles):
+    """Janelas de TICK_CANDLES candles avançando um candle por tick"""
+    return [candles.iloc[end - TICK_CANDLES:end] for end in range(TICK_CANDLES, len(candles) + 1)]
+
+
+class FixtureExchange:
+    """Exchange offline que serve a fixture; o último candle é deslocado para o candle vivo atual"""
+
+    def __init__(self, candles, timeframe):
+        from market_stream import timeframe_to_ms
+        tf_ms = timeframe_to_ms(timeframe)
+        now_slot = int(time.time() * 1000) // tf_ms * tf_ms
+        values = candles[['open', 'high', 'low', 'close', 'volume']].to_numpy().tolist()
+        size = len(values)
+        self.rows = [[now_slot - (size - 1 - i) * tf_ms] + row for i, row in enumerate(values)]
+        self.timeframes = {timeframe: timeframe}
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=100):
+        self.calls += 1
+        rows = [r for r in self.rows if r[0] >= since][:limit] if since is not None else self.rows[-limit:]
+        return [list(r) for r in rows]
+
+
+def _operation(number):
+    """Operação fechada no formato de davinci_bot.exit_position"""
+    opened = datetime(2025, 1, 1) + timedelta(minutes=5 * number)
+    closed = opened + timedelta(minutes=35)
+    entry = 100.0 + number % 50
+    pnl_percent = ((number * 37) % 200 - 100) / 50
+    return {
+        "id": number + 1,
+        "symbol": SYMBOLS[number % len(SYMBOLS)],
+        "side": 'LONG' if number % 2 else 'SHORT',
+        "entry_price": entry,
+        "exit_price": round(entry * (1 + pnl_percent / 100), 4),
+        "quantity": 0.5,
+        "leverage": 10,
+        "entry_time": opened.strftime('%Y-%m-%d %H:%M'),
+        "exit_time": closed.strftime('%H:%M'),
+        "exit_date": closed.strftime('%Y-%m-%d'),
+        "duration": "35min",
+        "pnl": round(entry * 0.5 * pnl_percent / 100, 4),
+        "pnl_percent": pnl_percent,
+        "reason": "Trailing Stop",
+        "status": "closed",
+    }
+
+
+_LOG_MESSAGES = [
+    ('INFO', 'log', "[TICK] BTC/USDT | Preço: $97,412.30 | RSI: 54.2 | ADX: 23.1 | Latência: 182ms"),
+    ('INFO', 'log', "[CHECK] LONG | Entry: $97,120.00 | Current: $97,412.30 | PnL: +$3.01"),
+    ('WARNING', 'exit_signal', "[SAÍDA LONG] Trailing Stop: $97,001.20 <= $97,010.55"),
+    ('INFO', 'entry', "ENTRADA LONG (DEMO) | Preço: $97,120.00 | Qtd: 0.010297"),
+    ('ERROR', 'error', "Erro ao buscar OHLCV: binance GET https://fapi.binance.com/fapi/v1/klines 502"),
+]
+
+
+def _log_records(count, start):
+    for number in range(count):
+        level, name, message = _LOG_MESSAGES[number % len(_LOG_MESSAGES)]
+        record = logging.makeLogRecord({
+            'msg': message, 'levelname': level, 'levelno': getattr(logging, level),
+            'created': start + number, 'msecs': 0,
+        })
+        if name not in ('log', 'error'):
+            record.event = name
+            record.event_fields = {'symbol': 'BTC/USDT', 'side': 'long', 'price': 97120.0}
+        yield record
+
+
+def write_logs(path, size, events):
+    """Arquivo de log de `size` bytes no formato do bot (texto ou bot_events.jsonl)"""
+    import event_log
+    formatter = event_log.JsonEventFormatter() if events else \
+        logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
+    start = time.time() - 86_400
+    with open(path, 'w', encoding='utf-8') as f:
+        written = lines = 0
+        while written < size:
+            chunk = '\n'.join(formatter.format(r) for r in _log_records(1000, start + lines)) + '\n'
+            f.write(chunk)
+            written += len(chunk.encode('utf-8'))
+            lines += 1000
+    return formatter
+
+
+# ===================== CASOS =====================
+# Cada setup recebe as fixtures e retorna a função medida (uma operação por chamada).
+# Roda com o diretório atual apontando para um diretório temporário só do caso.
+
+def setup_calculate_indicators(fx):
+    bot = fx['bot']
+    frames = cycle(fx['frames'])
+    return lambda: bot.calculate_indicators(next(frames))
+
+
+def setup_calculate_indicators_full(fx):
+    import indicator_engine
+    frames = cycle(fx['frames'])
+    return lambda: indicator_engine.calculate_indicators_full(next(frames).copy(), fx['bot'].INDICATOR_PARAMS)
+
+
+def setup_generate_signal(fx):
+    bot = fx['bot']
+    frames = cycle(fx['indicator_frames'])
+
+    def run():
+        bot.last_signal_time = None  # Sem cooldown: todo tick avalia o sinal
+        return bot.generate_signal(next(frames), verbose=False)
+    return run
+
+
+def setup_check_exit(fx, side):
+    bot = fx['bot']
+    frames = fx['indicator_frames']
+    exits = fx.setdefault('exits', {})
+    exits[side] = 0
+
+    def count_exit(reason="Manual"):
+        exits[side] += 1
+    bot.exit_position = count_exit
+    price = float(frames[0]['close'].iloc[-1])
+    bot.in_position, bot.position_side, bot.entry_price = True, side, price
+    bot.highest_price = bot.lowest_price = price
+    bot.entry_time = datetime.now()
+    frames = cycle(frames)
+    return lambda: bot.check_exit_conditions(next(frames))
+
+
+def setup_analyze_symbol(fx):
+    import analyzer
+    exchange = FixtureExchange(fx['candles'], fx['timeframe'])
+    filters = {'RSI_LONG': 60, 'RSI_SHORT': 35, 'USE_VOL': True, 'USE_ADX': True, 'ADX_THRESH': 20}
+    return lambda: analyzer.analyze_symbol(exchange, 'BENCH/USDT', fx['timeframe'], filters)
+
+
+def setup_analyze_blocks(fx):
+    import analyzer
+    blocks = analyzer._synthetic_blocks(SCAN_SYMBOLS)
+    filters = {'RSI_LONG': 60, 'RSI_SHORT': 35, 'USE_VOL': True, 'USE_ADX': True, 'ADX_THRESH': 20}
+    return lambda: analyzer.analyze_blocks(blocks, filters)
+
+
+def setup_save_to_history(fx, size):
+    import operations_history
+    operations_history.HISTORY_DB = os.path.abspath('closed_operations_history.db')
+    operations_history.save_many_to_history([_operation(n) for n in range(size)])
+    numbers = iter(range(size, size * 100))
+    return lambda: operations_history.save_to_history(_operation(next(numbers)))
+
+
+def _logs_client(events):
+    import log_tail
+    import web_interface
+    if events:
+        write_logs(web_interface.EVENTS_FILE, LOG_BYTES, events=True)
+    else:
+        write_logs(web_interface.LOG_SOURCES[0], LOG_BYTES, events=False)
+    log_tail._tails.clear()
+    return web_interface.app.test_client()
+
+
+def setup_get_logs_first(fx, events):
+    """Primeira leitura (dashboard aberto / interface reiniciada): buffers vazios"""
+    import log_tail
+    client = _logs_client(events)
+
+    def run():
+        log_tail._tails.clear()
+        response = client.get('/api/logs')
+        assert response.status_code == 200
+    return run
+
+
+def setup_get_logs_refresh(fx, events):
+    """Refresh com cursor: 5 linhas novas no log entre uma chamada e outra"""
+    import event_log
+    client = _logs_client(events)
+    path = event_log.EVENTS_FILE if events else 'davinci_bot.log'
+    formatter = event_log.JsonEventFormatter() if events else \
+        logging.Formatter('%(asctime)s | %(levelname)s | %(message)s')
+    state = {'cursor': client.get('/api/logs').get_json()['cursor'], 'time': time.time()}
+
+    def run():
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(formatter.format(r) + '\n' for r in _log_records(5, state['time'])))
+        state['time'] += 5
+        state['cursor'] = client.get('/api/logs', query_string={'after': state['cursor']}).get_json()['cursor']
+    return run
+
+
+def build_cases():
+    cases = [
+        ('calculate_indicators', setup_calculate_indicators),
+        ('calculate_indicators_full', setup_calculate_indicators_full),
+        ('generate_signal', setup_generate_signal),
+        ('check_exit_conditions[long]', lambda fx: setup_check_exit(fx, 'long')),
+        ('check_exit_conditions[short]', lambda fx: setup_check_exit(fx, 'short')),
+        ('analyzer.analyze_symbol', setup_analyze_symbol),
+        (f'analyzer.analyze_blocks[{SCAN_SYMBOLS}]', setup_analyze_blocks),
+    ]
+    for size in HISTORY_SIZES:
+        cases.append((f'save_to_history[{size // 1000}k]', lambda fx, size=size: setup_save_to_history(fx, size)))
+    for events, label in ((False, 'text'), (True, 'events')):
+        mb = LOG_BYTES // (1024 * 1024)
+        cases.append((f'get_logs[{label} {mb}MB first]', lambda fx, e=events: setup_get_logs_first(fx, e)))
+        cases.append((f'get_logs[{label} {mb}MB refresh]', lambda fx, e=events: setup_get_logs_refresh(fx, e)))
+    return cases
+
+
+# ===================== EXECUÇÃO =====================
+def measure(fn, rounds=ROUNDS, round_time=ROUND_TIME):
+    """Tempo por chamada: mediana e mínimo de `rounds` rodadas (segundos)"""
+    for _ in range(WARMUP):
+        fn()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= round_time:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(rounds - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+    return {'median': statistics.median(samples), 'min': min(samples), 'calls': number * rounds}
+
+
+def load_baseline():
+    try:
+        with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(results, fixture, previous=None):
+    """Grava os resultados como baseline (casos não executados agora são mantidos)"""
+    merged = {}
+    if previous and previous.get('fixture') == fixture:
+        merged.update(previous.get('results', {}))
+    merged.update(results)
+    baseline = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'fixture': fixture,
+        'results': merged,
+    }
+    tmp_path = f"{BASELINE_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2)
+    os.replace(tmp_path, BASELINE_FILE)
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return '-'
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def compare(name, result, baseline, threshold):
+    """
+    (baseline em segundos, diferença % da mediana, situação). Regressão/melhora só quando
+    mediana e mínimo passam do limite juntos (uma rodada lenta isolada é ruído da máquina).
+    """
+    base = (baseline or {}).get('results', {}).get(name)
+    if not base:
+        return None, None, 'novo'
+    delta = (result['median'] - base['median']) / base['median'] * 100
+    delta_min = (result['min'] - base['min']) / base['min'] * 100
+    if delta > threshold and delta_min > threshold:
+        return base['median'], delta, 'REGRESSÃO'
+    if delta < -threshold and delta_min < -threshold:
+        return base['median'], delta, 'melhora'
+    return base['median'], delta, 'ok'
+
+
+def run(cases, fixtures, rounds, threshold, baseline):
+    root = os.getcwd()
+    results, regressions = {}, []
+    print(f"{'caso':38} {'mediana':>10} {'mínimo':>10} {'baseline':>10} {'Δ':>8}")
+    for name, setup in cases:
+        workdir = os.path.join(root, name.replace('/', '_').replace(' ', '_'))
+        os.makedirs(workdir)
+        os.chdir(workdir)
+        try:
+            result = measure(setup(fixtures), rounds)
+        except Exception as e:
+            print(f"{name:38} ERRO: {e}")
+            continue
+        finally:
+            os.chdir(root)
+        results[name] = result
+        base, delta, status = compare(name, result, baseline, threshold)
+        if status == 'REGRESSÃO':
+            regressions.append(name)
+        delta_text = f"{delta:+.1f}%" if delta is not None else ''
+        print(f"{name:38} {_fmt(result['median']):>10} {_fmt(result['min']):>10} {_fmt(base):>10} {delta_text:>8}  {status}")
+    return results, regressions
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Micro-benchmarks dos caminhos quentes do bot')
+    parser.add_argument('-k', dest='filter', help='só casos com este texto no nome')
+    parser.add_argument('--save', action='store_true', help='grava os resultados como baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='%% acima da baseline = regressão')
+    parser.add_argument('--quick', action='store_true', help='3 rodadas por caso (mais ruído)')
+    parser.add_argument('--archive', metavar='SÍMBOLO', help='usa os candles gravados em market_data/')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--list', action='store_true', help='lista os casos')
+    args = parser.parse_args()
+
+    cases = [(name, setup) for name, setup in build_cases() if not args.filter or args.filter in name]
+    if args.list or not cases:
+        print('\n'.join(name for name, _ in build_cases()))
+        return 0
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    candles, fixture = load_candles(args.archive, args.timeframe)  # Antes do chdir (market_data/ relativo)
+    baseline = load_baseline()
+    if baseline and baseline.get('fixture') != fixture:
+        print(f"⚠️  Baseline gravada com outra fixture ({baseline.get('fixture')}), sem comparação")
+        baseline = None
+
+    workdir = tempfile.mkdtemp(prefix='davinci_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        # Importado dentro do diretório temporário: os logs do bot vão para lá, e a
+        # configuração é fixa (demais campos nos padrões do bot), não a do usuário
+        with open('bot_config.json', 'w', encoding='utf-8') as f:
+            json.dump(dict(BENCH_CONFIG, TIMEFRAME=args.timeframe), f)
+        import davinci_bot
+        logging.getLogger().handlers = [h for h in logging.getLogger().handlers
+                                        if isinstance(h, logging.FileHandler)]
+        davinci_bot.SYMBOL, davinci_bot.TIMEFRAME = 'BENCH/USDT', args.timeframe
+        frames = tick_frames(candles)
+        fixtures = {
+            'bot': davinci_bot,
+            'candles': candles,
+            'timeframe': args.timeframe,
+            'frames': frames,
+            'indicator_frames': [davinci_bot.calculate_indicators(df) for df in frames[:300]],
+        }
+        print(f"Fixture: {fixture} ({len(candles)} candles) | Python {platform.python_version()}")
+        results, regressions = run(cases, fixtures, 3 if args.quick else ROUNDS, args.threshold, baseline)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        save_baseline(results, fixture, load_baseline())
+        print(f"Baseline gravada em {BASELINE_FILE}")
+    if regressions and not args.save:
+        print(f"❌ {len(regressions)} caso(s) acima de {args.threshold:.0f}% da baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+bot_control.py - Canal de controle/consulta local entre a interface web e o bot
+
+O processo do bot serve um HTTP mínimo em 127.0.0.1 (porta efêmera) e anuncia
+porta, token e PID em bot_control.json. A interface web consulta por aqui em vez de
+importar davinci_bot dentro do Flask:
+
+    GET  /pnl    PnL das operações abertas com os últimos preços do bot (sem chamadas à exchange)
+    POST /close  {"id": 123} fecha a operação no motor em execução
+
+Cada requisição precisa do header X-Control-Token com o token do arquivo (evita que
+páginas abertas no navegador disparem comandos no bot).
+Bot parado ou arquivo ausente: request() retorna None e a web usa o fallback.
+Bot acessível mas sem resposta (timeout, conexão cortada no meio): request() levanta
+NoResponse - o comando pode ter sido executado, então a web NÃO usa o fallback.
+"""
+import os
+import json
+import secrets
+import threading
+import logging
+import urllib.request
+import urllib.error
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+log = logging.getLogger(__name__)
+
+CONTROL_FILE = 'bot_control.json'
+HOST = '127.0.0.1'
+TOKEN_HEADER = 'X-Control-Token'
+REQUEST_TIMEOUT = 10  # Fechamento em modo real envia ordem: dá tempo à exchange
+
+
+class NoResponse(Exception):
+    """O bot aceitou a conexão mas não respondeu (timeout ou erro de leitura)"""
+
+
+class ControlServer:
+    """Servidor do canal de controle (roda em thread daemon dentro do bot)"""
+
+    def __init__(self, routes, port=0):
+        self.routes = routes  # {('GET', '/pnl'): handler(payload) -> (status, dict)}
+        self.token = secrets.token_hex(16)
+        self.port = port
+        self._server = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, status, body):
+                data = json.dumps(body, default=str).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _dispatch(self, method):
+                if not secrets.compare_digest(self.headers.get(TOKEN_HEADER, ''), server.token):
+                    return self._respond(403, {"error": "token inválido"})
+                handler = server.routes.get((method, self.path.split('?')[0]))
+                if handler is None:
+                    return self._respond(404, {"error": "rota desconhecida"})
+                try:
+                    length = int(self.headers.get('Content-Length') or 0)
+                    payload = json.loads(self.rfile.read(length)) if length else {}
+                    status, body = handler(payload)
+                except Exception as e:
+                    log.error(f"[CONTROLE] Erro em {method} {self.path}: {e}")
+                    status, body = 500, {"error": str(e)}
+                self._respond(status, body)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def log_message(self, *args):
+                pass  # Sem linhas de acesso no log do bot
+
+        self._server = ThreadingHTTPServer((HOST, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='bot-control', daemon=True).start()
+        self._advertise()
+        log.info(f"[CONTROLE] Canal de controle em {HOST}:{self.port}")
+        return self
+
+    def _advertise(self):
+        tmp_path = f"{CONTROL_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"port": self.port, "token": self.token, "pid": os.getpid()}, f)
+        os.replace(tmp_path, CONTROL_FILE)
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()  # Fecha o socket: novas conexões são recusadas
+            self._server = None
+        try:
+            with open(CONTROL_FILE, 'r', encoding='utf-8') as f:
+                if json.load(f).get('pid') == os.getpid():
+                    os.remove(CONTROL_FILE)
+        except (OSError, ValueError):
+            pass
+
+
+# Conexão direta ao loopback (ignora http_proxy do ambiente)
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+def _endpoint():
+    try:
+        with open(CONTROL_FILE, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return info['port'], info['token']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def request(method, path, payload=None, timeout=REQUEST_TIMEOUT):
+    """
+    Chamada ao bot em execução. Retorna (status, dict) ou None se o bot não estiver
+    acessível (não iniciado, parado ou arquivo de controle antigo: conexão recusada).
+    Levanta NoResponse se a requisição chegou ao bot mas a resposta não veio.
+    """
+    endpoint = _endpoint()
+    if endpoint is None:
+        return None
+    port, token = endpoint
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(f"http://{HOST}:{port}{path}", data=data, method=method,
+                                 headers={TOKEN_HEADER: token, 'Content-Type': 'application/json'})
+    try:
+        with _opener.open(req, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read())
+        except ValueError:
+            return e.code, {"error": str(e)}
+    except urllib.error.URLError as e:
+        if isinstance(e.reason, ConnectionRefusedError):
+            return None
+        raise NoResponse(str(e.reason)) from e
+    except ConnectionRefusedError:
+        return None
+    except (OSError, ValueError) as e:
+        raise NoResponse(str(e) or type(e).__name__) from e
@@ -0,0 +1,305 @@
+"""
+candle_archive.py - Arquivo local de candles fechados por (símbolo, timeframe)
+
+Cada par vira um arquivo binário de registros fixos (timestamp int64 + OHLCV float64,
+48 bytes), ordenado por timestamp, que é lido com np.memmap sem carregar tudo:
+
+    market_data/BTC_USDT/5m.bin
+
+- record(): acrescenta só candles FECHADOS e mais novos que o último gravado
+  (chamado por ohlcv_cache a cada busca na exchange - bot, analyzer e gráfico)
+- buraco entre o último gravado e o primeiro novo: o candle é gravado mesmo assim e
+  um backfill em background busca o intervalo que faltou
+- backfill(): completa buracos e/ou estende o histórico para trás (paginado)
+- load() / load_frame(): leitura por intervalo (array estruturado ou DataFrame no
+  formato de davinci_bot.fetch_ohlcv)
+
+Uso:
+    python candle_archive.py --info
+    python candle_archive.py --backfill BTC/USDT --timeframe 5m --days 30
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from market_stream import timeframe_to_ms
+
+log = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'market_data'
+CANDLE_DTYPE = np.dtype([('timestamp', '<i8'), ('open', '<f8'), ('high', '<f8'),
+                         ('low', '<f8'), ('close', '<f8'), ('volume', '<f8')])
+PAGE_LIMIT = 1500             # Candles por requisição no backfill (máximo da Binance Futures)
+MAX_AUTO_BACKFILL = 5000      # Buraco maior que isso não é preenchido automaticamente
+
+_last_ts = {}                 # (symbol, timeframe) -> último timestamp gravado (cache do processo)
+_backfilling = set()
+_lock = threading.Lock()
+
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_fd(fh):
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_fd(fh):
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_fd(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def path_for(symbol, timeframe):
+    return os.path.join(ARCHIVE_DIR, symbol.replace('/', '_').replace(':', '_'), f"{timeframe}.bin")
+
+
+@contextmanager
+def _file_lock(path):
+    """Lock entre processos por arquivo (bot e interface gravam o mesmo par)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a+') as fh:
+        _lock_fd(fh)
+        try:
+            yield
+        finally:
+            _unlock_fd(fh)
+
+
+def _read_last_ts(path):
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return None
+    count = size // CANDLE_DTYPE.itemsize
+    if count == 0:
+        return None
+    with open(path, 'rb') as f:
+        f.seek((count - 1) * CANDLE_DTYPE.itemsize)
+        return int(np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)['timestamp'][0])
+
+
+def _to_records(candles):
+    records = np.empty(len(candles), dtype=CANDLE_DTYPE)
+    if len(candles):
+        values = np.asarray(candles, dtype=np.float64)
+        records['timestamp'] = values[:, 0].astype(np.int64)
+        for number, name in enumerate(CANDLE_DTYPE.names[1:], start=1):
+            records[name] = values[:, number]
+    return records
+
+
+def record(symbol, timeframe, candles, exchange=None, now_ms=None):
+    """
+    Grava os candles fechados mais novos que o último arquivado (formato ccxt).
+    Com `exchange`, buracos detectados são preenchidos em background.
+    Retorna quantos candles foram gravados.
+    """
+    if not candles:
+        return 0
+    tf_ms = timeframe_to_ms(timeframe)
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    key = (symbol, timeframe)
+    last = _last_ts.get(key)
+    newest_closed = next((c[0] for c in reversed(candles) if c[0] + tf_ms <= now_ms), None)
+    # Sem candle fechado novo: não toca no disco
+    if newest_closed is None or (last is not None and newest_closed <= last):
+        return 0
+
+    path = path_for(symbol, timeframe)
+    with _file_lock(path):
+        last = _read_last_ts(path)
+        fresh = {}
+        for candle in candles:
+            ts = int(candle[0])
+            if ts + tf_ms <= now_ms and (last is None or ts > last):
+                fresh[ts] = candle
+        if not fresh:
+            _last_ts[key] = last
+            return 0
+        records = _to_records([fresh[ts] for ts in sorted(fresh)])
+        gap_from = last + tf_ms if last is not None and records['timestamp'][0] > last + tf_ms else None
+        with open(path, 'ab') as f:
+            f.truncate(os.path.getsize(path) // CANDLE_DTYPE.itemsize * CANDLE_DTYPE.itemsize)  # Registro parcial
+            f.write(records.tobytes())
+        _last_ts[key] = int(records['timestamp'][-1])
+
+    if gap_from is not None:
+        missing = (int(records['timestamp'][0]) - gap_from) // tf_ms
+        log.debug(f"[ARQUIVO] Buraco de {missing} candles em {symbol} {timeframe}")
+        if exchange is not None and missing <= MAX_AUTO_BACKFILL:
+            _backfill_async(exchange, symbol, timeframe)
+    return len(records)
+
+
+def load(symbol, timeframe, start=None, end=None, limit=None):
+    """Candles arquivados (array estruturado, cópia) entre start e end (ms), últimos `limit`"""
+    path = path_for(symbol, timeframe)
+    try:
+        count = os.path.getsize(path) // CANDLE_DTYPE.itemsize
+    except OSError:
+        count = 0
+    if count == 0:
+        return np.empty(0, dtype=CANDLE_DTYPE)
+    data = np.memmap(path, dtype=CANDLE_DTYPE, mode='r', shape=(count,))
+    timestamps = data['timestamp']
+    lo = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+    hi = int(np.searchsorted(timestamps, end, side='right')) if end is not None else count
+    if limit is not None:
+        lo = max(lo, hi - limit)
+    result = np.array(data[lo:hi])
+    del data
+    return result
+
+
+def load_frame(symbol, timeframe, start=None, end=None, limit=None):
+    """Candles arquivados como DataFrame (índice timestamp), igual a davinci_bot.fetch_ohlcv"""
+    import pandas as pd
+    records = load(symbol, timeframe, start, end, limit)
+    df = pd.DataFrame({name: records[name] for name in CANDLE_DTYPE.names[1:]},
+                      index=pd.to_datetime(records['timestamp'], unit='ms'))
+    df.index.name = 'timestamp'
+    return df
+
+
+def gaps(symbol, timeframe):
+    """Intervalos faltando no arquivo: [(primeiro_ms_faltando, último_ms_faltando), ...]"""
+    tf_ms = timeframe_to_ms(timeframe)
+    timestamps = load(symbol, timeframe)['timestamp']
+    jumps = np.nonzero(np.diff(timestamps) > tf_ms)[0]
+    return [(int(timestamps[i]) + tf_ms, int(timestamps[i + 1]) - tf_ms) for i in jumps]
+
+
+def _fetch_range(exchange, symbol, timeframe, start, end):
+    """Busca paginada de [start, end] (ms)"""
+    tf_ms = timeframe_to_ms(timeframe)
+    candles = []
+    since = start
+    while since <= end:
+        batch = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=PAGE_LIMIT)
+        if not batch:
+            break
+        candles.extend(c for c in batch if c[0] <= end)
+        since = batch[-1][0] + tf_ms
+        if len(batch) < PAGE_LIMIT:
+            break
+    return candles
+
+
+def backfill(exchange, symbol, timeframe, days=None):
+    """
+    Preenche os buracos do arquivo e, com `days`, estende o histórico até `days` dias atrás.
+    Reescreve o arquivo de forma atômica. Retorna quantos candles foram adicionados.
+    """
+    import exchange_session
+    if exchange_session.is_fake(exchange):
+        log.warning(f"[ARQUIVO] Backfill de {symbol} {timeframe} ignorado: exchange é o servidor fake (EXCHANGE_URL)")
+        return 0
+    tf_ms = timeframe_to_ms(timeframe)
+    now_ms = int(time.time() * 1000)
+    existing = load(symbol, timeframe)
+    ranges = gaps(symbol, timeframe)
+    if days:
+        start = (now_ms - days * 86_400_000) // tf_ms * tf_ms
+        first = int(existing['timestamp'][0]) if len(existing) else now_ms
+        if start < first:
+            ranges.insert(0, (start, first - tf_ms))
+    if len(existing):
+        # Também até o presente (bot parado por um tempo)
+        ranges.append((int(existing['timestamp'][-1]) + tf_ms, now_ms))
+
+    fetched = []
+    for start, end in ranges:
+        fetched.extend(_fetch_range(exchange, symbol, timeframe, start, end))
+    fetched = [c for c in fetched if c[0] + tf_ms <= now_ms]
+    if not fetched:
+        return 0
+
+    path = path_for(symbol, timeframe)
+    with _file_lock(path):
+        existing = load(symbol, timeframe)  # Pode ter crescido durante as buscas
+        merged = np.concatenate([existing, _to_records(fetched)])
+        _, unique = np.unique(merged['timestamp'], return_index=True)
+        merged = merged[unique]  # Ordenado por timestamp; repetido fica o já arquivado
+        added = len(merged) - len(existing)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        merged.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        _last_ts[(symbol, timeframe)] = int(merged['timestamp'][-1])
+    log.info(f"[ARQUIVO] {symbol} {timeframe}: +{added} candles (total {len(merged)})")
+    return added
+
+
+def _backfill_async(exchange, symbol, timeframe):
+    key = (symbol, timeframe)
+    with _lock:
+        if key in _backfilling:
+            return
+        _backfilling.add(key)
+
+    def run():
+        try:
+            backfill(exchange, symbol, timeframe)
+        except Exception as e:
+            log.warning(f"[ARQUIVO] Erro no backfill de {symbol} {timeframe}: {e}")
+        finally:
+            with _lock:
+                _backfilling.discard(key)
+
+    threading.Thread(target=run, name=f'backfill-{symbol}-{timeframe}', daemon=True).start()
+
+
+def info():
+    """Resumo do arquivo: [(símbolo, timeframe, candles, primeiro, último, buracos)]"""
+    rows = []
+    if not os.path.isdir(ARCHIVE_DIR):
+        return rows
+    for folder in sorted(os.listdir(ARCHIVE_DIR)):
+        directory = os.path.join(ARCHIVE_DIR, folder)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.bin'):
+                continue
+            symbol, timeframe = folder.replace('_', '/', 1), name[:-4]
+            records = load(symbol, timeframe)
+            if len(records):
+                rows.append((symbol, timeframe, len(records), int(records['timestamp'][0]),
+                             int(records['timestamp'][-1]), len(gaps(symbol, timeframe))))
+    return rows
+
+
+def main():
+    import argparse
+    from datetime import datetime
+    parser = argparse.ArgumentParser(description='Arquivo local de candles')
+    parser.add_argument('--info', action='store_true', help='lista pares arquivados')
+    parser.add_argument('--backfill', metavar='SÍMBOLO', action='append', help='preenche/estende o histórico')
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--days', type=int, help='estende o histórico até N dias atrás')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if args.backfill:
+        import exchange_session
+        exchange = exchange_session.get_exchange()
+        for symbol in args.backfill:
+            backfill(exchange, symbol, args.timeframe, args.days)
+    if args.info or not args.backfill:
+        fmt = lambda ms: datetime.fromtimestamp(ms / 1000).strftime('%Y-%m-%d %H:%M')
+        for symbol, timeframe, count, first, last, holes in info():
+            print(f"{symbol:12} {timeframe:4} {count:>8} candles  {fmt(first)} -> {fmt(last)}  buracos: {holes}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+candle_buffer.py - Buffer NumPy de candles por (símbolo, timeframe) atualizado no lugar
+
+Substitui a montagem de um DataFrame novo a cada tick (lista ccxt -> DataFrame ->
+to_datetime -> set_index). Cada par tem um CandleBuffer de capacidade fixa:
+
+- update(): grava só as linhas novas ou revisadas (o candle vivo e os que fecharam
+  desde a última chamada); candles fechados já presentes não são tocados. O REST e o
+  stream (MarketStream.to_dataframe) escrevem no mesmo buffer: lote atrasado é ignorado
+- timestamps() / column() / arrays(): views sem cópia dos últimos N candles, contíguas
+  (o buffer tem 2x a capacidade e é compactado quando enche, em vez de dar a volta)
+- frame(): adaptador para o código pandas - DataFrame no formato de
+  davinci_bot.fetch_ohlcv montado num único construtor (um bloco float)
+- block(): matriz OHLCV (cópia) para empilhar vários símbolos (varredura em lote do analyzer)
+
+As views valem até a próxima update() do mesmo buffer; frame() copia os dados.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import ohlcv_cache
+from market_stream import timeframe_to_ms
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+DEFAULT_CAPACITY = ohlcv_cache.MAX_CANDLES
+MAX_BUFFERS = ohlcv_cache.MAX_ENTRIES
+
+_buffers = OrderedDict()  # (symbol, timeframe) -> CandleBuffer
+_lock = threading.Lock()
+
+
+class CandleBuffer:
+    """Últimos `capacity` candles em arrays NumPy (timestamp em ms + OHLCV float64)"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, timeframe_ms=None):
+        self.capacity = capacity
+        self.timeframe_ms = timeframe_ms  # Permite acrescentar lote que começa no candle seguinte
+        self._ts = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.zeros((len(COLUMNS), 2 * capacity), dtype=np.float64)  # Uma linha por coluna
+        self._start = 0
+        self._end = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return self._end - self._start
+
+    @property
+    def last_timestamp(self):
+        """Abertura do último candle (ms) ou None"""
+        return int(self._ts[self._end - 1]) if self._end > self._start else None
+
+    def clear(self):
+        with self.lock:
+            self._start = self._end = 0
+
+    def update(self, candles):
+        """
+        Aplica candles ccxt ([[ts, open, high, low, close, volume], ...], em ordem).
+        Candles anteriores ao último do buffer são ignorados (fechados, imutáveis); o de mesmo
+        timestamp é revisado e os seguintes acrescentados, assim como um lote que começa no
+        candle seguinte (last + timeframe). Lote que termina antes do último candle (atrasado)
+        é ignorado; só um buraco reinicia o buffer. Retorna quantas linhas foram gravadas.
+        """
+        if not candles:
+            return 0
+        with self.lock:
+            last = self.last_timestamp
+            if last is not None and candles[-1][0] < last:
+                return 0  # Nada novo: o buffer já está à frente deste lote
+            first = len(candles)
+            if last is not None:
+                while first > 0 and candles[first - 1][0] >= last:
+                    first -= 1
+            revise = last is not None and candles[first][0] == last
+            follows = (last is not None and self.timeframe_ms is not None
+                       and candles[first][0] == last + self.timeframe_ms)
+            if not (revise or follows):
+                self._start = self._end = 0
+                first = 0
+            rows = np.asarray(candles[first:][-self.capacity:], dtype=np.float64)
+            count = len(rows)
+
+            pos = self._end - 1 if revise else self._end
+            if pos + count > len(self._ts):
+                # Compacta: mantém os últimos candles no início dos arrays
+                keep = min(pos - self._start, self.capacity - count)
+                self._ts[:keep] = self._ts[pos - keep:pos]
+                self._values[:, :keep] = self._values[:, pos - keep:pos]
+                self._start, pos = 0, keep
+            self._ts[pos:pos + count] = rows[:, 0]
+            self._values[:, pos:pos + count] = rows[:, 1:].T
+            self._end = pos + count
+            self._start = max(self._start, self._end - self.capacity)
+            return count
+
+    def _bounds(self, n):
+        return (self._start if n is None else max(self._start, self._end - n)), self._end
+
+    def timestamps(self, n=None):
+        """Aberturas dos últimos n candles (view datetime64[ms])"""
+        lo, hi = self._bounds(n)
+        return self._ts[lo:hi].view('datetime64[ms]')
+
+    def column(self, name, n=None):
+        """Coluna OHLCV dos últimos n candles (view)"""
+        lo, hi = self._bounds(n)
+        return self._values[COLUMNS.index(name), lo:hi]
+
+    def arrays(self, n=None):
+        """{coluna: view} dos últimos n candles"""
+        lo, hi = self._bounds(n)
+        return {name: self._values[i, lo:hi] for i, name in enumerate(COLUMNS)}
+
+    def block(self, n=None):
+        """Matriz (colunas OHLCV × candles) dos últimos n candles (cópia) - para empilhar símbolos"""
+        with self.lock:
+            lo, hi = self._bounds(n)
+            return self._values[:, lo:hi].copy()
+
+    def frame(self, n=None):
+        """DataFrame (cópia) dos últimos n candles, no formato de davinci_bot.fetch_ohlcv"""
+        with self.lock:
+            lo, hi = self._bounds(n)
+            index = pd.DatetimeIndex(self._ts[lo:hi].view('datetime64[ms]'), name='timestamp')
+            return pd.DataFrame(self._values[:, lo:hi].T.copy(), columns=list(COLUMNS), index=index)
+
+
+def get_buffer(symbol, timeframe):
+    """Buffer do par (criado na primeira chamada; os menos usados são descartados)"""
+    key = (symbol, timeframe)
+    with _lock:
+        buffer = _buffers.get(key)
+        if buffer is None:
+            buffer = _buffers[key] = CandleBuffer(timeframe_ms=timeframe_to_ms(timeframe))
+            while len(_buffers) > MAX_BUFFERS:
+                _buffers.popitem(last=False)
+        _buffers.move_to_end(key)
+        return buffer
+
+
+def update_frame(symbol, timeframe, candles, limit=100):
+    """Aplica os candles no buffer do par e retorna o DataFrame dos últimos `limit`"""
+    buffer = get_buffer(symbol, timeframe)
+    with buffer.lock:
+        buffer.update(candles)
+        return buffer.frame(limit)
+
+
+def _fetch(exchange, symbol, timeframe, limit, read):
+    candles = ohlcv_cache.fetch_ohlcv(exchange, symbol, timeframe, limit=limit, copy=False)
+    if not candles:
+        return None
+    buffer = get_buffer(symbol, timeframe)
+    with buffer.lock:
+        buffer.update(candles)
+        return read(buffer, limit)
+
+
+def fetch_frame(exchange, symbol, timeframe, limit=100):
+    """ohlcv_cache.fetch_ohlcv + buffer: DataFrame dos últimos `limit` candles (None se vazio)"""
+    return _fetch(exchange, symbol, timeframe, limit, CandleBuffer.frame)
+
+
+def fetch_block(exchange, symbol, timeframe, limit=100):
+    """Como fetch_frame, mas retorna a matriz OHLCV (CandleBuffer.block) ou None"""
+    return _fetch(exchange, symbol, timeframe, limit, CandleBuffer.block)
+
+
+def _reference_frame(candles):
+    """Montagem antiga (lista ccxt -> DataFrame -> to_datetime -> set_index)"""
+    df = pd.DataFrame(candles, columns=['timestamp', *COLUMNS])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df.set_index('timestamp').astype(np.float64)
+
+
+def check(steps=3000, window=100, capacity=250, seed=7):
+    """
+    Simula os ticks (candle vivo revisado, candles fechando, buracos, lote antigo, só os
+    candles novos) e compara frame() com a montagem antiga. Capacidade pequena para passar
+    várias vezes pela compactação.
+    """
+    rng = np.random.default_rng(seed)
+    tf_ms = 300_000
+    candles = [[1_700_000_000_000 + i * tf_ms, 100.0, 101.0, 99.0, 100.0, 10.0] for i in range(window)]
+    buffer = CandleBuffer(capacity, timeframe_ms=tf_ms)
+    for step in range(steps):
+        action = rng.random()
+        if action < 0.5:
+            candles[-1] = candles[-1][:4] + [float(rng.uniform(99, 101)), candles[-1][5] + 1]
+        elif action < 0.9:
+            for _ in range(int(rng.integers(1, 4))):
+                candles.append([candles[-1][0] + tf_ms, 100.0, 101.0, 99.0, float(rng.uniform(99, 101)), 1.0])
+        elif action < 0.98:
+            # Só os candles seguintes ao último do buffer (acrescentados sem reiniciar)
+            new = int(rng.integers(1, 4))
+            for _ in range(new):
+                candles.append([candles[-1][0] + tf_ms, 100.0, 101.0, 99.0, float(rng.uniform(99, 101)), 1.0])
+            before = len(buffer)
+            assert buffer.update(candles[-new:]) == new
+            assert len(buffer) == min(capacity, before + new)
+        elif action < 0.99:
+            candles.append([candles[-1][0] + 10 * tf_ms, 100.0, 101.0, 99.0, 100.0, 1.0])  # Buraco
+        else:
+            assert buffer.update(candles[-2 * window:-window]) == 0  # Lote antigo (ignorado)
+        recent = candles[-window:]
+        buffer.update(recent)
+        got = buffer.frame(window)
+        expected = _reference_frame(recent)
+        pd.testing.assert_frame_equal(got, expected, check_index_type=True)
+        assert np.array_equal(buffer.column('close', window), expected['close'].to_numpy())
+    return steps
+
+
+if __name__ == '__main__':
+    print(f"✅ Buffer OK - {check()} ticks iguais à montagem com pandas")
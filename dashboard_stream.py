@@ -0,0 +1,182 @@
+"""
+dashboard_stream.py - Canal Server-Sent Events (/api/stream) para o dashboard
+
+Em vez de cada aba fazer polling de logs/operações/PnL/status a cada 5s, um único
+thread observador verifica as fontes (arquivos do bot e log de eventos) e publica
+só o que mudou para todas as conexões abertas:
+
+    event: logs        {"logs": [...], "cursor": ..., "reset": false}
+    event: operations  mesmo formato de /api/operations
+    event: pnl         mesmo formato de /api/pnl (sem consultar a Binance)
+    ...
+
+O observador só roda enquanto houver alguma aba conectada.
+"""
+import os
+import json
+import queue
+import time
+import threading
+
+POLL_INTERVAL = 1.0       # Verificação das fontes (só stat/leitura incremental)
+HEARTBEAT_INTERVAL = 15   # Comentário SSE para manter a conexão viva em proxies
+QUEUE_SIZE = 200          # Cliente atrasado além disso é desconectado (o navegador reconecta)
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class FileWatch:
+    """Fonte que publica build() quando o arquivo muda (inode/mtime/tamanho)"""
+
+    def __init__(self, path, event, build):
+        self.path = path
+        self.event = event
+        self.build = build
+        self._key = None
+
+    def _stat_key(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def reset(self):
+        self._key = self._stat_key()
+
+    def poll(self):
+        key = self._stat_key()
+        if key == self._key:
+            return []
+        self._key = key
+        return [(self.event, self.build())]
+
+
+class PeriodicWatch:
+    """Fonte recalculada a cada `interval` segundos, publicada só quando o valor muda"""
+
+    def __init__(self, event, build, interval):
+        self.event = event
+        self.build = build
+        self.interval = interval
+        self._next = 0.0
+        self._last = None
+
+    def poll(self):
+        now = time.time()
+        if now < self._next:
+            return []
+        self._next = now + self.interval
+        value = self.build()
+        if value == self._last:
+            return []
+        self._last = value
+        return [(self.event, value)]
+
+
+class Broadcaster:
+    """Publica mensagens das fontes para todas as conexões SSE"""
+
+    def __init__(self, sources, snapshot=None, interval=POLL_INTERVAL):
+        self.sources = sources
+        self.snapshot = snapshot      # Estado completo enviado a cada nova conexão
+        self.interval = interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='dashboard-stream', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event, data):
+        message = format_sse(event, data)
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(message)
+                except queue.Full:
+                    self._subscribers.discard(subscriber)
+
+    def _run(self):
+        # Fontes com cursor recomeçam do ponto atual (as conexões novas recebem o snapshot)
+        for source in self.sources:
+            if hasattr(source, 'reset'):
+                source.reset()
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            for source in self.sources:
+                try:
+                    for event, data in source.poll():
+                        self.publish(event, data)
+                except Exception as e:
+                    print(f"Erro no stream ({type(source).__name__}): {e}")
+            time.sleep(self.interval)
+
+    def stream(self):
+        """Gerador para Response(mimetype='text/event-stream') de uma conexão"""
+        subscriber = self.subscribe()
+        try:
+            if self.snapshot:
+                for event, data in self.snapshot():
+                    yield format_sse(event, data)
+            while True:
+                try:
+                    yield subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    if subscriber not in self._subscribers:
+                        return  # Removido por atraso: encerra para o navegador reconectar
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class LogWatch:
+    """Logs novos do dashboard e eventos tipados do bot (entrada/saída, tick, novo candle)"""
+
+    TICK_FIELDS = ('symbol', 'timeframe', 'price', 'in_position', 'side', 'pnl_percent')
+
+    def __init__(self, read_logs, read_events):
+        self.read_logs = read_logs      # cursor -> (logs, cursor, reset), mais recentes primeiro
+        self.read_events = read_events  # cursor -> (eventos, cursor, reset), mais recentes primeiro
+        self.reset()
+
+    def reset(self):
+        self._log_cursor = None
+        self._event_cursor = None
+
+    def poll(self):
+        messages = []
+
+        # Primeira leitura só posiciona o cursor (cada conexão recebe o snapshot completo)
+        started = self._log_cursor is not None
+        logs, self._log_cursor, reset = self.read_logs(self._log_cursor)
+        if started and (logs or reset):
+            messages.append(('logs', {"logs": logs, "cursor": self._log_cursor, "reset": reset}))
+
+        started = self._event_cursor is not None
+        events, self._event_cursor, reset = self.read_events(self._event_cursor)
+        if started and not reset:
+            for event in reversed(events):
+                name = event.get('event')
+                if name in ('entry', 'exit'):
+                    messages.append(('position', event))
+                elif name == 'tick':
+                    messages.append(('tick', {key: event.get(key) for key in self.TICK_FIELDS}))
+                    if event.get('new_candle'):
+                        messages.append(('candle', {"symbol": event.get('symbol'), "timeframe": event.get('timeframe')}))
+        return messages
@@ -3,12 +3,24 @@ import sys
 import time
 import json
 import logging
+import atexit
+import threading
 import numpy as np
 import pandas as pd
-import ta
-import ccxt
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+import indicator_engine
+import market_stream
+import exchange_session
+import candle_buffer
+import state_store
+import operation_closer
+import event_log
+import bot_control
+import supervisor
+import warm_start
+import scheduler
 
 # ===================== CONFIGURAÇÕES =====================
 load_dotenv()
@@ -16,6 +28,10 @@ load_dotenv()
 # --- Exchange --- Será inicializado após carregar o config
 exchange = None
 
+# --- Stream de mercado (WebSocket) --- Criado em get_stream() se USE_STREAM=true
+stream = None
+REST_RESEED_INTERVAL = 5  # Segundos entre reabastecimentos REST enquanto o stream se recupera
+
 # --- Carrega Configuração do Arquivo ---
 def load_config():
     """Carrega configuração do arquivo JSON ou cria um novo se não existir"""
@@ -83,7 +99,12 @@ def load_config():
             "EXIT_AFTER_MINUTES": 60,
             "USE_TIME_EXIT": False,
             "EXIT_ON_VOLUME_SPIKE": True,
-            "EXIT_VOLUME_MULTIPLIER": 2.0
+            "EXIT_VOLUME_MULTIPLIER": 2.0,
+            "USE_STREAM": False,
+            "STREAM_URL": "wss://fstream.binance.com",
+            "EXCHANGE_URL": "",
+            "SYMBOLS": [],
+            "SYMBOL_OVERRIDES": {}
         }
 
         # Salva o arquivo de configuração padrão
@@ -123,36 +144,20 @@ def load_config():
             "EXIT_AFTER_MINUTES": 60,
             "USE_TIME_EXIT": False,
             "EXIT_ON_VOLUME_SPIKE": True,
-            "EXIT_VOLUME_MULTIPLIER": 2.0
+            "EXIT_VOLUME_MULTIPLIER": 2.0,
+            "USE_STREAM": False,
+            "STREAM_URL": "wss://fstream.binance.com",
+            "EXCHANGE_URL": "",
+            "SYMBOLS": [],
+            "SYMBOL_OVERRIDES": {}
         }
 
-def load_demo_balance():
-    """Carrega saldo demo do arquivo JSON"""
-    try:
-        if os.path.exists('demo_balance.json'):
-            with open('demo_balance.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('balance', 1000.0)
-    except:
-        pass
-    return 1000.0
-
-def save_demo_balance(balance):
-    """Salva saldo demo no arquivo JSON"""
-    try:
-        with open('demo_balance.json', 'w', encoding='utf-8') as f:
-            json.dump({'balance': balance}, f, indent=4)
-        return True
-    except:
-        return False
-
 def initialize_files():
     """Inicializa arquivos necessários se não existirem"""
     # Cria operations.json se não existir
-    if not os.path.exists('operations.json'):
+    if not state_store.exists():
         try:
-            with open('operations.json', 'w', encoding='utf-8') as f:
-                json.dump({"open_operations": [], "closed_operations": []}, f, indent=4, ensure_ascii=False)
+            state_store.save_operations(state_store.empty_state())
             log.info("✅ operations.json criado")
         except Exception as e:
             log.error(f"Erro ao criar operations.json: {e}")
@@ -176,6 +181,7 @@ def reload_config():
     global RSI_LONG, RSI_SHORT, USE_VOL, USE_ADX, ADX_THRESH, STOP_LOSS, TAKE_PROFIT, TRAILING_STOP
     global USE_FIXED_EXIT, USE_TRAILING, EXIT_RSI_LONG, EXIT_RSI_SHORT, USE_EXIT_RSI, EXIT_ADX_THRESHOLD
     global USE_EXIT_ADX, EXIT_AFTER_MINUTES, USE_TIME_EXIT, EXIT_ON_VOLUME_SPIKE, EXIT_VOLUME_MULTIPLIER
+    global USE_STREAM, STREAM_URL, SYMBOLS, SYMBOL_OVERRIDES
 
     config = load_config()
     SYMBOL = config.get('SYMBOL', 'BTC/USDT')
@@ -210,6 +216,15 @@ def reload_config():
     EXIT_ON_VOLUME_SPIKE = config.get('EXIT_ON_VOLUME_SPIKE', True)
     EXIT_VOLUME_MULTIPLIER = config.get('EXIT_VOLUME_MULTIPLIER', 2.0)
 
+    # Market data via WebSocket (fallback automático para REST)
+    USE_STREAM = config.get('USE_STREAM', False)
+    STREAM_URL = config.get('STREAM_URL', market_stream.DEFAULT_STREAM_URL)
+
+    # Modo portfólio: lista de símbolos operados no mesmo processo (vazio = só SYMBOL)
+    # SYMBOL_OVERRIDES: {"ETH/USDT": {"LEVERAGE": 5, "TIMEFRAME": "15m"}, ...}
+    SYMBOLS = [s for s in config.get('SYMBOLS', []) if isinstance(s, str) and '/' in s]
+    SYMBOL_OVERRIDES = config.get('SYMBOL_OVERRIDES', {}) or {}
+
 # Carrega configuração inicial
 config = load_config()
 reload_config()
@@ -226,6 +241,11 @@ VOL_MULT = 1.05
 USE_VWAP = False  # FILTRO VWAP REMOVIDO (não usado no TradingView)
 ADX_LEN = 10
 TRAIL_OFFSET = config.get('TRAILING_STOP', 0.005)  # 0.5% (TradingView: trailOffsetPerc)
+INDICATOR_PARAMS = {
+    'EMA_SHORT': EMA_SHORT, 'EMA_MID': EMA_MID, 'RSI_LEN': RSI_LEN,
+    'MACD_FAST': MACD_FAST, 'MACD_SLOW': MACD_SLOW, 'MACD_SIGNAL': MACD_SIGNAL,
+    'ADX_LEN': ADX_LEN, 'VOL_LEN': 20, 'VOL_MULT': VOL_MULT,
+}
 
 # --- Filtros de Saída Adicionais ---
 # Todas as variáveis de configuração são carregadas dinamicamente na função reload_config()
@@ -241,6 +261,18 @@ last_candle_time = None
 last_signal_time = None  # Cooldown para evitar múltiplos sinais
 SIGNAL_COOLDOWN = 300  # 5 minutos em segundos
 
+# --- Motor em execução (canal de controle) ---
+engine_lock = threading.RLock()  # Tick e comandos do canal de controle não rodam ao mesmo tempo
+last_prices = {}                 # Último preço visto por símbolo (ticks/stream), para o PnL sem REST
+last_price_times = {}            # Quando cada preço de last_prices foi visto
+PRICE_MAX_AGE = 10               # Segundos: preço visto no tick dispensa ticker REST no PnL
+active_portfolio = None          # Portfolio em execução (modo portfólio)
+control_server = None
+
+# --- Agenda dos ticks (relógio da exchange) ---
+clock = scheduler.ExchangeClock(lambda: exchange or exchange_session.get_exchange())
+tick_skew_ms = None              # Atraso do tick atual em relação ao horário agendado
+
 # --- Logging ---
 # Configura encoding para UTF-8 no Windows
 if sys.platform == 'win32':
@@ -253,7 +285,8 @@ logging.basicConfig(
     format='%(asctime)s | %(levelname)s | %(message)s',
     handlers=[
         logging.FileHandler("davinci_bot.log", encoding='utf-8'),
-        logging.StreamHandler()
+        logging.StreamHandler(),
+        event_log.create_handler()  # bot_events.jsonl (eventos tipados para a interface)
     ]
 )
 log = logging.getLogger()
@@ -288,62 +321,56 @@ def get_balance():
             return 0
     else:
         # Modo Demo
-        demo_balance = load_demo_balance()
+        demo_balance = operation_closer.load_demo_balance()
         log.info(f"Saldo Demo ({get_log_mode()}): ${demo_balance:.2f}")
         return demo_balance
 
-def fetch_ohlcv():
+def fetch_ohlcv(symbol=None, timeframe=None):
+    """Candles do símbolo/timeframe (padrão: SYMBOL/TIMEFRAME do config) como DataFrame"""
     global exchange
+    symbol = symbol or SYMBOL
+    timeframe = timeframe or TIMEFRAME
     try:
-        # Inicializa exchange se ainda não foi criado
+        # Cliente compartilhado do processo (markets em cache no disco)
         if exchange is None:
-            exchange = ccxt.binance({
-                'enableRateLimit': True,
-                'options': {'defaultType': 'future'},
-                'timeout': 15000,
-            })
-            exchange.load_markets()
+            exchange = exchange_session.get_exchange()
         
         # Verifica timeframe válido para Binance
         valid_timeframes = exchange.timeframes
-        if TIMEFRAME not in valid_timeframes:
-            log.error(f"Timeframe inválido: {TIMEFRAME}. Use um de: {list(valid_timeframes.keys())[:10]}")
+        if timeframe not in valid_timeframes:
+            log.error(f"Timeframe inválido: {timeframe}. Use um de: {list(valid_timeframes.keys())[:10]}")
             return None
         
-        ohlcv = exchange.fetch_ohlcv(SYMBOL, TIMEFRAME, limit=100)
+        # Cache compartilhado (só o candle vivo é buscado de novo) + buffer NumPy do par
+        # (só as linhas novas/revisadas são gravadas)
+        df = candle_buffer.fetch_frame(exchange, symbol, timeframe, limit=100)
 
         # Validação dos dados recebidos
-        if not ohlcv or len(ohlcv) < 50:
-            log.error(f"Dados insuficientes: {len(ohlcv) if ohlcv else 0} candles")
+        if df is None or len(df) < 50:
+            log.error(f"Dados insuficientes: {len(df) if df is not None else 0} candles")
             return None
 
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df.set_index('timestamp', inplace=True)
-
         # Validação dos intervals dos candles
         if len(df) > 1:
-            last_candle = df.iloc[-1]
-            second_last_candle = df.iloc[-2]
-            time_diff = last_candle.name - second_last_candle.name
+            time_diff = df.index[-1] - df.index[-2]
             
             # Converte timeframe para Timedelta (suporta m, h, d)
             try:
-                if 'm' in TIMEFRAME:
-                    minutes = int(TIMEFRAME.replace('m', ''))
+                if 'm' in timeframe:
+                    minutes = int(timeframe.replace('m', ''))
                     expected_diff = pd.Timedelta(minutes=minutes)
-                elif 'h' in TIMEFRAME:
-                    hours = int(TIMEFRAME.replace('h', ''))
+                elif 'h' in timeframe:
+                    hours = int(timeframe.replace('h', ''))
                     expected_diff = pd.Timedelta(hours=hours)
-                elif 'd' in TIMEFRAME:
-                    days = int(TIMEFRAME.replace('d', ''))
+                elif 'd' in timeframe:
+                    days = int(timeframe.replace('d', ''))
                     expected_diff = pd.Timedelta(days=days)
                 else:
                     # Fallback: assume minutos
                     expected_diff = pd.Timedelta(minutes=5)
-                    log.warning(f"Formato de timeframe não reconhecido: {TIMEFRAME}, usando 5min como padrão")
+                    log.warning(f"Formato de timeframe não reconhecido: {timeframe}, usando 5min como padrão")
             except (ValueError, AttributeError) as e:
-                log.warning(f"Erro ao parsear timeframe: {TIMEFRAME}, pulando validação de gap: {e}")
+                log.warning(f"Erro ao parsear timeframe: {timeframe}, pulando validação de gap: {e}")
                 expected_diff = None
             
             if expected_diff and abs(time_diff - expected_diff) > pd.Timedelta(minutes=1):
@@ -354,108 +381,64 @@ def fetch_ohlcv():
         log.error(f"Erro ao buscar OHLCV: {e}")
         return None
 
+def get_stream():
+    """Retorna o stream de mercado ativo, recriando se símbolo/timeframe/URL mudaram"""
+    global stream
+    if not USE_STREAM:
+        if stream:
+            stream.stop()
+            stream = None
+        return None
+
+    if stream is None or stream.symbol != SYMBOL or stream.timeframe != TIMEFRAME or stream.url != STREAM_URL.rstrip('/'):
+        if stream:
+            stream.stop()
+        try:
+            stream = market_stream.MarketStream(SYMBOL, TIMEFRAME, STREAM_URL)
+            stream.start()
+            log.info(f"[STREAM] Modo streaming ativo: {SYMBOL} {TIMEFRAME}")
+        except Exception as e:
+            log.error(f"Erro ao iniciar stream, usando REST: {e}")
+            stream = None
+    return stream
+
+def get_last_price(symbol):
+    """Último preço do símbolo: usa o stream se estiver saudável, senão ticker REST"""
+    if stream and stream.symbol == symbol:
+        price = stream.get_price()
+        if price:
+            return price
+    return exchange.fetch_ticker(symbol)['last']
+
 def calculate_indicators(df):
     if len(df) < 50:
         return df  # Evita erros em dados insuficientes
 
-    # EMA (usando cálculo manual como TradingView)
-    df['ema_short'] = df['close'].ewm(span=EMA_SHORT, adjust=False).mean()
-    df['ema_mid'] = df['close'].ewm(span=EMA_MID, adjust=False).mean()
-    
-    # RSI
-    df['rsi'] = ta.momentum.RSIIndicator(df['close'], RSI_LEN).rsi()
-    
-    # MACD - Conforme TradingView: macdLine = ema(close, fast) - ema(close, slow)
-    macd_fast_ema = df['close'].ewm(span=MACD_FAST, adjust=False).mean()
-    macd_slow_ema = df['close'].ewm(span=MACD_SLOW, adjust=False).mean()
-    macd_line = macd_fast_ema - macd_slow_ema
-    macd_signal = macd_line.ewm(span=MACD_SIGNAL, adjust=False).mean()
-    df['macd_hist'] = macd_line - macd_signal  # Histogram
-    df['macd_line'] = macd_line
-    df['macd_signal'] = macd_signal
-    
-    # ADX
+    # Engine incremental: só processa o candle vivo e os candles novos desde o último tick
+    # (as médias carregam o histórico completo, como no TradingView)
     try:
-        adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'], ADX_LEN)
-        df['adx'] = adx.adx()
-        df['plus_di'] = adx.adx_pos()
-        df['minus_di'] = adx.adx_neg()
-    except:
-        # Fallback se ADX não disponível
-        df['adx'] = 0
-        df['plus_di'] = 0
-        df['minus_di'] = 0
-    
-    # Volume MA - implementação manual
-    df['vol_ma'] = df['volume'].rolling(window=20).mean()
-    df['high_vol'] = df['volume'] > df['vol_ma'] * VOL_MULT
-
-    # VWAP Diário
-    daily = df.resample('1D').agg({
-        'open': 'first', 'high': 'max', 'low': 'min',
-        'close': 'last', 'volume': 'sum'
-    })
-    if not daily.empty and daily['volume'].sum() > 0:
-        cum_vol = daily['volume'].cumsum()
-        cum_vwap = (daily['close'] * daily['volume']).cumsum()
-        daily_vwap = cum_vwap / cum_vol
-        df['daily_vwap'] = daily_vwap.reindex(df.index, method='ffill').ffill()
-    else:
-        df['daily_vwap'] = df['close']
-
-    return df
+        engine = indicator_engine.get_engine(SYMBOL, TIMEFRAME, INDICATOR_PARAMS)
+        return engine.update(df)
+    except Exception as e:
+        log.warning(f"Erro na engine incremental, recalculando completo: {e}")
+        indicator_engine.get_engine(SYMBOL, TIMEFRAME, INDICATOR_PARAMS).reset()
+        return indicator_engine.calculate_indicators_full(df, INDICATOR_PARAMS)
 
 def is_new_candle(df):
+    """
+    Novo candle = horário de abertura do último candle (vem da exchange/stream, já no
+    limite do timeframe) maior que o último visto. Não depende do relógio local.
+    """
     global last_candle_time
     try:
         if df.empty:
             return False
 
-        # Pega o timestamp do último candle
-        last_timestamp = df.index[-1]
-
-        # Converte para UTC para evitar problemas de timezone
-        if last_timestamp.tz is None:
-            last_timestamp = last_timestamp.tz_localize('UTC')
-        else:
-            last_timestamp = last_timestamp.tz_convert('UTC')
-
-        # Usa o timeframe dinâmico do config
-        if TIMEFRAME.endswith('m'):
-            try:
-                minutes = int(TIMEFRAME.replace('m', ''))
-            except ValueError:
-                log.error(f"Erro ao parsear timeframe '{TIMEFRAME}' para minutos")
-                return False
-            # Calcula o início do candle (floor por minutos)
-            current_candle = last_timestamp.replace(
-                minute=(last_timestamp.minute // minutes) * minutes,
-                second=0,
-                microsecond=0
-            )
-        elif TIMEFRAME.endswith('h'):
-            try:
-                hours = int(TIMEFRAME.replace('h', ''))
-            except ValueError:
-                log.error(f"Erro ao parsear timeframe '{TIMEFRAME}' para horas")
-                return False
-            # Calcula o início do candle (floor por horas)
-            current_candle = last_timestamp.replace(
-                minute=0,
-                second=0,
-                microsecond=0
-            )
-            if hours > 1:
-                current_candle = current_candle.replace(
-                    hour=(last_timestamp.hour // hours) * hours
-                )
+        current_candle = df.index[-1]
+        if current_candle.tz is None:
+            current_candle = current_candle.tz_localize('UTC')
         else:
-            # Fallback para 1 minuto
-            current_candle = last_timestamp.replace(
-                minute=last_timestamp.minute,
-                second=0,
-                microsecond=0
-            )
+            current_candle = current_candle.tz_convert('UTC')
 
         # Verifica se é um novo candle
         if last_candle_time is None or current_candle > last_candle_time:
@@ -471,7 +454,7 @@ def is_new_candle(df):
             return True
         return False
 
-def generate_signal(df):
+def generate_signal(df, verbose=True):
     global last_signal_time
 
     if len(df) < 50:
@@ -502,7 +485,7 @@ def generate_signal(df):
     rsi_ok_short = last['rsi'] < RSI_SHORT  # RSI < 40 para SHORT
 
     # Log apenas quando há crossover/crossunder real
-    if crossover or crossunder:
+    if verbose and (crossover or crossunder):
         log.info(f"[SINAL] CROSSOVER={crossover} CROSSUNDER={crossunder} | RSI={last['rsi']:.1f} | Vol={vol_ok} | ADX={adx_ok}")
 
     # Sinais conforme TradingView com RSI
@@ -510,7 +493,7 @@ def generate_signal(df):
     short_signal = crossunder and vol_ok and adx_ok and downTrendShort and rsi_ok_short
 
     # Debug apenas quando sinal é bloqueado por filtros
-    if (crossover or crossunder) and not (long_signal or short_signal):
+    if verbose and (crossover or crossunder) and not (long_signal or short_signal):
         # Identifica quais filtros estão bloqueando
         blocked_filters = []
         if crossover:
@@ -533,7 +516,9 @@ def generate_signal(df):
                 blocked_filters.append("Tendência (preço precisa estar abaixo da EMA 21)")
         
         filters_msg = " | ".join(blocked_filters) if blocked_filters else "Filtros não identificados"
-        log.info(f"[BLOQUEADO] Sinal filtrado: {filters_msg}")
+        log.info(f"[BLOQUEADO] Sinal filtrado: {filters_msg}",
+                 extra=event_log.event('blocked', symbol=SYMBOL, side='long' if crossover else 'short',
+                                       filters=blocked_filters, price=last['close'], rsi=last['rsi'], adx=last['adx']))
 
     # Atualiza timestamp do último sinal se houver sinal válido
     if long_signal or short_signal:
@@ -541,79 +526,35 @@ def generate_signal(df):
 
     return long_signal, short_signal
 
-def save_operation_to_file(operation):
-    """Salva operação no arquivo operations.json e no histórico permanente"""
-    try:
-        if os.path.exists('operations.json'):
-            with open('operations.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        else:
-            data = {"open_operations": [], "closed_operations": []}
-        
-        if operation.get('status') == 'open':
-            data['open_operations'].append(operation)
-        else:
-            # Remove da lista aberta se existir
-            operation_id = operation.get('id')
-            if operation_id:
-                # Remove por ID (mais preciso)
-                data['open_operations'] = [op for op in data['open_operations'] if op.get('id') != operation_id]
-            else:
-                # Fallback: Remove por símbolo, lado e preço de entrada (caso ID não esteja disponível)
-                data['open_operations'] = [
-                    op for op in data['open_operations'] 
-                    if not (op.get('symbol') == operation.get('symbol') and 
-                           op.get('side') == operation.get('side') and
-                           abs(op.get('entry_price', 0) - operation.get('entry_price', 0)) < 0.01)
-                ]
-            data['closed_operations'].append(operation)
-            
-            # Salva no histórico permanente (arquivo separado)
-            try:
-                import operations_history
-                operations_history.save_to_history(operation)
-                # Cria backup do operations.json
-                operations_history.backup_operations_file()
-            except Exception as e:
-                log.warning(f"Erro ao salvar no histórico (não crítico): {e}")
-        
-        with open('operations.json', 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except Exception as e:
-        log.error(f"Erro ao salvar operação: {e}")
-
 def enter_position(side):
     global in_position, position_side, entry_price, entry_time, highest_price, lowest_price
     try:
         # VERIFICA se já existe operação aberta no mesmo símbolo antes de abrir nova
-        if os.path.exists('operations.json'):
-            try:
-                with open('operations.json', 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    open_ops = data.get('open_operations', [])
-                    # Verifica se já existe operação aberta no mesmo símbolo
-                    for op in open_ops:
-                        if op.get('symbol') == SYMBOL and op.get('status') == 'open':
-                            log.warning(f"⚠️ JÁ EXISTE OPERAÇÃO ABERTA para {SYMBOL} (ID: {op.get('id')}) - Ignorando nova entrada")
-                            # Sincroniza estado global com operação existente
-                            in_position = True
-                            position_side = op.get('side', '').lower()
-                            entry_price = op.get('entry_price', 0)
-                            # Tenta parsear entry_time se disponível
-                            try:
-                                if 'entry_date' in op and 'entry_time' in op:
-                                    entry_time_str = f"{op['entry_date']} {op['entry_time']}"
-                                    entry_time = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M')
-                                else:
-                                    entry_time = datetime.now()
-                            except:
-                                entry_time = datetime.now()
-                            return None
-            except Exception as e:
-                log.warning(f"Erro ao verificar operações existentes: {e}")
+        try:
+            open_ops = state_store.load_operations().get('open_operations', [])
+            # Verifica se já existe operação aberta no mesmo símbolo
+            for op in open_ops:
+                if op.get('symbol') == SYMBOL and op.get('status') == 'open':
+                    log.warning(f"⚠️ JÁ EXISTE OPERAÇÃO ABERTA para {SYMBOL} (ID: {op.get('id')}) - Ignorando nova entrada")
+                    # Sincroniza estado global com operação existente
+                    in_position = True
+                    position_side = op.get('side', '').lower()
+                    entry_price = op.get('entry_price', 0)
+                    highest_price, lowest_price = _peaks_from_operation(op)
+                    # Tenta parsear entry_time se disponível
+                    try:
+                        if 'entry_date' in op and 'entry_time' in op:
+                            entry_time_str = f"{op['entry_date']} {op['entry_time']}"
+                            entry_time = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M')
+                        else:
+                            entry_time = datetime.now()
+                    except:
+                        entry_time = datetime.now()
+                    return None
+        except Exception as e:
+            log.warning(f"Erro ao verificar operações existentes: {e}")
         
-        ticker = exchange.fetch_ticker(SYMBOL)
-        price = ticker['last']
+        price = get_last_price(SYMBOL)
         amount = (POSITION_SIZE_USD * LEVERAGE) / price
         
         # Apenas executa ordem real se NÃO estiver em modo Demo
@@ -640,6 +581,8 @@ def enter_position(side):
         in_position = True
         position_side = 'long' if side == 'buy' else 'short'
         
+        trailing_stop = price * (1 - TRAIL_OFFSET) if position_side == 'long' else price * (1 + TRAIL_OFFSET)
+
         # Salva operação aberta
         operation = {
             "id": int(time.time() * 1000),  # ID único
@@ -653,11 +596,16 @@ def enter_position(side):
             "entry_date": entry_time.strftime("%Y-%m-%d"),
             "pnl": 0.0,
             "pnl_percent": 0.0,
+            "highest_price": float(price),
+            "lowest_price": float(price),
+            "trailing_stop": round(float(trailing_stop), 4) if USE_TRAILING else None,
             "status": "open"
         }
-        save_operation_to_file(operation)
+        operation_closer.save_operation(operation)
         
-        log.info(f"ENTRADA {position_side.upper()} ({get_log_mode()}) | Preço: ${price:.2f} | Qtd: {amount:.6f}")
+        log.info(f"ENTRADA {position_side.upper()} ({get_log_mode()}) | Preço: ${price:.2f} | Qtd: {amount:.6f}",
+                 extra=event_log.event('entry', symbol=SYMBOL, side=position_side, price=price, quantity=amount,
+                                       leverage=LEVERAGE, mode=get_log_mode(), operation_id=operation['id']))
         return order
     except Exception as e:
         log.error(f"Erro ao entrar {side}: {e}")
@@ -677,7 +625,7 @@ def exit_position(reason="Manual"):
             # Modo REAL - executa ordem na Binance
             side = 'sell' if position_side == 'long' else 'buy'
             positions = exchange.fetch_positions([SYMBOL])
-            pos = next((p for p in positions if p['symbol'] == SYMBOL and float(p['contracts']) > 0), None)
+            pos = next((p for p in positions if p['symbol'].split(':')[0] == SYMBOL and float(p['contracts']) > 0), None)
 
             if not pos:
                 log.warning("Nenhuma posição aberta encontrada.")
@@ -692,22 +640,18 @@ def exit_position(reason="Manual"):
                 amount=exchange.amount_to_precision(SYMBOL, amount),
                 params={'reduceOnly': True}
             )
-            exit_price = exchange.fetch_ticker(SYMBOL)['last']
+            exit_price = get_last_price(SYMBOL)
         else:
             # Modo DEMO - simulação
-            ticker = exchange.fetch_ticker(SYMBOL) if exchange else {'last': entry_price}
-            exit_price = ticker['last']
+            exit_price = get_last_price(SYMBOL) if exchange else entry_price
             # Busca quantidade da operação aberta
-            if os.path.exists('operations.json'):
-                try:
-                    with open('operations.json', 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        for op in data['open_operations']:
-                            if op.get('status') == 'open' and op.get('symbol') == SYMBOL:
-                                amount = float(op.get('quantity', 0))
-                                break
-                except:
-                    amount = (POSITION_SIZE_USD * LEVERAGE) / entry_price
+            try:
+                for op in state_store.load_operations()['open_operations']:
+                    if op.get('status') == 'open' and op.get('symbol') == SYMBOL:
+                        amount = float(op.get('quantity', 0))
+                        break
+            except:
+                amount = (POSITION_SIZE_USD * LEVERAGE) / entry_price
 
         # Calcula PnL
         pnl = (exit_price - entry_price) / entry_price * 100 if position_side == 'long' else (entry_price - exit_price) / entry_price * 100
@@ -715,9 +659,9 @@ def exit_position(reason="Manual"):
 
         # Atualiza saldo demo se necessário
         if USE_DEMO and pnl_usd != 0:
-            current_balance = load_demo_balance()
+            current_balance = operation_closer.load_demo_balance()
             new_balance = current_balance + pnl_usd
-            save_demo_balance(new_balance)
+            operation_closer.save_demo_balance(new_balance)
             log.info(f"[DEMO] Saldo atualizado: ${new_balance:.2f} (PnL: ${pnl_usd:+.2f})")
 
         entry_time_str = entry_time.strftime("%H:%M") if entry_time else datetime.now().strftime("%H:%M")
@@ -729,19 +673,16 @@ def exit_position(reason="Manual"):
 
         # Busca o ID da operação aberta para poder removê-la corretamente
         operation_id = None
-        if os.path.exists('operations.json'):
-            try:
-                with open('operations.json', 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for op in data.get('open_operations', []):
-                        if (op.get('status') == 'open' and 
-                            op.get('symbol') == SYMBOL and 
-                            op.get('side') == position_side.upper() and
-                            abs(op.get('entry_price', 0) - entry_price) < 0.01):  # Mesmo preço de entrada
-                            operation_id = op.get('id')
-                            break
-            except:
-                pass
+        try:
+            for op in state_store.load_operations().get('open_operations', []):
+                if (op.get('status') == 'open' and 
+                    op.get('symbol') == SYMBOL and 
+                    op.get('side') == position_side.upper() and
+                    abs(op.get('entry_price', 0) - entry_price) < 0.01):  # Mesmo preço de entrada
+                    operation_id = op.get('id')
+                    break
+        except:
+            pass
 
         # Salva operação fechada
         operation = {
@@ -754,15 +695,19 @@ def exit_position(reason="Manual"):
             "leverage": LEVERAGE,
             "entry_time": entry_time_str,
             "exit_time": exit_time_str,
+            "exit_date": datetime.now().strftime("%Y-%m-%d"),
             "duration": duration_str,
             "pnl": float(pnl_usd),
             "pnl_percent": float(pnl),
             "reason": reason,
             "status": "closed"
         }
-        save_operation_to_file(operation)
+        operation_closer.save_operation(operation)
 
-        log.info(f"SAÍDA {position_side.upper()} ({get_log_mode()}) | {reason} | PnL: {pnl:+.2f}% | Preço: ${exit_price:.2f}")
+        log.info(f"SAÍDA {position_side.upper()} ({get_log_mode()}) | {reason} | PnL: {pnl:+.2f}% | Preço: ${exit_price:.2f}",
+                 extra=event_log.event('exit', symbol=SYMBOL, side=position_side, reason=reason, price=exit_price,
+                                       entry_price=entry_price, pnl=pnl_usd, pnl_percent=pnl, mode=get_log_mode(),
+                                       operation_id=operation_id))
         in_position = False
         position_side = None
         entry_price = 0.0
@@ -772,57 +717,112 @@ def exit_position(reason="Manual"):
         log.error(f"Erro ao sair da posição: {e}")
         return None
 
+def _peaks_from_operation(operation):
+    """(highest_price, lowest_price) gravados na operação; registros antigos usam a entrada"""
+    entry = operation.get('entry_price', 0)
+    return operation.get('highest_price') or entry, operation.get('lowest_price') or entry
+
+def _position_peaks(operation):
+    """
+    Picos do trailing da posição em memória que corresponde à operação, com o nível do
+    trailing stop usado na saída (None se o trailing está desligado). None se não é deste motor.
+    """
+    target, trail_offset, use_trailing = sys.modules[__name__], TRAIL_OFFSET, USE_TRAILING
+    if active_portfolio is not None:
+        target = active_portfolio.positions.get(operation.get('symbol'))
+        if target is None:
+            return None
+        trail_offset = target.overrides.get('TRAIL_OFFSET', TRAIL_OFFSET)
+        use_trailing = target.overrides.get('USE_TRAILING', USE_TRAILING)
+    elif operation.get('symbol') != SYMBOL:
+        return None
+    if not (target.in_position and (target.position_side or '').upper() == operation.get('side')
+            and abs(target.entry_price - operation.get('entry_price', 0)) < 0.01 and target.highest_price > 0):
+        return None
+    if operation.get('side') == 'LONG':
+        trailing = target.highest_price * (1 - trail_offset)
+    else:
+        trailing = target.lowest_price * (1 + trail_offset)
+    return {
+        'highest_price': float(target.highest_price),
+        'lowest_price': float(target.lowest_price),
+        'trailing_stop': round(float(trailing), 4) if use_trailing else None,
+    }
+
+def fetch_prices(symbols):
+    """
+    Preço atual de vários símbolos de uma vez: stream, preço visto no tick (até
+    PRICE_MAX_AGE segundos) e, para o que faltar, uma única chamada REST.
+    Símbolos sem preço ficam fora do resultado.
+    """
+    prices = {}
+    now = time.time()
+    for symbol in dict.fromkeys(symbols):
+        price = stream.get_price() if stream and stream.symbol == symbol else None
+        if not price and now - last_price_times.get(symbol, 0) <= PRICE_MAX_AGE:
+            price = last_prices.get(symbol)
+        if price:
+            prices[symbol] = float(price)
+
+    missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in prices]
+    if not missing:
+        return prices
+    try:
+        # Cliente compartilhado (modo real e demo usam o mesmo para dados de mercado)
+        client = exchange or exchange_session.get_exchange()
+        if len(missing) == 1:
+            tickers = {missing[0]: client.fetch_ticker(missing[0])}
+        else:
+            tickers = client.fetch_tickers(missing)
+        for symbol in missing:
+            # Chave do ccxt pode ser o símbolo do contrato (BTC/USDT:USDT)
+            ticker = tickers.get(symbol) or tickers.get(client.market(symbol)['symbol']) or {}
+            if ticker.get('last'):
+                prices[symbol] = float(ticker['last'])
+    except Exception as e:
+        log.debug(f"Erro ao buscar preços de {missing}: {e}")
+    return prices
+
+def calculate_pnl(open_ops, prices):
+    """
+    PnL das operações abertas numa passada vetorizada.
+    Retorna {id: {'current_price', 'pnl', 'pnl_percent'}} das operações com preço conhecido.
+    """
+    ops = [op for op in open_ops if prices.get(op.get('symbol')) and op.get('entry_price')]
+    if not ops:
+        return {}
+    price = np.array([prices[op['symbol']] for op in ops], dtype=float)
+    entry = np.array([op['entry_price'] for op in ops], dtype=float)
+    quantity = np.array([op.get('quantity', 0) for op in ops], dtype=float)
+    direction = np.array([1.0 if op.get('side') == 'LONG' else -1.0 for op in ops])
+    pnl_usd = (price - entry) * quantity * direction
+    pnl_percent = (price - entry) / entry * 100 * direction
+    return {
+        op.get('id'): {'current_price': float(price[i]), 'pnl': float(pnl_usd[i]), 'pnl_percent': float(pnl_percent[i])}
+        for i, op in enumerate(ops)
+    }
+
 def update_open_operations_pnl():
-    """Atualiza PnL das operações abertas em tempo real"""
+    """Atualiza PnL das operações abertas em tempo real (um lote de preços para todas)"""
     try:
-        if not os.path.exists('operations.json'):
+        # Snapshot sem lock: as buscas de preço não seguram o arquivo
+        open_ops = state_store.load_operations()['open_operations']
+        if not open_ops:
             return
 
-        with open('operations.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
-        updated = False
-        for op in data['open_operations']:
-            try:
-                current_price = 0.0
-                if not USE_DEMO and exchange:
-                    # Modo REAL - busca preço da Binance
-                    ticker = exchange.fetch_ticker(op['symbol'])
-                    current_price = ticker['last']
-                else:
-                    # Modo DEMO - busca preço simulado
-                    try:
-                        # Inicializa exchange apenas para dados de mercado
-                        temp_exchange = ccxt.binance({
-                            'enableRateLimit': True,
-                            'options': {'defaultType': 'future'},
-                            'timeout': 10000
-                        })
-                        ticker = temp_exchange.fetch_ticker(op['symbol'])
-                        current_price = ticker['last']
-                    except:
-                        # Fallback: usa último preço salvo
-                        current_price = op.get('current_price', op['entry_price'])
-
-                # Calcula PnL
-                if op['side'] == 'LONG':
-                    pnl = (current_price - op['entry_price']) / op['entry_price'] * 100
-                    pnl_usd = (current_price - op['entry_price']) * op['quantity']
-                else:  # SHORT
-                    pnl = (op['entry_price'] - current_price) / op['entry_price'] * 100
-                    pnl_usd = (op['entry_price'] - current_price) * op['quantity']
-
-                op['current_price'] = float(current_price)
-                op['pnl'] = float(pnl_usd)
-                op['pnl_percent'] = float(pnl)
-                updated = True
-            except Exception as e:
-                log.debug(f"Erro ao atualizar PnL da operação: {e}")
-                pass
-
-        if updated:
-            with open('operations.json', 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+        updates = calculate_pnl(open_ops, fetch_prices([op['symbol'] for op in open_ops]))
+        for op in open_ops:
+            # Picos do trailing vão na mesma gravação do PnL (sem escrita extra por tick)
+            peaks = _position_peaks(op)
+            if peaks:
+                updates.setdefault(op.get('id'), {}).update(peaks)
+
+        if updates:
+            # Aplica por ID: operações fechadas pela interface web nesse meio tempo não voltam
+            with state_store.transaction() as data:
+                for op in data['open_operations']:
+                    if op.get('id') in updates:
+                        op.update(updates[op.get('id')])
     except Exception as e:
         log.debug(f"Erro em update_open_operations_pnl: {e}")
         pass  # Silently fail
@@ -832,10 +832,7 @@ def cleanup_open_operations():
     global in_position, position_side, entry_price, entry_time
 
     try:
-        if os.path.exists('operations.json'):
-            with open('operations.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
+        with state_store.transaction() as data:
             open_ops = data.get('open_operations', [])
             if open_ops:
                 log.warning(f"Encontradas {len(open_ops)} operações abertas ao iniciar. Limpando estado...")
@@ -845,6 +842,7 @@ def cleanup_open_operations():
                     op['status'] = 'closed'
                     op['reason'] = 'Cleanup Bot Restart'
                     op['exit_time'] = datetime.now().strftime('%H:%M')
+                    op['exit_date'] = datetime.now().strftime('%Y-%m-%d')
                     op['exit_price'] = op.get('current_price', op.get('entry_price'))
 
                     # Calcula PnL final
@@ -859,31 +857,27 @@ def cleanup_open_operations():
                     op['pnl_percent'] = float(pnl)
 
                     data['closed_operations'].append(op)
-                    
-                    # Salva no histórico permanente também
-                    try:
-                        import operations_history
-                        operations_history.save_to_history(op)
-                    except:
-                        pass  # Não crítico
-                    
                     log.info(f"Operação limpa: {op['side']} {op['symbol']} | PnL: ${pnl_usd:+.2f} ({pnl:+.2f}%)")
 
-                # Limpa operações abertas
+                # Limpa operações abertas (arquivo salvo ao sair do bloco)
                 data['open_operations'] = []
 
-                # Salva arquivo atualizado
-                with open('operations.json', 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=4, ensure_ascii=False)
-                
-                # Cria backup após cleanup
-                try:
-                    import operations_history
-                    operations_history.backup_operations_file()
-                except:
-                    pass
+        if open_ops:
+            # Salva no histórico permanente também (uma transação para todas)
+            try:
+                import operations_history
+                operations_history.save_many_to_history(open_ops)
+            except:
+                pass  # Não crítico
 
-                log.info("Estado das operações limpo com sucesso!")
+            # Cria backup após cleanup
+            try:
+                import operations_history
+                operations_history.backup_operations_file()
+            except:
+                pass
+
+            log.info("Estado das operações limpo com sucesso!")
 
         # Reseta estado global
         in_position = False
@@ -898,38 +892,37 @@ def cleanup_open_operations():
 
 def sync_position_from_file():
     """Sincroniza estado global in_position com operações abertas no arquivo"""
-    global in_position, position_side, entry_price, entry_time
+    global in_position, position_side, entry_price, entry_time, highest_price, lowest_price
     
     try:
-        if os.path.exists('operations.json'):
-            with open('operations.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                open_ops = data.get('open_operations', [])
-                
-                # Verifica se há operação aberta para o símbolo atual
-                for op in open_ops:
-                    if op.get('symbol') == SYMBOL and op.get('status') == 'open':
-                        in_position = True
-                        position_side = op.get('side', '').lower()
-                        entry_price = op.get('entry_price', 0)
-                        # Tenta parsear entry_time se disponível
-                        try:
-                            if 'entry_date' in op and 'entry_time' in op:
-                                entry_time_str = f"{op['entry_date']} {op['entry_time']}"
-                                entry_time = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M')
-                            else:
-                                entry_time = datetime.now()
-                        except:
+        if state_store.exists():
+            open_ops = state_store.load_operations().get('open_operations', [])
+
+            # Verifica se há operação aberta para o símbolo atual
+            for op in open_ops:
+                if op.get('symbol') == SYMBOL and op.get('status') == 'open':
+                    in_position = True
+                    position_side = op.get('side', '').lower()
+                    entry_price = op.get('entry_price', 0)
+                    highest_price, lowest_price = _peaks_from_operation(op)
+                    # Tenta parsear entry_time se disponível
+                    try:
+                        if 'entry_date' in op and 'entry_time' in op:
+                            entry_time_str = f"{op['entry_date']} {op['entry_time']}"
+                            entry_time = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M')
+                        else:
                             entry_time = datetime.now()
-                        log.info(f"🔄 Estado sincronizado: {SYMBOL} {position_side.upper()} | Entry: ${entry_price:.2f}")
-                        return
-                
-                # Se não encontrou operação aberta, garante que estado está limpo
-                if not any(op.get('symbol') == SYMBOL for op in open_ops):
-                    in_position = False
-                    position_side = None
-                    entry_price = 0.0
-                    entry_time = None
+                    except:
+                        entry_time = datetime.now()
+                    log.info(f"🔄 Estado sincronizado: {SYMBOL} {position_side.upper()} | Entry: ${entry_price:.2f}")
+                    return
+
+            # Se não encontrou operação aberta, garante que estado está limpo
+            if not any(op.get('symbol') == SYMBOL for op in open_ops):
+                in_position = False
+                position_side = None
+                entry_price = 0.0
+                entry_time = None
     except Exception as e:
         log.warning(f"Erro ao sincronizar posição do arquivo: {e}")
 
@@ -1036,7 +1029,8 @@ def check_exit_conditions(df):
 
         if should_exit:
             reason = " | ".join(exit_reasons)
-            log.warning(f"[SAÍDA LONG] {reason}")
+            log.warning(f"[SAÍDA LONG] {reason}",
+                        extra=event_log.event('exit_signal', symbol=SYMBOL, side='long', reasons=exit_reasons, price=current_price))
             exit_position(reason=reason)
 
     elif position_side == 'short':
@@ -1133,15 +1127,218 @@ def check_exit_conditions(df):
 
         if should_exit:
             reason = " | ".join(exit_reasons)
-            log.warning(f"[SAÍDA SHORT] {reason}")
+            log.warning(f"[SAÍDA SHORT] {reason}",
+                        extra=event_log.event('exit_signal', symbol=SYMBOL, side='short', reasons=exit_reasons, price=current_price))
             exit_position(reason=reason)
 
+def process_tick(df, full_tick=True, update_pnl=True):
+    """
+    Avalia sinais e saídas sobre os candles atuais.
+    full_tick=True (a cada CHECK_INTERVAL) também loga o status e atualiza o PnL das
+    operações abertas; atualizações intermediárias do stream só avaliam entrada/saída.
+    update_pnl=False deixa a atualização de PnL para o chamador (modo portfólio faz
+    uma única atualização para todos os símbolos).
+    """
+    df = calculate_indicators(df)
+
+    last = df.iloc[-1]
+    prev = df.iloc[-2] if len(df) > 2 else df.iloc[-1]
+    last_price = last['close']
+    last_prices[SYMBOL] = float(last_price)
+    last_price_times[SYMBOL] = time.time()
+
+    is_new = is_new_candle(df)
+    long_sig, short_sig = generate_signal(df, verbose=full_tick)
+    crossover = prev['ema_short'] <= prev['ema_mid'] and last['ema_short'] > last['ema_mid']
+    crossunder = prev['ema_short'] >= prev['ema_mid'] and last['ema_short'] < last['ema_mid']
+
+    if full_tick:
+        # Log a cada minuto - sempre mostra status completo para monitoramento
+        status = f"POSICAO: {position_side.upper()} PnL: " if in_position else "SEM POSICAO"
+        open_pnl = None
+        if in_position:
+            try:
+                # Servido do cache em memória (o arquivo acabou de ser gravado pelo update de PnL)
+                for op in state_store.load_operations().get('open_operations', []):
+                    if op.get('symbol') == SYMBOL:
+                        status += f"${op.get('pnl', 0):+.2f} ({op.get('pnl_percent', 0):+.2f}%)"
+                        open_pnl = op.get('pnl_percent', 0)
+                        break
+            except:
+                pass
+
+        timestamp = datetime.now().strftime('%H:%M:%S')
+        log_line = f"[{timestamp}] {SYMBOL} ({TIMEFRAME}) | {status} | ${last_price:.2f}"
+        log_line += f" | EMA8={last['ema_short']:.2f} EMA21={last['ema_mid']:.2f}"
+        log_line += f" | RSI={last['rsi']:.1f} | ADX={last['adx']:.1f}"
+
+        if is_new:
+            log_line += " | [NOVO CANDLE]"
+        if tick_skew_ms is not None:
+            log_line += f" | Atraso: {tick_skew_ms:+.0f}ms"
+
+        log.info(log_line, extra=event_log.event(
+            'tick', symbol=SYMBOL, timeframe=TIMEFRAME, price=last_price,
+            ema_short=last['ema_short'], ema_mid=last['ema_mid'], rsi=last['rsi'], adx=last['adx'],
+            in_position=in_position, side=position_side, pnl_percent=open_pnl, new_candle=is_new,
+            skew_ms=tick_skew_ms))
+
+        # Logs apenas para eventos importantes
+        if crossover:
+            log.warning(f"*** CROSSOVER (LONG) *** EMA8 > EMA21 | Preço: ${last_price:.2f}",
+                        extra=event_log.event('signal', symbol=SYMBOL, side='long', price=last_price))
+        if crossunder:
+            log.warning(f"*** CROSSUNDER (SHORT) *** EMA8 < EMA21 | Preço: ${last_price:.2f}",
+                        extra=event_log.event('signal', symbol=SYMBOL, side='short', price=last_price))
+
+    if long_sig:
+        log.warning(f">>> ENTRADA LONG <<< Preço: ${last_price:.2f} | RSI: {last['rsi']:.1f}",
+                    extra=event_log.event('entry_signal', symbol=SYMBOL, side='long', price=last_price, rsi=last['rsi']))
+        if in_position:
+            log.info("--- IGNORADO: Posicao ativa ---")
+
+    if short_sig:
+        log.warning(f">>> ENTRADA SHORT <<< Preço: ${last_price:.2f} | RSI: {last['rsi']:.1f}",
+                    extra=event_log.event('entry_signal', symbol=SYMBOL, side='short', price=last_price, rsi=last['rsi']))
+        if in_position:
+            log.info("--- IGNORADO: Posicao ativa ---")
+
+    # Entra em posição quando detecta sinal
+    if long_sig and not in_position:
+        enter_position('buy')
+    elif short_sig and not in_position:
+        enter_position('sell')
+
+    check_exit_conditions(df)
+
+    # Atualiza PnL das operações abertas
+    if full_tick and update_pnl:
+        update_open_operations_pnl()
+
+def process_exit_tick(df):
+    """Só as saídas (cadência rápida entre ticks completos): sem sinais de entrada nem PnL"""
+    if not in_position:
+        return
+    df = calculate_indicators(df)
+    last_prices[SYMBOL] = float(df['close'].iloc[-1])
+    last_price_times[SYMBOL] = time.time()
+    check_exit_conditions(df)
+
+# ===================== CANAL DE CONTROLE =====================
+def pnl_snapshot():
+    """PnL das operações abertas com os últimos preços vistos pelo bot (sem chamadas à exchange)"""
+    open_ops = state_store.load_operations().get('open_operations', [])
+    prices = {}
+    for op in open_ops:
+        price = stream.get_price() if stream and stream.symbol == op.get('symbol') else None
+        price = price or last_prices.get(op.get('symbol'))
+        if price:
+            prices[op['symbol']] = price
+    updates = calculate_pnl(open_ops, prices)
+    for op in open_ops:
+        op.update(updates.get(op.get('id'), {}))  # Sem preço: mantém o último PnL gravado
+    return {"open_operations": open_ops, "time": time.time()}
+
+def _load_position_from_operation(operation):
+    """Carrega uma operação do arquivo nas globais de posição (para exit_position)"""
+    global in_position, position_side, entry_price, entry_time
+    in_position = True
+    position_side = operation['side'].lower()
+    entry_price = operation['entry_price']
+    try:
+        entry_time = datetime.strptime(f"{operation['entry_date']} {operation['entry_time']}", '%Y-%m-%d %H:%M')
+    except (KeyError, ValueError):
+        entry_time = None
+
+@contextmanager
+def _detached_position(symbol):
+    """Troca temporariamente SYMBOL e a posição (operação de outro símbolo/órfã), restaurando depois"""
+    module = sys.modules[__name__]
+    names = ('SYMBOL', 'in_position', 'position_side', 'entry_price', 'entry_time')
+    saved = {name: getattr(module, name) for name in names}
+    module.SYMBOL = symbol
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+def close_operation(operation_id, reason="Fechamento Manual pelo Usuário"):
+    """
+    Fecha uma operação aberta pelo ID no motor em execução.
+    Retorna (resultado de exit_position ou None, mensagem de erro).
+    """
+    with engine_lock:
+        operation = next((op for op in state_store.load_operations().get('open_operations', [])
+                          if op.get('id') == operation_id and op.get('status') == 'open'), None)
+        if operation is None:
+            return None, "Operação não encontrada ou já está fechada"
+
+        symbol = operation['symbol']
+        side = operation['side'].lower()
+        position = active_portfolio.positions.get(symbol) if active_portfolio else None
+        if position is not None:
+            context = active_portfolio.bind(position)
+        elif symbol == SYMBOL and in_position and position_side == side:
+            context = nullcontext()
+        else:
+            context = _detached_position(symbol)
+
+        with context:
+            if not (in_position and position_side == side and abs(entry_price - operation['entry_price']) < 0.01):
+                _load_position_from_operation(operation)
+            result = exit_position(reason=reason)
+        if not result:
+            return None, "Erro ao fechar operação"
+        return dict(result, symbol=symbol, side=operation['side']), None
+
+def _control_pnl(payload):
+    return 200, pnl_snapshot()
+
+def _control_close(payload):
+    try:
+        operation_id = int(payload.get('id'))
+    except (TypeError, ValueError):
+        return 400, {"success": False, "message": "id inválido"}
+    result, error = close_operation(operation_id, payload.get('reason') or "Fechamento Manual pelo Usuário")
+    if result:
+        return 200, result
+    return (404 if 'não encontrada' in error else 500), {"success": False, "message": error}
+
+def start_control_server():
+    """Inicia o canal de controle local usado pela interface web"""
+    global control_server
+    try:
+        control_server = bot_control.ControlServer({
+            ('GET', '/pnl'): _control_pnl,
+            ('POST', '/close'): _control_close,
+        }).start()
+        atexit.register(control_server.stop)
+    except Exception as e:
+        log.error(f"Erro ao iniciar canal de controle: {e}")
+
 # ===================== LOOP PRINCIPAL =====================
 def main():
-    log.info(f"DA VINCI SNIPER BOT INICIADO ({get_log_mode()})")
+    global tick_skew_ms
+    log.info(f"DA VINCI SNIPER BOT INICIADO ({get_log_mode()})",
+             extra=event_log.event('start', mode=get_log_mode(), symbol=SYMBOL, timeframe=TIMEFRAME))
 
     # Inicializa arquivos necessários
     initialize_files()
+    supervisor.register()
+    start_control_server()
+
+    # Warm start: engines, candles e estado das posições do último snapshot (se válido)
+    snapshot = warm_start.restore(get_log_mode())
+
+    from_portfolio = False
+    if SYMBOLS:
+        # Modo portfólio: N símbolos no mesmo processo. Retorna se SYMBOLS for esvaziado na
+        # interface (depois de fechar as posições): o bot segue no modo de um símbolo (SYMBOL)
+        import portfolio
+        portfolio.run(sys.modules[__name__], snapshot)
+        from_portfolio = True
+        snapshot = None
 
     log.info(f"Configuração: {SYMBOL} | Timeframe: {TIMEFRAME} | Tamanho: ${POSITION_SIZE_USD} | Alavancagem: {LEVERAGE}x")
 
@@ -1151,91 +1348,83 @@ def main():
     log.info(f"Saída RSI: {USE_EXIT_RSI} (Long:{EXIT_RSI_LONG} Short:{EXIT_RSI_SHORT}) | Saída ADX: {USE_EXIT_ADX} ({EXIT_ADX_THRESHOLD})")
     log.info(f"Saída Tempo: {USE_TIME_EXIT} ({EXIT_AFTER_MINUTES}min) | Volume Spike: {EXIT_ON_VOLUME_SPIKE} ({EXIT_VOLUME_MULTIPLIER}x)")
 
-    # Verifica e limpa operações abertas ao iniciar
-    cleanup_open_operations()
+    # Verifica e limpa operações abertas ao iniciar (exceto as retomadas pelo snapshot;
+    # vindo do portfólio não há o que limpar: as posições dele já foram fechadas)
+    if not from_portfolio and not warm_start.covers(snapshot, [SYMBOL]):
+        cleanup_open_operations()
 
     set_leverage()
     get_balance()
     
     # Sincroniza estado com operações abertas no arquivo (antes de iniciar loop)
     sync_position_from_file()
+    warm_start.restore_position(snapshot, SYMBOL, sys.modules[__name__])
+
+    schedule = scheduler.TickScheduler(clock, CHECK_INTERVAL)
+    last_rest_fetch = 0.0
+    stream_version = 0
+    active_stream = None
 
     while True:
+        full_tick = False
+        df = None
+        tick_error = None
         try:
-            # Recarrega configuração para pegar mudanças da interface
-            reload_config()
-
-            df = fetch_ohlcv()
-            if df is None or len(df) == 0:
-                time.sleep(CHECK_INTERVAL)
-                continue
-
-            df = calculate_indicators(df)
-
-            # VERIFICAÇÃO A CADA 1 MINUTO
-            last = df.iloc[-1]
-            prev = df.iloc[-2] if len(df) > 2 else df.iloc[-1]
-            last_price = last['close']
-
-            is_new = is_new_candle(df)
-            long_sig, short_sig = generate_signal(df)
-            crossover = prev['ema_short'] <= prev['ema_mid'] and last['ema_short'] > last['ema_mid']
-            crossunder = prev['ema_short'] >= prev['ema_mid'] and last['ema_short'] < last['ema_mid']
-
-            # Log a cada minuto - sempre mostra status completo para monitoramento
-            status = f"POSICAO: {position_side.upper()} PnL: " if in_position else "SEM POSICAO"
-            if in_position and os.path.exists('operations.json'):
-                try:
-                    with open('operations.json', 'r') as f:
-                        data = json.load(f)
-                        for op in data.get('open_operations', []):
-                            if op.get('symbol') == SYMBOL:
-                                status += f"${op.get('pnl', 0):+.2f} ({op.get('pnl_percent', 0):+.2f}%)"
-                                break
-                except:
-                    pass
-
-            timestamp = datetime.now().strftime('%H:%M:%S')
-            log_line = f"[{timestamp}] {SYMBOL} ({TIMEFRAME}) | {status} | ${last_price:.2f}"
-            log_line += f" | EMA8={last['ema_short']:.2f} EMA21={last['ema_mid']:.2f}"
-            log_line += f" | RSI={last['rsi']:.1f} | ADX={last['adx']:.1f}"
-
-            if is_new:
-                log_line += " | [NOVO CANDLE]"
-
-            log.info(log_line)
-
-            # Logs apenas para eventos importantes
-            if crossover:
-                log.warning(f"*** CROSSOVER (LONG) *** EMA8 > EMA21 | Preço: ${last_price:.2f}")
-            if crossunder:
-                log.warning(f"*** CROSSUNDER (SHORT) *** EMA8 < EMA21 | Preço: ${last_price:.2f}")
-
-            if long_sig:
-                log.warning(f">>> ENTRADA LONG <<< Preço: ${last_price:.2f} | RSI: {last['rsi']:.1f}")
-                if in_position:
-                    log.info("--- IGNORADO: Posicao ativa ---")
-
-            if short_sig:
-                log.warning(f">>> ENTRADA SHORT <<< Preço: ${last_price:.2f} | RSI: {last['rsi']:.1f}")
-                if in_position:
-                    log.info("--- IGNORADO: Posicao ativa ---")
-
-            # Entra em posição quando detecta sinal
-            if long_sig and not in_position:
-                enter_position('buy')
-            elif short_sig and not in_position:
-                enter_position('sell')
-
-            check_exit_conditions(df)
-
-            # Atualiza PnL das operações abertas
-            update_open_operations_pnl()
+            # Tick completo na grade do horário da exchange (inclui todo fechamento de candle);
+            # entre eles, com posição aberta, só saídas em cadência rápida
+            kind, skew = schedule.poll()
+            started = time.perf_counter()
+            full_tick = kind == 'full'
+            if full_tick:
+                tick_skew_ms = skew * 1000
+                # Recarrega configuração para pegar mudanças da interface
+                reload_config()
+
+            active_stream = get_stream()
+            streaming = active_stream is not None and active_stream.is_healthy()
+            # Com stream, as saídas já são avaliadas a cada atualização
+            exit_only = kind == 'exit' and in_position and not streaming
+            if streaming:
+                df = active_stream.to_dataframe()
+            elif full_tick or exit_only or (active_stream and active_stream.connected
+                                            and time.time() - last_rest_fetch >= REST_RESEED_INTERVAL):
+                # Fallback REST (stream desligado, desconectado ou com gap de candles)
+                last_rest_fetch = time.time()
+                df = fetch_ohlcv()
+                if active_stream and df is not None:
+                    active_stream.seed_dataframe(df)
+
+            if df is not None and len(df) > 0:
+                with engine_lock:
+                    if exit_only:
+                        process_exit_tick(df)
+                    else:
+                        process_tick(df, full_tick)
+                    if full_tick:
+                        warm_start.save(sys.modules[__name__], {SYMBOL: sys.modules[__name__]})
+                if exit_only:
+                    log.debug(f"[SAÍDAS] Verificação de {SYMBOL} com atraso de {skew * 1000:+.0f}ms")
 
         except Exception as e:
+            tick_error = str(e)
             log.error(f"Erro crítico no loop: {e}")
 
-        time.sleep(CHECK_INTERVAL)
+        if full_tick:
+            # Heartbeat em todo tick completo (como no portfólio): o bot está vivo mesmo sem candles,
+            # e last_fetch_ok/last_error mostram na interface por que o tick não avaliou sinais
+            fetch_ok = df is not None and len(df) > 0
+            if tick_error is None and not fetch_ok:
+                tick_error = "Sem candles (falha ao buscar OHLCV)"
+            supervisor.heartbeat(time.perf_counter() - started, CHECK_INTERVAL, symbol=SYMBOL,
+                                 mode=get_log_mode(), in_position=in_position, skew_ms=round(tick_skew_ms, 1),
+                                 last_fetch_ok=fetch_ok, last_error=tick_error)
+
+        # Espera a próxima atualização do stream ou o próximo tick agendado
+        wait = schedule.wait_time()
+        if active_stream:
+            stream_version = active_stream.wait_for_update(stream_version, wait)
+        else:
+            time.sleep(wait)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
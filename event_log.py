@@ -0,0 +1,107 @@
+"""
+event_log.py - Log estruturado de eventos do bot (JSONL com rotação por tamanho)
+
+Cada registro de log do bot também é gravado em bot_events.jsonl, uma linha JSON por
+evento. Os pontos importantes passam campos tipados via `extra`:
+
+    log.warning(f"ENTRADA LONG ...", extra=event_log.event('entry', side='long', price=price))
+
+Tipos: start, tick, signal, blocked, entry_signal, entry, exit_signal, exit, error.
+Registros sem evento explícito viram 'log' (ou 'error' se nível ERROR).
+A interface web lê este arquivo com cursor (log_tail) em vez de interpretar o texto.
+"""
+import json
+import logging
+import math
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+EVENTS_FILE = 'bot_events.jsonl'
+MAX_BYTES = 5 * 1024 * 1024  # Rotaciona a cada 5 MB
+BACKUP_COUNT = 3             # bot_events.jsonl.1 .. .3
+
+# Tipo de evento -> classe CSS do dashboard (side completa entry-/exit-/signal-)
+DASHBOARD_TYPES = {
+    'entry': 'entry', 'entry_signal': 'entry',
+    'exit': 'exit', 'exit_signal': 'exit',
+    'signal': 'signal',
+    'blocked': 'warning',
+    'error': 'error',
+    'start': 'success',
+}
+
+
+def event(name, **fields):
+    """Campos `extra` de um registro de log com evento tipado"""
+    return {'event': name, 'event_fields': fields}
+
+
+def _clean(value):
+    """Converte tipos numpy/pandas/datetime para JSON"""
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return value if not (isinstance(value, float) and not math.isfinite(value)) else None
+    if hasattr(value, 'item'):
+        return _clean(value.item())
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_clean(v) for v in value]
+    return str(value)
+
+
+class JsonEventFormatter(logging.Formatter):
+    def format(self, record):
+        name = getattr(record, 'event', None) or ('error' if record.levelno >= logging.ERROR else 'log')
+        payload = {
+            'ts': round(record.created, 3),
+            'time': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S,') + f"{int(record.msecs):03d}",
+            'level': record.levelname,
+            'event': name,
+            'message': record.getMessage(),
+        }
+        for key, value in getattr(record, 'event_fields', {}).items():
+            payload[key] = _clean(value)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def create_handler(path=EVENTS_FILE):
+    """Handler para adicionar ao logger do bot"""
+    handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8')
+    handler.setFormatter(JsonEventFormatter())
+    return handler
+
+
+def append(name, message, level=logging.INFO, path=EVENTS_FILE, **fields):
+    """Grava um evento direto no arquivo, fora do logger do bot (ex.: fechamento offline pela web)"""
+    record = logging.LogRecord(__name__, level, __file__, 0, message, None, None)
+    record.event, record.event_fields = name, fields
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(JsonEventFormatter().format(record) + '\n')
+    except OSError:
+        pass
+
+
+def parse_event(line):
+    """Linha JSONL -> entrada do dashboard (mesmo formato de log_tail.parse_line) com o evento completo"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    name = data.get('event', 'log')
+    kind = DASHBOARD_TYPES.get(name)
+    if kind in ('entry', 'exit', 'signal'):
+        kind = f"{kind}-{data.get('side', 'long')}"
+    elif kind is None:
+        level = data.get('level')
+        kind = 'error' if level in ('ERROR', 'CRITICAL') else 'warning' if level == 'WARNING' else 'info'
+    full_time = data.get('time', '')
+    return {
+        "message": data.get('message', ''),
+        "type": kind,
+        "time": full_time[11:19],
+        "full_time": full_time,
+        "event": data,
+    }
@@ -0,0 +1,205 @@
+"""
+exchange_session.py - Cliente ccxt compartilhado (bot, analyzer e interface web)
+
+Um único cliente Binance Futures por processo, com:
+  - pool de conexões HTTP (keep-alive, sem handshake TLS a cada requisição)
+  - metadados de mercado (load_markets) em cache no disco com TTL
+  - rate limit token bucket thread-safe compartilhado por todas as chamadas
+
+Com "EXCHANGE_URL" no bot_config.json (ex.: "http://127.0.0.1:8766") todas as URLs da API
+apontam para esse servidor - o fake local de fake_exchange_server.py - mantendo os caminhos.
+Nesse modo os candles não vão para o arquivo local e o cache de markets fica só em memória.
+"""
+import json
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import ccxt
+
+log = logging.getLogger(__name__)
+
+CONFIG_FILE = 'bot_config.json'
+MARKETS_CACHE_FILE = 'markets_cache.json'
+MARKETS_TTL = 6 * 3600       # Recarrega load_markets a cada 6h
+HTTP_TIMEOUT = 15000         # ms
+POOL_SIZE = 16               # Conexões HTTP mantidas abertas (>= threads do analyzer)
+RATE_LIMIT_PER_SEC = 20      # Peso/s (Binance Futures: 2400/min)
+RATE_LIMIT_BURST = 20
+
+_exchange = None
+_markets_loaded_at = 0.0
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class TokenBucket:
+    """Rate limiter token bucket compartilhado entre threads"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, cost=1, timeout=None):
+        """Consome `cost` tokens, esperando se necessário. Retorna False se estourar o timeout"""
+        cost = min(float(cost), self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return True
+                wait_time = (cost - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+rate_limiter = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Prazo para as chamadas feitas nesta thread: se o rate limit não liberar a
+    requisição antes do prazo, a chamada falha com ccxt.RequestTimeout.
+    """
+    previous = getattr(_local, 'deadline', None)
+    _local.deadline = time.monotonic() + seconds
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def _throttle(cost=None):
+    """Substitui Exchange.throttle do ccxt pelo token bucket compartilhado"""
+    limit = getattr(_local, 'deadline', None)
+    timeout = None if limit is None else max(0.0, limit - time.monotonic())
+    if not rate_limiter.acquire(1 if cost is None else cost, timeout=timeout):
+        raise ccxt.RequestTimeout('Prazo esgotado aguardando o rate limit')
+
+
+def _load_markets_cache():
+    """Lê markets do disco se o cache ainda estiver dentro do TTL"""
+    try:
+        if not os.path.exists(MARKETS_CACHE_FILE):
+            return None
+        with open(MARKETS_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if time.time() - cache.get('saved_at', 0) > MARKETS_TTL:
+            return None
+        return cache
+    except Exception as e:
+        log.warning(f"Cache de markets inválido, recarregando: {e}")
+        return None
+
+
+def _save_markets_cache(exchange):
+    try:
+        tmp_file = MARKETS_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'saved_at': time.time(),
+                'markets': exchange.markets,
+                'currencies': exchange.currencies,
+            }, f)
+        os.replace(tmp_file, MARKETS_CACHE_FILE)
+    except Exception as e:
+        log.warning(f"Erro ao salvar cache de markets (não crítico): {e}")
+
+
+def _load_markets(exchange):
+    """Carrega markets do cache em disco ou da API (e atualiza o cache)"""
+    global _markets_loaded_at
+    if is_fake(exchange):
+        # Markets do servidor fake não podem substituir o cache da Binance real
+        exchange.load_markets(reload=True)
+        _markets_loaded_at = time.time()
+        return
+    cache = _load_markets_cache()
+    if cache:
+        exchange.set_markets(cache['markets'], cache.get('currencies'))
+        _markets_loaded_at = cache['saved_at']
+        return
+    exchange.load_markets(reload=True)
+    _markets_loaded_at = time.time()
+    _save_markets_cache(exchange)
+
+
+def _exchange_url():
+    """EXCHANGE_URL do bot_config.json (vazio = Binance real)"""
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return (json.load(f).get('EXCHANGE_URL') or '').strip().rstrip('/')
+    except Exception:
+        return ''
+
+
+def _use_fake_server(exchange, base_url):
+    """Aponta todas as URLs da API para base_url (mesmos caminhos /fapi/v1, /api/v3...)"""
+    api = exchange.urls['api']
+    for name, url in api.items():
+        if isinstance(url, str):
+            api[name] = base_url + urlparse(url).path
+    # Endpoints assinados exigem chave: o servidor fake aceita qualquer uma
+    exchange.apiKey = exchange.apiKey or 'fake'
+    exchange.secret = exchange.secret or 'fake'
+    exchange.options['fetchMarkets'] = dict(exchange.options.get('fetchMarkets') or {}, types=['linear'])
+    exchange.options['fetchCurrencies'] = False
+    exchange.options['fakeServerUrl'] = base_url
+    log.warning(f"[EXCHANGE] Usando o servidor fake em {base_url} (EXCHANGE_URL) - nada vai para a Binance")
+
+
+def is_fake(exchange):
+    """True se o cliente aponta para o servidor fake (EXCHANGE_URL)"""
+    options = getattr(exchange, 'options', None)
+    return isinstance(options, dict) and bool(options.get('fakeServerUrl'))
+
+
+def _create_exchange():
+    from requests.adapters import HTTPAdapter
+
+    exchange = ccxt.binance({
+        'enableRateLimit': True,
+        'options': {'defaultType': 'future'},
+        'timeout': HTTP_TIMEOUT,
+    })
+    exchange.throttle = _throttle
+    exchange_url = _exchange_url()
+    if exchange_url:
+        _use_fake_server(exchange, exchange_url)
+
+    # Pool de conexões keep-alive compartilhado entre threads
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+    exchange.session.mount('https://', adapter)
+    exchange.session.mount('http://', adapter)
+    return exchange
+
+
+def get_exchange():
+    """Retorna o cliente Binance Futures do processo (criado na primeira chamada)"""
+    global _exchange, _markets_loaded_at
+    if _exchange is not None and time.time() - _markets_loaded_at < MARKETS_TTL:
+        return _exchange
+
+    with _lock:
+        if _exchange is None:
+            _exchange = _create_exchange()
+        if time.time() - _markets_loaded_at >= MARKETS_TTL:
+            try:
+                _load_markets(_exchange)
+            except Exception as e:
+                # Sem markets o ccxt ainda tenta carregar sob demanda; nova tentativa em 60s
+                _markets_loaded_at = time.time() - MARKETS_TTL + 60
+                log.error(f"Erro ao carregar markets: {e}")
+        return _exchange
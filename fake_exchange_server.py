@@ -0,0 +1,815 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor REST local que imita a API da Binance Futures (USDⓈ-M) para testes offline de
+carga e latência: o cliente ccxt compartilhado (exchange_session) fala com ele sem mudar
+nenhuma chamada do bot, do analyzer ou da interface web.
+
+Atende load_markets, fetch_ohlcv, fetch_ticker(s), fetch_time, fetch_balance,
+fetch_positions, set_leverage e create_order (ordens a mercado preenchidas na hora numa
+conta simulada em memória). Os preços sintéticos são uma função determinística do tempo
+por símbolo: o mesmo candle em qualquer requisição e todos os timeframes coerentes entre si.
+Com --archive os candles gravados em market_data/ (candle_archive) são reproduzidos em
+tempo real, deslocados por um múltiplo de 1 dia.
+
+Uso (numpy + biblioteca padrão):
+    python fake_exchange_server.py --port 8766 --latency 80 --jitter 40 --error-rate 0.02
+
+E no bot_config.json (vale na próxima vez que o processo criar o cliente):
+    "EXCHANGE_URL": "http://127.0.0.1:8766"
+
+Falhas simuladas:
+  --latency / --jitter          atraso de cada resposta (ms)
+  --slow-rate / --slow-latency  fração de respostas muito lentas (estouro do timeout do ccxt)
+  --error-rate                  fração de respostas 503 {"code": -1001} (erro interno da Binance)
+  --weight-limit                peso por minuto (cabeçalho X-MBX-USED-WEIGHT-1M); acima dele
+                                429 {"code": -1003} com Retry-After e, após --ban-after
+                                rejeições no mesmo minuto, 418 (IP banido) por --ban-seconds
+  --clock-offset                diferença do relógio do servidor (ms), para o ExchangeClock
+
+GET /__stats retorna os contadores por rota (requisições, erros, peso).
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+from market_stream import timeframe_to_ms
+
+DAY_MS = 86_400_000
+INTERVALS = ('1m', '3m', '5m', '15m', '30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d', '3d')
+KLINE_LIMIT = 1500            # Máximo por requisição (igual à Binance Futures)
+SAMPLES_PER_CANDLE = 24       # Pontos da curva sintética avaliados por candle (máxima/mínima)
+TICKER_TTL = 1.0              # Segundos em que os tickers calculados são reaproveitados
+TAKER_FEE = 0.0004
+MIN_NOTIONAL = 5.0
+MAX_LEVERAGE = 125
+
+# Universo padrão (inclui analyzer.SUPPORTED_SYMBOLS): base -> (preço inicial, volume diário em USDT)
+DEFAULT_MARKETS = {
+    'BTC': (65000.0, 12e9), 'ETH': (3200.0, 6e9), 'SOL': (150.0, 2e9), 'BNB': (580.0, 6e8),
+    'XRP': (0.55, 1e9), 'DOGE': (0.12, 9e8), 'ADA': (0.45, 3e8), 'AVAX': (30.0, 3e8),
+    'DOT': (6.5, 2e8), 'POL': (0.5, 1e8), 'LINK': (14.0, 3e8), 'UNI': (8.0, 1.5e8),
+    'AAVE': (95.0, 1.5e8), 'LTC': (80.0, 3e8), 'TRX': (0.12, 1e8), 'ATOM': (8.0, 1e8),
+    'NEAR': (5.0, 2e8), 'ARB': (0.9, 1.5e8), 'OP': (2.0, 1.2e8), 'SUI': (1.2, 4e8),
+}
+
+
+class ApiError(Exception):
+    """Erro no formato da Binance: HTTP `status` com corpo {"code": code, "msg": msg}"""
+
+    def __init__(self, status, code, msg, headers=None):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+        self.headers = headers or {}
+
+
+def _hash01(seed, index):
+    """Hash splitmix64 de inteiros para [0, 1): ruído reproduzível sem guardar estado"""
+    x = np.asarray(index, dtype=np.int64).astype(np.uint64) + np.uint64((seed * 0x9E3779B97F4A7C15) % (1 << 64))
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+
+
+def _decimals(step):
+    return max(0, -int(math.floor(math.log10(step) + 1e-9)))
+
+
+class SyntheticSource:
+    """
+    log(preço) = soma de senoides (períodos de 10 min a 30 dias, amplitude ~ raiz do período,
+    como num passeio aleatório) + ruído suave a cada 20s. Função só do tempo: qualquer
+    intervalo de qualquer timeframe pode ser recalculado e dá sempre o mesmo resultado.
+    """
+
+    NOISE_STEP_MS = 20_000
+    NOISE_AMPLITUDE = 0.0008
+
+    def __init__(self, symbol_id, base_price, daily_volume, daily_vol=0.03):
+        self.seed = zlib.crc32(symbol_id.encode())
+        rng = np.random.default_rng(self.seed)
+        periods = np.geomspace(600, 30 * 86400, 16)
+        self.freqs = 2 * np.pi / (periods * 1000)
+        self.amps = daily_vol * np.sqrt(periods / 86400) * rng.uniform(0.3, 0.7, len(periods))
+        self.phases = rng.uniform(0, 2 * np.pi, len(periods))
+        self.base_price = base_price
+        self.volume_per_ms = daily_volume / base_price / DAY_MS   # Em unidades do ativo base
+
+    def prices(self, ts):
+        ts = np.asarray(ts, dtype=np.float64)
+        wave = np.sin(np.multiply.outer(ts, self.freqs) + self.phases) @ self.amps
+        knots = ts / self.NOISE_STEP_MS
+        k = np.floor(knots)
+        frac = knots - k
+        frac = frac * frac * (3 - 2 * frac)
+        a, b = _hash01(self.seed, k), _hash01(self.seed, k + 1)
+        noise = (a + (b - a) * frac) * 2 - 1
+        return self.base_price * np.exp(wave + self.NOISE_AMPLITUDE * noise)
+
+    def price(self, now_ms):
+        return float(self.prices([now_ms])[0])
+
+    def klines(self, tf_ms, start, end, limit, now_ms):
+        """Candles com abertura entre start e end (ms), limitados a `limit` e ao candle vivo"""
+        end = min(end, now_ms)
+        if start is not None:
+            first = -(-start // tf_ms) * tf_ms
+            last = min(end - end % tf_ms, first + (limit - 1) * tf_ms)
+        else:
+            last = end - end % tf_ms
+            first = last - (limit - 1) * tf_ms
+        if last < first:
+            return np.empty(0, dtype=np.int64), np.empty((5, 0))
+        opens = np.arange(first, last + 1, tf_ms, dtype=np.int64)
+        closes = np.minimum(opens + tf_ms, now_ms)
+        grid = opens[:, None] + (closes - opens)[:, None] * np.linspace(0, 1, SAMPLES_PER_CANDLE)
+        path = self.prices(grid.ravel()).reshape(grid.shape)
+        o, c = path[:, 0], path[:, -1]
+        activity = 0.4 + 1.2 * _hash01(self.seed ^ tf_ms, opens // tf_ms)
+        spikes = np.where(_hash01(self.seed ^ (tf_ms * 7), opens // tf_ms) < 0.03, 4.0, 1.0)
+        volume = self.volume_per_ms * (closes - opens) * activity * spikes * (1 + 40 * np.abs(np.log(c / o)))
+        return opens, np.vstack([o, path.max(axis=1), path.min(axis=1), c, volume])
+
+
+class ArchiveSource:
+    """
+    Candles de candle_archive reproduzidos em tempo real: o timestamp gravado + `offset`
+    (múltiplo de 1 dia, mantém o alinhamento dos timeframes). Todos os timeframes são
+    agregados do mais fino arquivado; o candle vivo é interpolado entre abertura e
+    fechamento. Depois do fim do arquivo o preço fica parado no último fechamento.
+    """
+
+    def __init__(self, records, tf_ms, offset):
+        self.tf_ms = tf_ms
+        self.ts = records['timestamp'].astype(np.int64) + offset
+        self.values = np.vstack([records[name] for name in ('open', 'high', 'low', 'close', 'volume')])
+
+    def _base(self, lo, hi, now_ms):
+        """Candles base com abertura em [lo, hi] e já abertos em now_ms (o vivo parcial)"""
+        i = int(np.searchsorted(self.ts, lo, side='left'))
+        j = int(np.searchsorted(self.ts, min(hi, now_ms), side='right'))
+        ts, values = self.ts[i:j], self.values[:, i:j].copy()
+        if len(ts) and ts[-1] + self.tf_ms > now_ms:
+            frac = (now_ms - ts[-1]) / self.tf_ms
+            o, c = values[0, -1], values[0, -1] + (values[3, -1] - values[0, -1]) * frac
+            values[:, -1] = [o, max(o, c), min(o, c), c, values[4, -1] * frac]
+        return ts, values
+
+    def price(self, now_ms):
+        ts, values = self._base(now_ms - self.tf_ms, now_ms, now_ms)
+        if len(ts):
+            return float(values[3, -1])
+        j = int(np.searchsorted(self.ts, now_ms, side='right'))
+        return float(self.values[3, max(j - 1, 0)])
+
+    def klines(self, tf_ms, start, end, limit, now_ms):
+        if tf_ms < self.tf_ms or tf_ms % self.tf_ms:
+            return np.empty(0, dtype=np.int64), np.empty((5, 0))
+        if start is not None:
+            lo = -(-start // tf_ms) * tf_ms
+            hi = min(end, lo + limit * tf_ms - 1)
+        else:
+            hi = min(end, now_ms)
+            lo = hi - hi % tf_ms - (limit - 1) * tf_ms
+        ts, values = self._base(lo, hi, now_ms)
+        if not len(ts):
+            return ts, values
+        bucket = ts - ts % tf_ms
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        ends = np.r_[starts[1:], len(ts)] - 1
+        return bucket[starts], np.vstack([
+            values[0, starts], np.maximum.reduceat(values[1], starts), np.minimum.reduceat(values[2], starts),
+            values[3, ends], np.add.reduceat(values[4], starts),
+        ])
+
+
+class Market:
+    """Contrato perpétuo XXXUSDT: regras de preço/quantidade e a fonte de candles"""
+
+    def __init__(self, base, source, price):
+        self.id = f'{base}USDT'
+        self.base = base
+        self.source = source
+        magnitude = math.floor(math.log10(price))
+        self.tick = 10.0 ** max(magnitude - 5, -8)
+        self.step = 10.0 ** -min(3, max(0, magnitude))
+        self.price_decimals = _decimals(self.tick)
+        self.qty_decimals = _decimals(self.step)
+
+    def fmt_price(self, value):
+        return f'{value:.{self.price_decimals}f}'
+
+    def fmt_qty(self, value):
+        return f'{value:.{self.qty_decimals}f}'
+
+    def info(self):
+        """Entrada de /fapi/v1/exchangeInfo"""
+        tick, step = self.fmt_price(self.tick), self.fmt_qty(self.step)
+        return {
+            'symbol': self.id, 'pair': self.id, 'contractType': 'PERPETUAL',
+            'deliveryDate': 4133404800000, 'onboardDate': 1569398400000, 'status': 'TRADING',
+            'baseAsset': self.base, 'quoteAsset': 'USDT', 'marginAsset': 'USDT',
+            'pricePrecision': self.price_decimals, 'quantityPrecision': self.qty_decimals,
+            'baseAssetPrecision': 8, 'quotePrecision': 8, 'underlyingType': 'COIN',
+            'underlyingSubType': [], 'triggerProtect': '0.0500', 'liquidationFee': '0.012500',
+            'marketTakeBound': '0.05', 'maxMoveOrderLimit': 10000,
+            'filters': [
+                {'filterType': 'PRICE_FILTER', 'minPrice': tick, 'maxPrice': '10000000', 'tickSize': tick},
+                {'filterType': 'LOT_SIZE', 'minQty': step, 'maxQty': '10000000', 'stepSize': step},
+                {'filterType': 'MARKET_LOT_SIZE', 'minQty': step, 'maxQty': '1000000', 'stepSize': step},
+                {'filterType': 'MAX_NUM_ORDERS', 'limit': 200},
+                {'filterType': 'MIN_NOTIONAL', 'notional': f'{MIN_NOTIONAL:g}'},
+                {'filterType': 'PERCENT_PRICE', 'multiplierUp': '1.0500', 'multiplierDown': '0.9500',
+                 'multiplierDecimal': '4'},
+            ],
+            'orderTypes': ['LIMIT', 'MARKET', 'STOP', 'STOP_MARKET', 'TAKE_PROFIT',
+                           'TAKE_PROFIT_MARKET', 'TRAILING_STOP_MARKET'],
+            'timeInForce': ['GTC', 'IOC', 'FOK', 'GTX'],
+        }
+
+
+def synthetic_markets(extra=0):
+    """DEFAULT_MARKETS + `extra` contratos SYN0000USDT... (varreduras grandes do analyzer)"""
+    markets = {}
+    for base, (price, volume) in DEFAULT_MARKETS.items():
+        markets[base] = Market(base, SyntheticSource(f'{base}USDT', price, volume), price)
+    for i in range(extra):
+        base = f'SYN{i:04d}'
+        u = _hash01(zlib.crc32(base.encode()), np.arange(2))
+        price, volume = 10 ** (-2 + 6 * u[0]), 10 ** (6 + 2.5 * u[1])
+        markets[base] = Market(base, SyntheticSource(f'{base}USDT', price, volume), price)
+    return markets
+
+
+def archive_markets(replay_days, now_ms):
+    """
+    Contratos USDT de candle_archive (timeframe mais fino de cada símbolo), deslocados para
+    que o servidor comece `replay_days` antes do fim do arquivo. Retorna (markets, offset).
+    """
+    import candle_archive
+
+    finest = {}
+    for symbol, timeframe, count, first, last, holes in candle_archive.info():
+        base, _, quote = symbol.partition('/')
+        try:
+            tf_ms = timeframe_to_ms(timeframe)
+        except ValueError:
+            continue
+        if quote.split('_')[0] == 'USDT' and (base not in finest or tf_ms < finest[base][2]):
+            finest[base] = (symbol, timeframe, tf_ms, last)
+    if not finest:
+        return {}, 0
+
+    end = max(last for _, _, _, last in finest.values())
+    offset = -(-(now_ms - (end - int(replay_days * DAY_MS))) // DAY_MS) * DAY_MS
+    markets = {}
+    for base, (symbol, timeframe, tf_ms, _) in finest.items():
+        records = candle_archive.load(symbol, timeframe)
+        markets[base] = Market(base, ArchiveSource(records, tf_ms, offset), float(records['close'][-1]))
+    return markets, offset
+
+
+class Account:
+    """Conta de margem cruzada em USDT, modo one-way: carteira, alavancagem e posições"""
+
+    def __init__(self, balance, default_leverage=20):
+        self.wallet = float(balance)
+        self.default_leverage = default_leverage
+        self.leverage = {}        # id -> alavancagem
+        self.positions = {}       # id -> [quantidade com sinal, preço de entrada]
+        self.next_order_id = 1_000_000
+        self.lock = threading.Lock()
+
+    def totals(self, prices):
+        """(PnL não realizado, margem inicial das posições)"""
+        pnl = margin = 0.0
+        for symbol_id, (amount, entry) in self.positions.items():
+            mark = prices[symbol_id]
+            pnl += amount * (mark - entry)
+            margin += abs(amount) * mark / self.leverage.get(symbol_id, self.default_leverage)
+        return pnl, margin
+
+    def fill(self, market, side, quantity, reduce_only, price):
+        """Executa uma ordem a mercado ao preço `price`. Retorna (quantidade executada, PnL realizado)"""
+        with self.lock:
+            amount, entry = self.positions.get(market.id, (0.0, 0.0))
+            signed = quantity if side == 'BUY' else -quantity
+            if reduce_only:
+                if amount == 0 or (amount > 0) == (signed > 0):
+                    raise ApiError(400, -2022, 'ReduceOnly Order is rejected.')
+                signed = math.copysign(min(abs(signed), abs(amount)), signed)
+            elif abs(signed) * price < MIN_NOTIONAL:
+                raise ApiError(400, -4164, f"Order's notional must be no smaller than {MIN_NOTIONAL:g} "
+                                           "(unless you choose reduce only).")
+
+            new_amount = amount + signed
+            leverage = self.leverage.get(market.id, self.default_leverage)
+            added = max(0.0, abs(new_amount) - abs(amount))
+            fee = abs(signed) * price * TAKER_FEE
+            if added:
+                prices = {symbol_id: (price if symbol_id == market.id else pos[1])
+                          for symbol_id, pos in self.positions.items()}
+                pnl, margin = self.totals(prices)
+                if added * price / leverage + fee > self.wallet + pnl - margin:
+                    raise ApiError(400, -2019, 'Margin is insufficient.')
+
+            realized = 0.0
+            if amount and (amount > 0) != (signed > 0):
+                closed = min(abs(signed), abs(amount))
+                realized = closed * (price - entry) * (1 if amount > 0 else -1)
+            if abs(new_amount) < market.step / 2:
+                self.positions.pop(market.id, None)
+            elif amount == 0 or (amount > 0) != (new_amount > 0):
+                self.positions[market.id] = [new_amount, price]
+            elif abs(new_amount) > abs(amount):
+                self.positions[market.id] = [new_amount, (abs(amount) * entry + abs(signed) * price) / abs(new_amount)]
+            else:
+                self.positions[market.id] = [new_amount, entry]
+            self.wallet += realized - fee
+            self.next_order_id += 1
+            return abs(signed), realized
+
+
+class WeightLimiter:
+    """Peso por minuto de relógio, como a Binance (a janela zera na virada do minuto)"""
+
+    def __init__(self, limit=2400, ban_after=0, ban_seconds=120):
+        self.limit = limit
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        self.window = None
+        self.used = 0
+        self.rejected = 0
+        self.banned_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, weight, now_ms):
+        """Consome o peso da requisição ou levanta ApiError 429/418. Retorna o peso usado no minuto"""
+        with self.lock:
+            if now_ms < self.banned_until:
+                raise ApiError(418, -1003, f'Way too many requests; IP banned until {self.banned_until}. '
+                                           'Please use the websocket for live updates to avoid bans.',
+                               {'Retry-After': str(math.ceil((self.banned_until - now_ms) / 1000))})
+            window = now_ms // 60_000
+            if window != self.window:
+                self.window, self.used, self.rejected = window, 0, 0
+            if self.limit and self.used + weight > self.limit:
+                self.rejected += 1
+                if self.ban_after and self.rejected >= self.ban_after:
+                    self.banned_until = now_ms + self.ban_seconds * 1000
+                raise ApiError(429, -1003, f'Too many requests; current limit is {self.limit} request weight '
+                                           'per 1 MINUTE. Please use the websocket for live updates to avoid '
+                                           'polling the API.',
+                               {'Retry-After': str(math.ceil(((window + 1) * 60_000 - now_ms) / 1000)),
+                                'X-MBX-USED-WEIGHT-1M': str(self.used)})
+            self.used += weight
+            return self.used
+
+
+class FakeExchange:
+    """Estado do servidor (mercados, conta, tickers) e a resposta de cada endpoint"""
+
+    def __init__(self, markets, account, weight_limit=2400):
+        self.markets = {market.id: market for market in markets.values()}
+        self.account = account
+        self.weight_limit = weight_limit
+        self._symbols_info = [market.info() for market in self.markets.values()]
+        self._tickers = None
+        self._tickers_at = 0.0
+        self._tickers_lock = threading.Lock()
+
+    def _market(self, params):
+        market = self.markets.get(params.get('symbol', ''))
+        if market is None:
+            raise ApiError(400, -1121, 'Invalid symbol.')
+        return market
+
+    def _prices(self, now_ms):
+        return {symbol_id: self.markets[symbol_id].source.price(now_ms) for symbol_id in self.account.positions}
+
+    def authenticate(self, headers, params, now_ms):
+        """Endpoints assinados: exige API key, assinatura e timestamp dentro do recvWindow"""
+        if not headers.get('X-MBX-APIKEY'):
+            raise ApiError(401, -2014, 'API-key format invalid.')
+        if not params.get('signature') or not params.get('timestamp'):
+            raise ApiError(400, -1102, "Mandatory parameter 'signature' was not sent, was empty/null, or malformed.")
+        timestamp = int(params['timestamp'])
+        if timestamp > now_ms + 1000 or now_ms - timestamp > int(params.get('recvWindow', 5000)):
+            raise ApiError(400, -1021, 'Timestamp for this request is outside of the recvWindow.')
+
+    # --- Públicos ---
+
+    def ping(self, params, now_ms):
+        return {}
+
+    def server_time(self, params, now_ms):
+        return {'serverTime': now_ms}
+
+    def exchange_info(self, params, now_ms):
+        return {
+            'timezone': 'UTC', 'serverTime': now_ms, 'futuresType': 'U_MARGINED',
+            'rateLimits': [
+                {'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': self.weight_limit},
+                {'rateLimitType': 'ORDERS', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': 1200},
+            ],
+            'exchangeFilters': [],
+            'assets': [{'asset': 'USDT', 'marginAvailable': True, 'autoAssetExchange': '-10000'}],
+            'symbols': self._symbols_info,
+        }
+
+    def empty_exchange_info(self, params, now_ms):
+        """Spot e COIN-M: sem mercados (o servidor só simula USDⓈ-M)"""
+        return {'timezone': 'UTC', 'serverTime': now_ms, 'rateLimits': [], 'exchangeFilters': [], 'symbols': []}
+
+    def klines(self, params, now_ms):
+        market = self._market(params)
+        interval = params.get('interval')
+        if interval not in INTERVALS:
+            raise ApiError(400, -1120, 'Invalid interval.')
+        tf_ms = timeframe_to_ms(interval)
+        limit = min(int(params.get('limit', 500)), KLINE_LIMIT)
+        start = int(params['startTime']) if 'startTime' in params else None
+        end = int(params['endTime']) if 'endTime' in params else now_ms
+        opens, values = market.source.klines(tf_ms, start, end, limit, now_ms)
+        price, qty = market.fmt_price, market.fmt_qty
+        rows = []
+        for t, o, h, l, c, v in zip(opens.tolist(), *values.tolist()):
+            rows.append([t, price(o), price(h), price(l), price(c), qty(v), t + tf_ms - 1,
+                         f'{v * c:.4f}', max(1, int(v / market.step / 50)), qty(v / 2), f'{v * c / 2:.4f}', '0'])
+        return rows
+
+    def _ticker(self, market, now_ms):
+        opens, values = market.source.klines(3_600_000, now_ms - DAY_MS, now_ms, 25, now_ms)
+        if not len(opens):
+            last = market.source.price(now_ms)
+            values = np.array([[last], [last], [last], [last], [0.0]])
+            opens = np.array([now_ms - DAY_MS])
+        o, h, l, c = values[0, 0], values[1].max(), values[2].min(), values[3, -1]
+        volume = values[4].sum()
+        quote_volume = float((values[4] * values[3]).sum())
+        price = market.fmt_price
+        return {
+            'symbol': market.id, 'priceChange': price(c - o), 'priceChangePercent': f'{(c / o - 1) * 100:.3f}',
+            'weightedAvgPrice': price(quote_volume / volume if volume else c), 'lastPrice': price(c),
+            'lastQty': market.fmt_qty(market.step), 'openPrice': price(o), 'highPrice': price(h),
+            'lowPrice': price(l), 'volume': market.fmt_qty(volume), 'quoteVolume': f'{quote_volume:.2f}',
+            'openTime': int(opens[0]), 'closeTime': now_ms, 'firstId': 1, 'lastId': 1 + int(volume / market.step) // 50,
+            'count': int(volume / market.step) // 50,
+        }
+
+    def _all_tickers(self, now_ms):
+        """Tickers de todos os contratos (recalculados no máximo a cada TICKER_TTL)"""
+        with self._tickers_lock:
+            if self._tickers is None or time.monotonic() - self._tickers_at > TICKER_TTL:
+                self._tickers = {symbol_id: self._ticker(market, now_ms) for symbol_id, market in self.markets.items()}
+                self._tickers_at = time.monotonic()
+            return self._tickers
+
+    def ticker_24hr(self, params, now_ms):
+        if 'symbol' in params:
+            return self._ticker(self._market(params), now_ms)
+        return list(self._all_tickers(now_ms).values())
+
+    def ticker_price(self, params, now_ms):
+        if 'symbol' in params:
+            market = self._market(params)
+            return {'symbol': market.id, 'price': market.fmt_price(market.source.price(now_ms)), 'time': now_ms}
+        return [{'symbol': market.id, 'price': market.fmt_price(market.source.price(now_ms)), 'time': now_ms}
+                for market in self.markets.values()]
+
+    # --- Conta (assinados) ---
+
+    def leverage_bracket(self, params, now_ms):
+        markets = [self._market(params)] if 'symbol' in params else self.markets.values()
+        return [{'symbol': market.id, 'brackets': [{
+            'bracket': 1, 'initialLeverage': MAX_LEVERAGE, 'notionalCap': 50_000_000, 'notionalFloor': 0,
+            'maintMarginRatio': 0.004, 'cum': 0.0}]} for market in markets]
+
+    def _position(self, symbol_id, amount, entry, mark, now_ms):
+        market = self.markets[symbol_id]
+        leverage = self.account.leverage.get(symbol_id, self.account.default_leverage)
+        notional = amount * mark
+        margin = abs(notional) / leverage
+        return {
+            'symbol': symbol_id, 'positionSide': 'BOTH', 'positionAmt': market.fmt_qty(amount),
+            'entryPrice': market.fmt_price(entry), 'breakEvenPrice': market.fmt_price(entry),
+            'markPrice': market.fmt_price(mark), 'unRealizedProfit': f'{amount * (mark - entry):.8f}',
+            'liquidationPrice': '0', 'isolatedMargin': '0', 'notional': f'{notional:.8f}',
+            'marginAsset': 'USDT', 'isolatedWallet': '0', 'initialMargin': f'{margin:.8f}',
+            'maintMargin': f'{abs(notional) * 0.004:.8f}', 'positionInitialMargin': f'{margin:.8f}',
+            'openOrderInitialMargin': '0', 'adl': 0, 'bidNotional': '0', 'askNotional': '0',
+            'leverage': str(leverage), 'marginType': 'cross', 'isAutoAddMargin': 'false',
+            'maxNotionalValue': '50000000', 'updateTime': now_ms,
+        }
+
+    def position_risk(self, params, now_ms):
+        with self.account.lock:
+            positions = dict(self.account.positions)
+        rows = [self._position(symbol_id, amount, entry, self.markets[symbol_id].source.price(now_ms), now_ms)
+                for symbol_id, (amount, entry) in positions.items()]
+        if 'symbol' in params:
+            market = self._market(params)
+            rows = [row for row in rows if row['symbol'] == market.id]
+            if not rows:
+                rows = [self._position(market.id, 0.0, 0.0, market.source.price(now_ms), now_ms)]
+        return rows
+
+    def _balance(self, now_ms):
+        account = self.account
+        prices = self._prices(now_ms)
+        with account.lock:
+            pnl, margin = account.totals(prices)
+            wallet = account.wallet
+            positions = dict(account.positions)
+        available = wallet + pnl - margin
+        asset = {
+            'asset': 'USDT', 'walletBalance': f'{wallet:.8f}', 'unrealizedProfit': f'{pnl:.8f}',
+            'marginBalance': f'{wallet + pnl:.8f}', 'maintMargin': '0', 'initialMargin': f'{margin:.8f}',
+            'positionInitialMargin': f'{margin:.8f}', 'openOrderInitialMargin': '0',
+            'crossWalletBalance': f'{wallet:.8f}', 'crossUnPnl': f'{pnl:.8f}',
+            'availableBalance': f'{available:.8f}', 'maxWithdrawAmount': f'{max(0.0, available):.8f}',
+            'marginAvailable': True, 'updateTime': now_ms,
+        }
+        return asset, pnl, margin, positions, prices
+
+    def account_info(self, params, now_ms):
+        asset, pnl, margin, positions, prices = self._balance(now_ms)
+        return {
+            'feeTier': 0, 'canTrade': True, 'canDeposit': True, 'canWithdraw': True, 'updateTime': 0,
+            'multiAssetsMargin': False, 'totalInitialMargin': asset['initialMargin'], 'totalMaintMargin': '0',
+            'totalWalletBalance': asset['walletBalance'], 'totalUnrealizedProfit': asset['unrealizedProfit'],
+            'totalMarginBalance': asset['marginBalance'], 'totalPositionInitialMargin': asset['initialMargin'],
+            'totalOpenOrderInitialMargin': '0', 'totalCrossWalletBalance': asset['walletBalance'],
+            'totalCrossUnPnl': asset['unrealizedProfit'], 'availableBalance': asset['availableBalance'],
+            'maxWithdrawAmount': asset['maxWithdrawAmount'],
+            'assets': [asset],
+            'positions': [self._position(symbol_id, amount, entry, prices[symbol_id], now_ms)
+                          for symbol_id, (amount, entry) in positions.items()],
+        }
+
+    def balance(self, params, now_ms):
+        asset = self._balance(now_ms)[0]
+        return [{'accountAlias': 'FAKE', 'asset': 'USDT', 'balance': asset['walletBalance'],
+                 'crossWalletBalance': asset['walletBalance'], 'crossUnPnl': asset['unrealizedProfit'],
+                 'availableBalance': asset['availableBalance'], 'maxWithdrawAmount': asset['maxWithdrawAmount'],
+                 'marginAvailable': True, 'updateTime': now_ms}]
+
+    def set_leverage(self, params, now_ms):
+        market = self._market(params)
+        try:
+            leverage = int(params.get('leverage', ''))
+        except ValueError:
+            leverage = 0
+        if not 1 <= leverage <= MAX_LEVERAGE:
+            raise ApiError(400, -4028, f"Leverage {params.get('leverage')} is not valid")
+        with self.account.lock:
+            self.account.leverage[market.id] = leverage
+        return {'leverage': leverage, 'maxNotionalValue': '50000000', 'symbol': market.id}
+
+    def order(self, params, now_ms):
+        market = self._market(params)
+        side = params.get('side')
+        if side not in ('BUY', 'SELL'):
+            raise ApiError(400, -1117, 'Invalid side.')
+        if params.get('type') != 'MARKET':
+            raise ApiError(400, -1116, 'Invalid orderType. (servidor fake: apenas MARKET)')
+        try:
+            quantity = float(params.get('quantity', ''))
+        except ValueError:
+            quantity = 0.0
+        steps = quantity / market.step
+        if quantity <= 0 or abs(steps - round(steps)) > 1e-6:
+            raise ApiError(400, -1111, 'Precision is over the maximum defined for this asset.')
+        reduce_only = str(params.get('reduceOnly', 'false')).lower() == 'true'
+        price = market.source.price(now_ms)
+        executed, realized = self.account.fill(market, side, quantity, reduce_only, price)
+        order_id = self.account.next_order_id
+        return {
+            'orderId': order_id, 'symbol': market.id, 'status': 'FILLED',
+            'clientOrderId': params.get('newClientOrderId', f'fake-{order_id}'),
+            'price': '0', 'avgPrice': market.fmt_price(price), 'origQty': market.fmt_qty(quantity),
+            'executedQty': market.fmt_qty(executed), 'cumQty': market.fmt_qty(executed),
+            'cumQuote': f'{executed * price:.8f}', 'timeInForce': 'GTC', 'type': 'MARKET',
+            'reduceOnly': reduce_only, 'closePosition': False, 'side': side, 'positionSide': 'BOTH',
+            'stopPrice': '0', 'workingType': 'CONTRACT_PRICE', 'priceProtect': False, 'origType': 'MARKET',
+            'priceMatch': 'NONE', 'selfTradePreventionMode': 'NONE', 'goodTillDate': 0,
+            'updateTime': now_ms, 'realizedPnl': f'{realized:.8f}',
+        }
+
+
+def _kline_weight(params):
+    limit = int(params.get('limit', 500))
+    return 1 if limit < 100 else 2 if limit < 500 else 5 if limit <= 1000 else 10
+
+
+# (método, caminho) -> (método de FakeExchange, peso, assinado)
+ROUTES = {
+    ('GET', '/fapi/v1/ping'): ('ping', 1, False),
+    ('GET', '/fapi/v1/time'): ('server_time', 1, False),
+    ('GET', '/fapi/v1/exchangeInfo'): ('exchange_info', 1, False),
+    ('GET', '/api/v3/exchangeInfo'): ('empty_exchange_info', 20, False),
+    ('GET', '/dapi/v1/exchangeInfo'): ('empty_exchange_info', 1, False),
+    ('GET', '/fapi/v1/klines'): ('klines', _kline_weight, False),
+    ('GET', '/fapi/v1/ticker/24hr'): ('ticker_24hr', lambda params: 1 if 'symbol' in params else 40, False),
+    ('GET', '/fapi/v1/ticker/price'): ('ticker_price', lambda params: 1 if 'symbol' in params else 2, False),
+    ('GET', '/fapi/v1/leverageBracket'): ('leverage_bracket', 1, True),
+    ('GET', '/fapi/v2/account'): ('account_info', 5, True),
+    ('GET', '/fapi/v3/account'): ('account_info', 5, True),
+    ('GET', '/fapi/v2/balance'): ('balance', 5, True),
+    ('GET', '/fapi/v3/balance'): ('balance', 5, True),
+    ('GET', '/fapi/v2/positionRisk'): ('position_risk', 5, True),
+    ('GET', '/fapi/v3/positionRisk'): ('position_risk', 5, True),
+    ('POST', '/fapi/v1/leverage'): ('set_leverage', 1, True),
+    ('POST', '/fapi/v1/order'): ('order', 1, True),
+}
+
+
+class ExchangeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'     # Keep-alive (o pool de conexões do exchange_session reaproveita)
+    server_version = 'FakeBinance/1.0'
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        if self.server.options['verbose']:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, headers):
+        data = json.dumps(body, separators=(',', ':')).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        server = self.server
+        options = server.options
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update({k: v[-1] for k, v in parse_qs(self.rfile.read(length).decode('utf-8', 'replace')).items()})
+
+        if url.path == '/__stats':
+            return self._send(200, server.snapshot(), {})
+        route = ROUTES.get((method, url.path))
+        if route is None:
+            print(f"[FAKE] Rota não simulada: {method} {url.path}")
+            server.record(url.path, 404, 0)
+            return self._send(404, {'code': -5000, 'msg': f'Path {url.path} is not simulated.'}, {})
+
+        name, weight, signed = route
+        weight = weight(params) if callable(weight) else weight
+        now = server.now_ms()
+        headers = {}
+        status = 200
+        try:
+            headers['X-MBX-USED-WEIGHT-1M'] = str(server.limiter.acquire(weight, now))
+            if options['error_rate'] and random.random() < options['error_rate']:
+                raise ApiError(503, -1001, 'Internal error; unable to process your request. Please try again.')
+            if signed:
+                server.exchange.authenticate(self.headers, params, now)
+            body = getattr(server.exchange, name)(params, now)
+        except ApiError as e:
+            status = e.status
+            headers.update(e.headers)
+            body = {'code': e.code, 'msg': e.msg}
+        except Exception as e:
+            status = 500
+            body = {'code': -1000, 'msg': f'An unknown error occured while processing the request. ({e})'}
+        server.record(url.path, status, weight)
+
+        # Latência de rede aplicada na resposta (o processamento já usou o horário de chegada)
+        delay = options['latency'] + random.uniform(0, options['jitter'])
+        if options['slow_rate'] and random.random() < options['slow_rate']:
+            delay = options['slow_latency']
+        if delay:
+            time.sleep(delay / 1000)
+        try:
+            self._send(status, body, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Cliente desistiu (timeout)
+
+
+class FakeExchangeServer(ThreadingHTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, slow_rate=0.0, slow_latency=20000.0,
+                 error_rate=0.0, weight_limit=2400, ban_after=0, ban_seconds=120, clock_offset=0,
+                 symbols=0, balance=10000.0, leverage=20, archive=False, replay_days=1.0, verbose=False):
+        super().__init__(address, ExchangeHandler)
+        self.options = {
+            'latency': latency,
+            'jitter': jitter,
+            'slow_rate': slow_rate,
+            'slow_latency': slow_latency,
+            'error_rate': error_rate,
+            'clock_offset': clock_offset,
+            'verbose': verbose,
+        }
+        markets = synthetic_markets(symbols)
+        self.replay_offset = None
+        if archive:
+            replayed, self.replay_offset = archive_markets(replay_days, self.now_ms())
+            markets.update(replayed)
+            self.replayed = sorted(replayed)
+        self.exchange = FakeExchange(markets, Account(balance, leverage), weight_limit)
+        self.limiter = WeightLimiter(weight_limit, ban_after, ban_seconds)
+        self.started_at = time.time()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def now_ms(self):
+        """Relógio do servidor (com --clock-offset)"""
+        return int(time.time() * 1000) + int(self.options['clock_offset'])
+
+    def record(self, path, status, weight):
+        with self._stats_lock:
+            entry = self._stats.setdefault(path, {'requests': 0, 'errors': 0, 'weight': 0})
+            entry['requests'] += 1
+            entry['weight'] += weight
+            if status >= 400:
+                entry['errors'] += 1
+
+    def snapshot(self):
+        """Contadores por rota desde o início (GET /__stats)"""
+        with self._stats_lock:
+            routes = {path: dict(entry) for path, entry in self._stats.items()}
+        return {
+            'uptime': round(time.time() - self.started_at, 1),
+            'requests': sum(entry['requests'] for entry in routes.values()),
+            'errors': sum(entry['errors'] for entry in routes.values()),
+            'used_weight_1m': self.limiter.used,
+            'routes': routes,
+        }
+
+
+def serve_in_background(host='127.0.0.1', port=0, **options):
+    """Sobe o servidor numa thread e retorna (server, url) - útil em scripts de teste"""
+    server = FakeExchangeServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor REST fake da Binance Futures (USDⓈ-M)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.0, help='atraso de cada resposta (ms)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='atraso extra aleatório de 0 a N ms')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='fração de respostas lentas (0-1)')
+    parser.add_argument('--slow-latency', type=float, default=20000.0, help='atraso das respostas lentas (ms)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fração de respostas 503 -1001 (0-1)')
+    parser.add_argument('--weight-limit', type=int, default=2400, help='peso por minuto (0 = sem limite)')
+    parser.add_argument('--ban-after', type=int, default=0, help='429 no mesmo minuto até o ban 418 (0 = nunca)')
+    parser.add_argument('--ban-seconds', type=int, default=120)
+    parser.add_argument('--clock-offset', type=int, default=0, help='diferença do relógio do servidor (ms)')
+    parser.add_argument('--symbols', type=int, default=0, help='contratos sintéticos extras (SYN0000USDT...)')
+    parser.add_argument('--balance', type=float, default=10000.0, help='saldo inicial da conta (USDT)')
+    parser.add_argument('--leverage', type=int, default=20, help='alavancagem padrão da conta')
+    parser.add_argument('--archive', action='store_true', help='reproduz os candles de market_data/')
+    parser.add_argument('--replay-days', type=float, default=1.0,
+                        help='com --archive: começa N dias antes do fim do arquivo')
+    parser.add_argument('--verbose', action='store_true', help='loga cada requisição')
+    args = parser.parse_args()
+
+    server = FakeExchangeServer(
+        (args.host, args.port), latency=args.latency, jitter=args.jitter, slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency, error_rate=args.error_rate, weight_limit=args.weight_limit,
+        ban_after=args.ban_after, ban_seconds=args.ban_seconds, clock_offset=args.clock_offset,
+        symbols=args.symbols, balance=args.balance, leverage=args.leverage, archive=args.archive,
+        replay_days=args.replay_days, verbose=args.verbose)
+    print(f"Fake Binance Futures em http://{args.host}:{args.port} ({len(server.exchange.markets)} contratos)")
+    if server.replay_offset is not None:
+        replayed = ', '.join(server.replayed) or 'nenhum par arquivado'
+        print(f"Replay de market_data/ (deslocamento {server.replay_offset / DAY_MS:.0f} dias): {replayed}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.snapshot(), indent=2))
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor WebSocket local que imita os streams combinados da Binance Futures
+(`/stream?streams=btcusdt@kline_5m/btcusdt@ticker`) com dados sintéticos.
+
+Uso (apenas biblioteca padrão):
+    python fake_stream_server.py --port 8765 --interval 0.25 --drop-after 200
+
+E no bot_config.json:
+    "USE_STREAM": true,
+    "STREAM_URL": "ws://127.0.0.1:8765"
+
+--drop-after fecha a conexão após N mensagens, para testar o fallback REST e a reconexão.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import select
+import socketserver
+import struct
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from market_stream import timeframe_to_ms
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def _encode_frame(payload, opcode=0x1):
+    """Monta um frame WebSocket do servidor (sem máscara)"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack('>H', length)
+    else:
+        header += bytes([127]) + struct.pack('>Q', length)
+    return header + payload
+
+
+def _read_frame(sock):
+    """Lê um frame do cliente (sempre mascarado). Retorna (opcode, payload) ou (None, None)"""
+    head = sock.recv(2)
+    if len(head) < 2:
+        return None, None
+    opcode = head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', sock.recv(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', sock.recv(8))[0]
+    mask = sock.recv(4) if head[1] & 0x80 else b'\x00\x00\x00\x00'
+    data = b''
+    while len(data) < length:
+        chunk = sock.recv(length - len(data))
+        if not chunk:
+            return None, None
+        data += chunk
+    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return opcode, payload
+
+
+class FakeMarket:
+    """Random walk de preço que gera mensagens kline/ticker no formato da Binance"""
+
+    def __init__(self, symbol, timeframe, updates_per_candle, start_price=100.0):
+        self.symbol = symbol.upper()
+        self.timeframe = timeframe
+        self.tf_ms = timeframe_to_ms(timeframe)
+        self.updates_per_candle = updates_per_candle
+        self.price = start_price
+        now_ms = int(time.time() * 1000)
+        self.candle_start = now_ms - now_ms % self.tf_ms
+        self.updates = 0
+        self._new_candle()
+
+    def _new_candle(self):
+        self.open = self.high = self.low = self.price
+        self.volume = 0.0
+
+    def next_messages(self):
+        self.updates += 1
+        if self.updates % self.updates_per_candle == 0:
+            self.candle_start += self.tf_ms
+            self._new_candle()
+        self.price *= 1 + random.gauss(0, 0.001)
+        self.high = max(self.high, self.price)
+        self.low = min(self.low, self.price)
+        self.volume += random.uniform(1, 20)
+        event_time = int(time.time() * 1000)
+        name = self.symbol.lower()
+        kline = {
+            'stream': f'{name}@kline_{self.timeframe}',
+            'data': {
+                'e': 'kline', 'E': event_time, 's': self.symbol,
+                'k': {
+                    't': self.candle_start, 'T': self.candle_start + self.tf_ms - 1,
+                    's': self.symbol, 'i': self.timeframe,
+                    'o': f'{self.open:.4f}', 'h': f'{self.high:.4f}', 'l': f'{self.low:.4f}',
+                    'c': f'{self.price:.4f}', 'v': f'{self.volume:.3f}', 'x': False,
+                },
+            },
+        }
+        ticker = {
+            'stream': f'{name}@ticker',
+            'data': {'e': '24hrTicker', 'E': event_time, 's': self.symbol,
+                     'c': f'{self.price:.4f}', 'P': f'{random.uniform(-3, 3):.3f}'},
+        }
+        return [kline, ticker]
+
+
+class StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return
+            request += chunk
+        lines = request.decode('latin-1').split('\r\n')
+        path = lines[0].split(' ')[1]
+        headers = {k.strip().lower(): v.strip() for k, v in (l.split(':', 1) for l in lines[1:] if ':' in l)}
+        key = headers.get('sec-websocket-key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        sock.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+        ).encode())
+
+        streams = parse_qs(urlparse(path).query).get('streams', ['btcusdt@kline_5m'])[0].split('/')
+        kline_stream = next((s for s in streams if '@kline_' in s), 'btcusdt@kline_5m')
+        symbol, timeframe = kline_stream.split('@kline_')
+        options = self.server.options
+        market = FakeMarket(symbol, timeframe, options['updates_per_candle'], options['start_price'])
+
+        sent = 0
+        try:
+            while True:
+                # Responde pings/close do cliente
+                readable, _, _ = select.select([sock], [], [], 0)
+                if readable:
+                    opcode, payload = _read_frame(sock)
+                    if opcode is None or opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        sock.sendall(_encode_frame(payload, opcode=0xA))
+
+                for message in market.next_messages():
+                    sock.sendall(_encode_frame(json.dumps(message).encode()))
+                    sent += 1
+                if options['drop_after'] and sent >= options['drop_after']:
+                    break
+                time.sleep(options['interval'])
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+
+
+class FakeStreamServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, interval=0.25, updates_per_candle=20, drop_after=0, start_price=100.0):
+        super().__init__(address, StreamHandler)
+        self.options = {
+            'interval': interval,
+            'updates_per_candle': updates_per_candle,
+            'drop_after': drop_after,
+            'start_price': start_price,
+        }
+
+
+def serve_in_background(host='127.0.0.1', port=0, **options):
+    """Sobe o servidor numa thread e retorna (server, url) - útil em scripts de teste"""
+    server = FakeStreamServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"ws://{host}:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor WebSocket fake da Binance Futures')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=0.25, help='segundos entre atualizações')
+    parser.add_argument('--updates-per-candle', type=int, default=20)
+    parser.add_argument('--drop-after', type=int, default=0, help='fecha a conexão após N mensagens (0 = nunca)')
+    parser.add_argument('--start-price', type=float, default=100.0)
+    args = parser.parse_args()
+
+    server = FakeStreamServer((args.host, args.port), args.interval, args.updates_per_candle,
+                              args.drop_after, args.start_price)
+    print(f"Fake stream em ws://{args.host}:{args.port}/stream")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
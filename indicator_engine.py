@@ -0,0 +1,626 @@
+"""
+indicator_engine.py - Motor incremental de indicadores (EMA, RSI, MACD, ADX, Volume MA, VWAP)
+
+Mantém o estado das médias (EMA, RSI de Wilder, ADX, janela de volume) e atualiza
+em O(1) a cada candle novo ou revisado, em vez de recalcular o DataFrame inteiro.
+As fórmulas reproduzem exatamente as recorrências do pandas (ewm adjust=False) e
+da biblioteca `ta` (RSIIndicator / ADXIndicator) usadas em davinci_bot.
+
+Execute `python indicator_engine.py` para verificar a paridade com o cálculo pandas/ta.
+"""
+import math
+from collections import deque
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+import ta
+
+# Colunas geradas (mesma ordem de davinci_bot.calculate_indicators)
+INDICATOR_COLUMNS = [
+    'ema_short', 'ema_mid', 'rsi', 'macd_hist', 'macd_line', 'macd_signal',
+    'adx', 'plus_di', 'minus_di', 'vol_ma', 'high_vol', 'daily_vwap'
+]
+
+DEFAULT_PARAMS = {
+    'EMA_SHORT': 8,
+    'EMA_MID': 21,
+    'RSI_LEN': 9,
+    'MACD_FAST': 8,
+    'MACD_SLOW': 21,
+    'MACD_SIGNAL': 5,
+    'ADX_LEN': 10,
+    'VOL_LEN': 20,
+    'VOL_MULT': 1.05,
+}
+
+# Quantidade de candles mantidos no histórico de saída de cada engine
+HISTORY_SIZE = 1000
+
+
+def _ewm_step(prev, value, alpha):
+    """Um passo de ewm(adjust=False) - mesma fórmula usada pelo pandas"""
+    if prev is None:
+        return value
+    old_wt = 1.0 - alpha
+    return (old_wt * prev + alpha * value) / (old_wt + alpha)
+
+
+class _IndicatorState:
+    """Estado das recorrências após o último candle FECHADO"""
+
+    __slots__ = (
+        'count', 'prev_close', 'prev_high', 'prev_low',
+        'ema_short', 'ema_mid', 'macd_fast', 'macd_slow', 'macd_signal',
+        'rsi_up', 'rsi_down',
+        'trs', 'dip', 'din', 'dx_seed', 'adx',
+        'volumes', 'day', 'day_close', 'day_volume', 'cum_pv', 'cum_vol'
+    )
+
+    def __init__(self, vol_len):
+        self.count = 0
+        self.prev_close = None
+        self.prev_high = None
+        self.prev_low = None
+        self.ema_short = None
+        self.ema_mid = None
+        self.macd_fast = None
+        self.macd_slow = None
+        self.macd_signal = None
+        self.rsi_up = None
+        self.rsi_down = None
+        self.trs = 0.0
+        self.dip = 0.0
+        self.din = 0.0
+        self.dx_seed = []
+        self.adx = 0.0
+        self.volumes = deque(maxlen=vol_len)
+        self.day = None
+        self.day_close = 0.0
+        self.day_volume = 0.0
+        self.cum_pv = 0.0
+        self.cum_vol = 0.0
+
+    def copy(self):
+        new = _IndicatorState(self.volumes.maxlen)
+        for attr in self.__slots__:
+            setattr(new, attr, getattr(self, attr))
+        new.volumes = deque(self.volumes, maxlen=self.volumes.maxlen)
+        new.dx_seed = list(self.dx_seed)
+        return new
+
+
+class IncrementalIndicators:
+    """
+    Calcula indicadores de forma incremental para um par (símbolo, timeframe).
+
+    O último candle recebido é tratado como "vivo": enquanto o timestamp não muda,
+    cada atualização recalcula apenas esse candle a partir do estado congelado do
+    candle anterior. Quando chega um timestamp novo, o candle vivo é consolidado.
+    """
+
+    def __init__(self, params=None, history_size=HISTORY_SIZE):
+        self.params = dict(DEFAULT_PARAMS)
+        if params:
+            self.params.update(params)
+        self.history_size = history_size
+        self.reset()
+
+    def reset(self):
+        """Descarta todo o estado (troca de símbolo, gap grande de dados, etc.)"""
+        self._state = _IndicatorState(self.params['VOL_LEN'])
+        self._live = None          # (timestamp, open, high, low, close, volume)
+        self._live_values = None   # Valores calculados para o candle vivo
+        self._history = {col: deque(maxlen=self.history_size) for col in INDICATOR_COLUMNS}
+        self._days = deque(maxlen=self.history_size)
+        self._day_vwap = {}
+        self.last_timestamp = None
+
+    def __len__(self):
+        return len(self._days) + (1 if self._live is not None else 0)
+
+    # ------------------------------------------------------------------
+    # Recorrências
+    # ------------------------------------------------------------------
+    def _step(self, state, candle):
+        """Aplica um candle ao estado e retorna (novo_estado, valores)"""
+        p = self.params
+        ts, _open, high, low, close, volume = candle
+        s = state.copy()
+        s.count += 1
+        row = s.count - 1
+
+        # EMAs / MACD
+        s.ema_short = _ewm_step(state.ema_short, close, 2.0 / (p['EMA_SHORT'] + 1))
+        s.ema_mid = _ewm_step(state.ema_mid, close, 2.0 / (p['EMA_MID'] + 1))
+        s.macd_fast = _ewm_step(state.macd_fast, close, 2.0 / (p['MACD_FAST'] + 1))
+        s.macd_slow = _ewm_step(state.macd_slow, close, 2.0 / (p['MACD_SLOW'] + 1))
+        macd_line = s.macd_fast - s.macd_slow
+        s.macd_signal = _ewm_step(state.macd_signal, macd_line, 2.0 / (p['MACD_SIGNAL'] + 1))
+
+        # RSI (Wilder) - igual ao ta.momentum.RSIIndicator
+        rsi_len = p['RSI_LEN']
+        diff = close - state.prev_close if state.prev_close is not None else 0.0
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        s.rsi_up = _ewm_step(state.rsi_up, up, 1.0 / rsi_len)
+        s.rsi_down = _ewm_step(state.rsi_down, down, 1.0 / rsi_len)
+        if s.count < rsi_len:
+            rsi = math.nan
+        elif s.rsi_down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - (100 / (1 + s.rsi_up / s.rsi_down))
+
+        # ADX - mesma indexação do ta.trend.ADXIndicator
+        w = p['ADX_LEN']
+        adx = plus_di = minus_di = 0.0
+        if row >= 1:
+            dm = max(high, state.prev_close) - min(low, state.prev_close)
+            diff_up = high - state.prev_high
+            diff_down = state.prev_low - low
+            pos = diff_up if (diff_up > diff_down and diff_up > 0) else 0.0
+            neg = diff_down if (diff_down > diff_up and diff_down > 0) else 0.0
+            if row <= w:
+                s.trs = state.trs + dm
+                s.dip = state.dip + pos
+                s.din = state.din + neg
+            else:
+                s.trs = state.trs - (state.trs / float(w)) + dm
+                s.dip = state.dip - (state.dip / float(w)) + pos
+                s.din = state.din - (state.din / float(w)) + neg
+
+            if row >= w:
+                di_pos = 100 * (s.dip / s.trs) if s.trs != 0 else 0.0
+                di_neg = 100 * (s.din / s.trs) if s.trs != 0 else 0.0
+                if di_pos + di_neg != 0:
+                    dx = 100 * abs((di_pos - di_neg) / (di_pos + di_neg))
+                else:
+                    dx = 0.0
+
+                if row < 2 * w - 1:
+                    s.dx_seed.append(dx)
+                elif row == 2 * w - 1:
+                    s.dx_seed.append(dx)
+                    s.adx = float(np.mean(s.dx_seed))
+                    s.dx_seed = []
+                    adx = s.adx
+                else:
+                    s.adx = ((state.adx * (w - 1)) + dx) / float(w)
+                    adx = s.adx
+
+                if row > w:
+                    plus_di = di_pos
+                    minus_di = di_neg
+
+        s.prev_close = close
+        s.prev_high = high
+        s.prev_low = low
+
+        # Volume MA
+        s.volumes.append(volume)
+        if len(s.volumes) == p['VOL_LEN']:
+            vol_ma = sum(s.volumes) / p['VOL_LEN']
+            high_vol = volume > vol_ma * p['VOL_MULT']
+        else:
+            vol_ma = math.nan
+            high_vol = False
+
+        # VWAP diário (acumulado desde o primeiro dia conhecido pela engine)
+        day = ts.normalize()
+        if state.day is not None and day != state.day:
+            s.cum_pv = state.cum_pv + state.day_close * state.day_volume
+            s.cum_vol = state.cum_vol + state.day_volume
+            s.day_volume = 0.0
+        s.day = day
+        s.day_close = close
+        s.day_volume = s.day_volume + volume
+        total_vol = s.cum_vol + s.day_volume
+        daily_vwap = (s.cum_pv + s.day_close * s.day_volume) / total_vol if total_vol > 0 else close
+
+        values = {
+            'ema_short': s.ema_short,
+            'ema_mid': s.ema_mid,
+            'rsi': rsi,
+            'macd_hist': macd_line - s.macd_signal,
+            'macd_line': macd_line,
+            'macd_signal': s.macd_signal,
+            'adx': adx,
+            'plus_di': plus_di,
+            'minus_di': minus_di,
+            'vol_ma': vol_ma,
+            'high_vol': high_vol,
+            'daily_vwap': daily_vwap,
+        }
+        return s, values
+
+    # ------------------------------------------------------------------
+    # Atualização
+    # ------------------------------------------------------------------
+    def _commit_live(self):
+        """Consolida o candle vivo no estado e no histórico"""
+        if self._live is None:
+            return
+        self._state, values = self._step(self._state, self._live)
+        for col in INDICATOR_COLUMNS:
+            self._history[col].append(values[col])
+        self._days.append(self._state.day)
+        self._day_vwap[self._state.day] = values['daily_vwap']
+        self._live = None
+        self._live_values = None
+
+    def update_candle(self, timestamp, open_, high, low, close, volume):
+        """
+        Aplica um candle. Mesmo timestamp do candle vivo = revisão (O(1));
+        timestamp maior = consolida o anterior e abre um novo candle vivo.
+        Retorna os valores calculados para o candle.
+        """
+        candle = (timestamp, float(open_), float(high), float(low), float(close), float(volume))
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"Candle fora de ordem: {timestamp} < {self.last_timestamp}")
+        if self.last_timestamp is not None and timestamp > self.last_timestamp:
+            self._commit_live()
+
+        self._live = candle
+        _, self._live_values = self._step(self._state, candle)
+        self.last_timestamp = timestamp
+        return self._live_values
+
+    def update(self, df):
+        """
+        Sincroniza a engine com um DataFrame OHLCV (index = timestamp) e retorna
+        o DataFrame com as colunas de indicadores preenchidas.
+
+        Apenas os candles a partir do último timestamp conhecido são processados.
+        Se o DataFrame não se conecta ao histórico da engine, ela é reinicializada.
+        """
+        if df.empty:
+            return df
+
+        index = df.index
+        start = None
+        if self.last_timestamp is not None and index[0] <= self.last_timestamp <= index[-1]:
+            start = int(index.searchsorted(self.last_timestamp))
+            # Os candles anteriores ao vivo precisam existir no histórico da engine
+            if index[start] != self.last_timestamp or start + 1 > len(self):
+                start = None
+        if start is None:
+            self.reset()
+            start = 0
+
+        opens = df['open'].to_numpy()
+        highs = df['high'].to_numpy()
+        lows = df['low'].to_numpy()
+        closes = df['close'].to_numpy()
+        volumes = df['volume'].to_numpy()
+        for i in range(start, len(df)):
+            self.update_candle(index[i], opens[i], highs[i], lows[i], closes[i], volumes[i])
+
+        return self.apply(df)
+
+    def apply(self, df):
+        """
+        Retorna `df` com as colunas de indicadores dos últimos len(df) candles da engine.
+        As colunas são montadas num DataFrame só e concatenadas (uma inserção por coluna
+        custava mais que o cálculo dos indicadores).
+        """
+        n = len(df)
+        closed = len(self._days)
+        take = n - 1
+        skip = closed - take
+        columns = {}
+        for col in INDICATOR_COLUMNS:
+            values = list(islice(self._history[col], skip, closed))
+            values.append(self._live_values[col])
+            columns[col] = values
+
+        # VWAP diário: candles do mesmo dia compartilham o valor do dia (como o resample)
+        day_vwap = dict(self._day_vwap)
+        day_vwap[self._state_live_day()] = self._live_values['daily_vwap']
+        days = list(islice(self._days, skip, closed))
+        days.append(self._state_live_day())
+        columns['daily_vwap'] = [day_vwap[d] for d in days]
+        self._prune_days()
+
+        existing = [c for c in INDICATOR_COLUMNS if c in df.columns]
+        if existing:
+            df = df.drop(columns=existing)
+        return pd.concat([df, pd.DataFrame(columns, index=df.index)], axis=1)
+
+    def _state_live_day(self):
+        return self._live[0].normalize()
+
+    def _prune_days(self):
+        """Remove do mapa de VWAP dias que já saíram do histórico"""
+        if len(self._day_vwap) > len(self._days) + 1 and self._days:
+            oldest = self._days[0]
+            for day in [d for d in self._day_vwap if d < oldest]:
+                del self._day_vwap[day]
+
+
+# ======================================================================
+# Registro de engines por (símbolo, timeframe)
+# ======================================================================
+_engines = {}
+
+
+def get_engine(symbol, timeframe, params=None):
+    """Retorna (criando se necessário) a engine de um par símbolo/timeframe"""
+    key = (symbol, timeframe)
+    engine = _engines.get(key)
+    if engine is None or (params and any(engine.params.get(k) != v for k, v in params.items())):
+        engine = IncrementalIndicators(params)
+        _engines[key] = engine
+    return engine
+
+
+def export_engines():
+    """Engines registradas {(símbolo, timeframe): engine} (snapshot de warm start)"""
+    return dict(_engines)
+
+
+def seed_engines(engines):
+    """Registra engines restauradas de um snapshot (não substitui as já existentes)"""
+    for key, engine in engines.items():
+        _engines.setdefault(key, engine)
+
+
+def _wilder_smooth(seed, values, window):
+    """
+    s[0] = seed; s[i] = s[i-1] - s[i-1]/window + values[i-1]
+    Via ewm(adjust=False) com alpha=1/window (laço em C do pandas em vez de Python)
+    """
+    u = np.empty(len(values) + 1)
+    u[0] = seed / window
+    u[1:] = values
+    return pd.Series(u).ewm(alpha=1.0 / window, adjust=False).mean().to_numpy() * window
+
+
+def adx_vectorized(high, low, close, window):
+    """
+    Mesmo resultado de ta.trend.ADXIndicator (adx, adx_pos, adx_neg), incluindo os
+    alinhamentos de índice da biblioteca, sem os laços Python - para séries longas
+    (backtest de meses de candles de 1m). Retorna três arrays NumPy.
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    n = window
+    size = len(close)
+    length = size - n + 1
+    if length <= n + 1:
+        adx = ta.trend.ADXIndicator(pd.Series(high), pd.Series(low), pd.Series(close), n)
+        return adx.adx().to_numpy(), adx.adx_pos().to_numpy(), adx.adx_neg().to_numpy()
+
+    close_shift = np.concatenate(([np.nan], close[:-1]))
+    true_range = np.amax([high, close_shift], axis=0) - np.amin([low, close_shift], axis=0)
+    diff_up = np.concatenate(([np.nan], high[1:] - high[:-1]))
+    diff_down = np.concatenate(([np.nan], low[:-1] - low[1:]))
+    with np.errstate(invalid='ignore'):
+        pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+        neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    # Primeiro valor: soma dos `n` primeiros válidos (índice 0 é NaN); último fica 0 como no ta
+    smoothed = []
+    for values in (true_range, pos, neg):
+        out = np.zeros(length)
+        out[:length - 1] = _wilder_smooth(values[1:n + 1].sum(), values[n + 1:size], n)
+        smoothed.append(out)
+    trs, dip, din = smoothed
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dip_pct = np.where(trs != 0, 100 * (dip / trs), 0.0)
+        din_pct = np.where(trs != 0, 100 * (din / trs), 0.0)
+        di_sum = dip_pct + din_pct
+        dx = np.where(di_sum != 0, 100 * np.abs((dip_pct - din_pct) / di_sum), 0.0)
+
+    adx_series = np.zeros(length)
+    adx_series[n:] = pd.Series(np.concatenate(([dx[:n].mean()], dx[n:length - 1]))) \
+        .ewm(alpha=1.0 / n, adjust=False).mean().to_numpy()
+    adx = np.concatenate((np.zeros(n - 1), adx_series))
+
+    plus_di = np.zeros(size)
+    minus_di = np.zeros(size)
+    plus_di[n + 1:n + length - 1] = dip_pct[1:length - 1]
+    minus_di[n + 1:n + length - 1] = din_pct[1:length - 1]
+    return adx, plus_di, minus_di
+
+
+# ----------------------------------------------------------------------
+# Kernels em lote: matriz (símbolos × candles), laço só no eixo do tempo
+# (o custo por candle é uma operação vetorial sobre todos os símbolos)
+# ----------------------------------------------------------------------
+def ewm_batch(values, alpha, min_periods=0):
+    """ewm(alpha=alpha, adjust=False).mean() de cada linha - mesma recorrência do pandas"""
+    out = np.empty_like(values, dtype=float)
+    old_wt = 1.0 - alpha
+    weighted = values[:, 0].astype(float)
+    out[:, 0] = weighted
+    for i in range(1, values.shape[1]):
+        cur = values[:, i]
+        weighted = np.where(weighted != cur, (old_wt * weighted + alpha * cur) / (old_wt + alpha), weighted)
+        out[:, i] = weighted
+    if min_periods > 1:
+        out[:, :min_periods - 1] = np.nan
+    return out
+
+
+def ema_batch(values, span):
+    return ewm_batch(values, 2.0 / (span + 1))
+
+
+def rsi_batch(close, window):
+    """ta.momentum.RSIIndicator(close, window).rsi() de cada linha"""
+    diff = np.zeros_like(close, dtype=float)
+    diff[:, 1:] = close[:, 1:] - close[:, :-1]
+    up = ewm_batch(np.where(diff > 0, diff, 0.0), 1.0 / window, min_periods=window)
+    down = ewm_batch(np.where(diff < 0, -diff, 0.0), 1.0 / window, min_periods=window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(down == 0, 100, 100 - (100 / (1 + up / down)))
+
+
+def rolling_mean_batch(values, window):
+    """rolling(window).mean() de cada linha (NaN até completar a janela)"""
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        out[:, window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window, axis=1).mean(axis=-1)
+    return out
+
+
+def adx_batch(high, low, close, window):
+    """
+    ta.trend.ADXIndicator (adx, adx_pos, adx_neg) de cada linha, com os mesmos
+    alinhamentos de índice da biblioteca. Exige pelo menos 2 * window candles.
+    """
+    n = window
+    rows, size = close.shape
+    length = size - n + 1
+    if length <= n + 1:
+        raise ValueError(f"ADX em lote exige mais de {2 * n} candles (recebeu {size})")
+
+    prev_close = close[:, :-1]
+    # Índice j das diferenças = candle j + 1 (o candle 0 é NaN no ta e sai no dropna)
+    true_range = np.maximum(high[:, 1:], prev_close) - np.minimum(low[:, 1:], prev_close)
+    diff_up = high[:, 1:] - high[:, :-1]
+    diff_down = low[:, :-1] - low[:, 1:]
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    # Suavização de Wilder: primeiro valor = soma dos n primeiros válidos; último fica 0 como no ta
+    smoothed = []
+    for values in (true_range, pos, neg):
+        out = np.zeros((rows, length))
+        out[:, 0] = values[:, :n].sum(axis=1)
+        for i in range(1, length - 1):
+            out[:, i] = out[:, i - 1] - (out[:, i - 1] / float(n)) + values[:, n + i - 1]
+        smoothed.append(out)
+    trs, dip, din = smoothed
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dip_pct = np.where(trs != 0, 100 * (dip / trs), 0.0)
+        din_pct = np.where(trs != 0, 100 * (din / trs), 0.0)
+        di_sum = dip_pct + din_pct
+        dx = np.where(di_sum != 0, 100 * np.abs((dip_pct - din_pct) / di_sum), 0.0)
+
+    adx_series = np.zeros((rows, length))
+    adx_series[:, n] = dx[:, :n].mean(axis=1)
+    for i in range(n + 1, length):
+        adx_series[:, i] = ((adx_series[:, i - 1] * (n - 1)) + dx[:, i - 1]) / float(n)
+    adx = np.concatenate((np.zeros((rows, n - 1)), adx_series), axis=1)
+
+    plus_di = np.zeros((rows, size))
+    minus_di = np.zeros((rows, size))
+    plus_di[:, n + 1:n + length - 1] = dip_pct[:, 1:length - 1]
+    minus_di[:, n + 1:n + length - 1] = din_pct[:, 1:length - 1]
+    return adx, plus_di, minus_di
+
+
+def calculate_indicators_full(df, params=None, vectorized_adx=False):
+    """
+    Cálculo de referência (pandas/ta) sobre o DataFrame inteiro.
+    É o cálculo original de davinci_bot, mantido para verificação de paridade.
+    vectorized_adx=True troca o ADX do ta (laços Python) por adx_vectorized - mesmo
+    resultado, ordens de grandeza mais rápido em séries longas (backtest).
+    """
+    p = dict(DEFAULT_PARAMS)
+    if params:
+        p.update(params)
+
+    df['ema_short'] = df['close'].ewm(span=p['EMA_SHORT'], adjust=False).mean()
+    df['ema_mid'] = df['close'].ewm(span=p['EMA_MID'], adjust=False).mean()
+    df['rsi'] = ta.momentum.RSIIndicator(df['close'], p['RSI_LEN']).rsi()
+
+    macd_fast_ema = df['close'].ewm(span=p['MACD_FAST'], adjust=False).mean()
+    macd_slow_ema = df['close'].ewm(span=p['MACD_SLOW'], adjust=False).mean()
+    macd_line = macd_fast_ema - macd_slow_ema
+    macd_signal = macd_line.ewm(span=p['MACD_SIGNAL'], adjust=False).mean()
+    df['macd_hist'] = macd_line - macd_signal
+    df['macd_line'] = macd_line
+    df['macd_signal'] = macd_signal
+
+    if vectorized_adx:
+        df['adx'], df['plus_di'], df['minus_di'] = adx_vectorized(df['high'], df['low'], df['close'], p['ADX_LEN'])
+    else:
+        adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'], p['ADX_LEN'])
+        df['adx'] = adx.adx()
+        df['plus_di'] = adx.adx_pos()
+        df['minus_di'] = adx.adx_neg()
+
+    df['vol_ma'] = df['volume'].rolling(window=p['VOL_LEN']).mean()
+    df['high_vol'] = df['volume'] > df['vol_ma'] * p['VOL_MULT']
+
+    daily = df.resample('1D').agg({
+        'open': 'first', 'high': 'max', 'low': 'min',
+        'close': 'last', 'volume': 'sum'
+    })
+    if not daily.empty and daily['volume'].sum() > 0:
+        cum_vol = daily['volume'].cumsum()
+        cum_vwap = (daily['close'] * daily['volume']).cumsum()
+        daily_vwap = cum_vwap / cum_vol
+        df['daily_vwap'] = daily_vwap.reindex(df.index, method='ffill').ffill()
+    else:
+        df['daily_vwap'] = df['close']
+
+    return df
+
+
+def _synthetic_candles(n=600, timeframe_minutes=60, seed=7):
+    """Gera candles sintéticos (random walk) para verificação"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n))
+    volume = rng.uniform(50, 500, n)
+    index = pd.date_range('2025-01-01', periods=n, freq=f'{timeframe_minutes}min', name='timestamp')
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+
+def check_parity(df=None, window=100):
+    """
+    Alimenta a engine candle a candle (incluindo revisões do candle vivo) e compara
+    com o cálculo completo pandas/ta sobre o mesmo histórico. Retorna o maior erro.
+    """
+    if df is None:
+        df = _synthetic_candles()
+    engine = IncrementalIndicators()
+    worst = 0.0
+    for end in range(50, len(df) + 1):
+        # Simula o candle vivo sendo revisado antes de fechar
+        partial = df.iloc[:end].copy()
+        live = partial.iloc[-1]
+        partial.iloc[-1, partial.columns.get_loc('close')] = (live['open'] + live['close']) / 2
+        engine.update(partial.iloc[-window:].copy())
+
+        got = engine.update(df.iloc[max(0, end - window):end].copy())
+        expected = calculate_indicators_full(df.iloc[:end].copy()).iloc[-len(got):]
+        for col in INDICATOR_COLUMNS:
+            a = got[col].to_numpy(dtype=float)
+            b = expected[col].to_numpy(dtype=float)
+            if not np.allclose(a, b, rtol=1e-9, atol=1e-9, equal_nan=True):
+                diff = np.nanmax(np.abs(a - b))
+                raise AssertionError(f"Paridade falhou em {col} (candle {end}): diferença {diff}")
+            worst = max(worst, float(np.nanmax(np.abs(a - b), initial=0.0)))
+    return worst
+
+
+def check_adx_parity(df=None, window=DEFAULT_PARAMS['ADX_LEN']):
+    """Compara adx_vectorized com ta.trend.ADXIndicator. Retorna o maior erro"""
+    if df is None:
+        df = _synthetic_candles(5000, 1)
+    adx = ta.trend.ADXIndicator(df['high'], df['low'], df['close'], window)
+    expected = (adx.adx().to_numpy(), adx.adx_pos().to_numpy(), adx.adx_neg().to_numpy())
+    got = adx_vectorized(df['high'], df['low'], df['close'], window)
+    worst = 0.0
+    for name, a, b in zip(('adx', 'plus_di', 'minus_di'), got, expected):
+        if not np.allclose(a, b, rtol=1e-9, atol=1e-9):
+            raise AssertionError(f"Paridade falhou em {name}: diferença {np.nanmax(np.abs(a - b))}")
+        worst = max(worst, float(np.max(np.abs(a - b))))
+    return worst
+
+
+if __name__ == '__main__':
+    error = check_parity()
+    print(f"✅ Paridade OK - maior diferença absoluta: {error:.3e}")
+    error = check_adx_parity()
+    print(f"✅ ADX vetorizado OK - maior diferença absoluta: {error:.3e}")
@@ -0,0 +1,231 @@
+"""
+log_tail.py - Leitura incremental dos logs do bot para /api/logs
+
+Em vez de ler o arquivo inteiro a cada refresh do dashboard:
+  - na primeira leitura busca só o final do arquivo (BOOTSTRAP_BYTES)
+  - depois lê apenas os bytes novos desde o último offset
+  - cada linha é interpretada/classificada uma única vez e guardada num buffer
+    circular limitado (CAPACITY entradas por arquivo)
+  - o cliente recebe um cursor e pede só o que chegou depois (?after=<cursor>)
+
+Arquivo truncado (limpar logs) ou rotacionado gera uma nova "geração" e o cliente
+que estiver com um cursor antigo recebe o buffer completo com reset=True.
+
+O log estruturado (bot_events.jsonl) usa o mesmo cursor com parser=event_log.parse_event.
+"""
+import os
+import re
+import threading
+from collections import deque
+
+CAPACITY = 2000                 # Entradas mantidas por arquivo
+BOOTSTRAP_BYTES = 256 * 1024    # Quanto do final do arquivo ler na primeira vez
+MAX_READ_BYTES = 4 * 1024 * 1024  # Atrasado mais que isso: pula para o final
+
+TIMESTAMP_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}$')
+LEVELS = (' | INFO | ', ' | WARNING | ', ' | ERROR | ')
+IGNORED = ('Started HTTP', 'Debug mode', 'Running on')
+
+
+def classify(line, message):
+    """Tipo do log para o dashboard (cores/sons)"""
+    if 'ENTRADA LONG' in message:
+        return "entry-long"
+    if 'ENTRADA SHORT' in message:
+        return "entry-short"
+    if 'SAÍDA LONG' in message:
+        return "exit-long"
+    if 'SAÍDA SHORT' in message:
+        return "exit-short"
+    if '*** CROSSOVER' in message:
+        return "signal-long"
+    if '*** CROSSUNDER' in message:
+        return "signal-short"
+    if '[BLOQUEADO]' in message or 'filtrado' in message.lower():
+        return "warning"
+    if 'ERROR' in line or 'Erro' in message or 'Traceback' in message:
+        return "error"
+    if 'WARNING' in line:
+        return "warning"
+    if 'DA VINCI SNIPER BOT INICIADO' in message:
+        return "success"
+    return "info"
+
+
+def parse_line(line):
+    """
+    '2025-11-02 21:30:13,955 | INFO | mensagem' -> entrada do dashboard.
+    Retorna None para linhas que não devem aparecer.
+    """
+    line = line.strip()
+    if not line or line.startswith('fatal:') or ' | ' not in line:
+        return None
+
+    timestamp = ""
+    message = line
+    parts = line.split(' | ', 2)
+    if any(level in line for level in LEVELS) and len(parts) >= 3:
+        timestamp = parts[0] if len(parts[0]) < 25 else ""
+        message = parts[2]
+    elif TIMESTAMP_RE.match(parts[0]):
+        timestamp = parts[0]
+        message = line.split(' | ', 1)[1]
+
+    if any(ignored in message for ignored in IGNORED):
+        return None
+
+    valid_time = bool(TIMESTAMP_RE.match(timestamp))
+    return {
+        "message": message,
+        "type": classify(line, message),
+        "time": timestamp[11:19] if valid_time else "",
+        "full_time": timestamp,
+    }
+
+
+class LogTail:
+    """Cursor de bytes sobre um arquivo de log com buffer das últimas entradas"""
+
+    def __init__(self, path, capacity=CAPACITY, parser=parse_line):
+        self.path = path
+        self.parser = parser
+        self.entries = deque(maxlen=capacity)   # (offset_fim_da_linha, entrada)
+        self.offset = 0
+        self.generation = 0
+        self._file_id = None
+        self._partial = False   # offset está no meio de uma linha descartada
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Descarta o buffer (arquivo truncado/rotacionado)"""
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self.entries.clear()
+        self.offset = 0
+        self._file_id = None
+        self._partial = False
+        self.generation += 1
+
+    def poll(self):
+        """Lê as linhas novas do arquivo (se houver)"""
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._file_id is not None:
+                    self._reset()
+                return
+
+            file_id = (st.st_dev, st.st_ino)
+            if self._file_id is not None and (file_id != self._file_id or st.st_size < self.offset):
+                self._reset()
+
+            start = self.offset
+            if self._file_id is None:
+                # Primeira leitura: só o final do arquivo
+                start = max(0, st.st_size - BOOTSTRAP_BYTES)
+            elif st.st_size - start > MAX_READ_BYTES:
+                start = st.st_size - BOOTSTRAP_BYTES
+            self._file_id = file_id
+            if st.st_size <= start:
+                self.offset = max(self.offset, start)
+                return
+
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                data = f.read(st.st_size - start)
+
+            if start > self.offset or self._partial:
+                # Começou no meio do arquivo: descarta a linha parcial. Sem quebra de linha
+                # no trecho lido, avança assim mesmo e continua descartando na próxima leitura
+                cut = data.find(b'\n')
+                if cut < 0:
+                    self.offset = start + len(data)
+                    self._partial = True
+                    return
+                self._partial = False
+                start += cut + 1
+                data = data[cut + 1:]
+
+            # Só consome linhas completas (a última pode estar sendo escrita)
+            end = data.rfind(b'\n')
+            if end < 0:
+                self.offset = start
+                return
+            position = start
+            for raw in data[:end + 1].split(b'\n')[:-1]:
+                position += len(raw) + 1
+                entry = self.parser(raw.decode('utf-8', errors='ignore'))
+                if entry:
+                    self.entries.append((position, entry))
+            self.offset = start + end + 1
+
+    def snapshot(self):
+        with self._lock:
+            return [entry for _, entry in self.entries]
+
+    def read(self, cursor=None):
+        """
+        Entradas depois do cursor (gen:offset). Retorna (entradas, novo_cursor, reset).
+        Cursor ausente ou de outra geração: todas as entradas do buffer e reset=True.
+        """
+        self.poll()
+        with self._lock:
+            generation, after = _split_cursor(cursor)
+            reset = generation != self.generation or after > self.offset
+            if reset:
+                entries = [entry for _, entry in self.entries]
+            else:
+                entries = [entry for offset, entry in self.entries if offset > after]
+            return entries, f"{self.generation}:{self.offset}", reset
+
+
+def _split_cursor(cursor):
+    try:
+        generation, offset = cursor.split(':')
+        return int(generation), int(offset)
+    except (AttributeError, ValueError):
+        return None, 0
+
+
+_tails = {}
+_tails_lock = threading.Lock()
+
+
+def get_tail(path, parser=parse_line):
+    with _tails_lock:
+        if path not in _tails:
+            _tails[path] = LogTail(path, parser=parser)
+        return _tails[path]
+
+
+def read_logs(paths, after=None, limit=150, parser=parse_line):
+    """
+    Logs de vários arquivos, mais recentes primeiro, sem duplicatas.
+    `after` é o cursor composto devolvido na chamada anterior ('g:o,g:o').
+    Retorna (entradas, cursor, reset).
+    """
+    cursors = (after or '').split(',')
+    logs, new_cursors, reset = [], [], not after
+    for number, path in enumerate(paths):
+        entries, cursor, tail_reset = get_tail(path, parser).read(cursors[number] if number < len(cursors) else None)
+        logs.extend(entries)
+        new_cursors.append(cursor)
+        reset = reset or tail_reset
+    if reset:
+        # Cliente recomeça do zero: manda o buffer de todos os arquivos
+        logs = []
+        for path in paths:
+            logs.extend(get_tail(path, parser).snapshot())
+
+    # O mesmo log aparece em davinci_bot.log e bot_output.log
+    unique, seen = [], set()
+    for entry in logs:
+        key = f"{entry['full_time']}:{entry['message'][:80]}"
+        if key not in seen:
+            seen.add(key)
+            unique.append(entry)
+    unique.sort(key=lambda x: x.get('full_time', ''), reverse=True)
+    return unique[:limit], ','.join(new_cursors), reset
@@ -0,0 +1,213 @@
+"""
+market_stream.py - Streaming de candles (kline) e ticker via WebSocket da Binance Futures
+
+Mantém um buffer de candles em memória atualizado a cada mensagem do stream, para que
+o bot avalie sinais e saídas a cada atualização em vez de esperar o poll REST de 60s.
+Se a conexão cair ou ficar sem mensagens, `is_healthy()` retorna False e o bot volta
+a usar o REST até o stream reconectar.
+"""
+import json
+import threading
+import time
+import logging
+from collections import deque
+
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+DEFAULT_STREAM_URL = 'wss://fstream.binance.com'
+STALE_SECONDS = 30      # Sem mensagens por mais que isso = stream não confiável
+MAX_BACKOFF = 30        # Espera máxima entre tentativas de reconexão
+MIN_CANDLES = 50        # Mesmo mínimo exigido por fetch_ohlcv
+
+
+def timeframe_to_ms(timeframe):
+    """Converte timeframe (1m, 5m, 1h, 1d...) para milissegundos"""
+    units = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+    try:
+        return int(timeframe[:-1]) * units[timeframe[-1]]
+    except (KeyError, ValueError, IndexError):
+        raise ValueError(f"Timeframe não suportado: {timeframe}")
+
+
+def stream_symbol(symbol):
+    """'BTC/USDT' -> 'btcusdt' (formato dos streams da Binance)"""
+    return symbol.split(':')[0].replace('/', '').lower()
+
+
+class MarketStream:
+    """
+    Assina os streams `<symbol>@kline_<tf>` e `<symbol>@ticker` e mantém:
+      - buffer de candles [timestamp, open, high, low, close, volume] (igual ao ccxt)
+      - último preço e variação 24h do ticker
+    """
+
+    def __init__(self, symbol, timeframe, url=DEFAULT_STREAM_URL, capacity=500):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.url = url.rstrip('/')
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.candles = deque(maxlen=capacity)
+        self.last_price = None
+        self.change_24h = None
+        self.connected = False
+        self.gap_detected = False
+        self.last_message_time = 0.0
+        self._version = 0
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    @property
+    def stream_url(self):
+        name = stream_symbol(self.symbol)
+        return f"{self.url}/stream?streams={name}@kline_{self.timeframe}/{name}@ticker"
+
+    def seed(self, ohlcv):
+        """Preenche o buffer com candles obtidos via REST (lista do ccxt)"""
+        with self._cond:
+            self.candles.clear()
+            for candle in ohlcv:
+                self.candles.append([int(candle[0])] + [float(v) for v in candle[1:6]])
+            if self.candles:
+                self.last_price = self.candles[-1][4]
+            self.gap_detected = False
+
+    def seed_dataframe(self, df):
+        """Preenche o buffer a partir do DataFrame de davinci_bot.fetch_ohlcv"""
+        timestamps = (df.index - pd.Timestamp(0)) // pd.Timedelta(milliseconds=1)
+        values = df[['open', 'high', 'low', 'close', 'volume']].to_numpy()
+        self.seed([[ts] + list(row) for ts, row in zip(timestamps, values)])
+
+    def start(self):
+        """Inicia a thread do stream (reconecta automaticamente)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"stream-{stream_symbol(self.symbol)}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._ws:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        import websocket  # websocket-client
+
+        backoff = 1
+        while not self._stop.is_set():
+            self._ws = websocket.WebSocketApp(
+                self.stream_url,
+                on_open=self._on_open,
+                on_message=self._on_message,
+                on_error=self._on_error,
+                on_close=self._on_close,
+            )
+            started = time.time()
+            try:
+                self._ws.run_forever(ping_interval=20, ping_timeout=10)
+            except Exception as e:
+                log.warning(f"[STREAM] Erro no WebSocket: {e}")
+            self.connected = False
+            if self._stop.is_set():
+                break
+            # Conexão que durou bastante reinicia o backoff
+            if time.time() - started > 60:
+                backoff = 1
+            log.warning(f"[STREAM] Desconectado - reconectando em {backoff}s (usando REST enquanto isso)")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def _on_open(self, ws):
+        self.connected = True
+        self.last_message_time = time.time()
+        log.info(f"[STREAM] Conectado: {self.stream_url}")
+
+    def _on_error(self, ws, error):
+        log.warning(f"[STREAM] Erro: {error}")
+
+    def _on_close(self, ws, status_code=None, msg=None):
+        self.connected = False
+
+    # ------------------------------------------------------------------
+    # Mensagens
+    # ------------------------------------------------------------------
+    def _on_message(self, ws, message):
+        try:
+            payload = json.loads(message)
+            data = payload.get('data', payload)
+            event = data.get('e')
+            if event == 'kline':
+                self.apply_kline(data['k'])
+            elif event == '24hrTicker':
+                self.apply_ticker(data)
+            self.last_message_time = time.time()
+        except Exception as e:
+            log.debug(f"[STREAM] Mensagem ignorada: {e}")
+
+    def apply_kline(self, k):
+        """Atualiza (mesmo timestamp) ou adiciona (timestamp novo) um candle"""
+        candle = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+        with self._cond:
+            if self.candles and candle[0] < self.candles[-1][0]:
+                return  # Candle antigo - ignora
+            if self.candles and candle[0] == self.candles[-1][0]:
+                self.candles[-1] = candle
+            else:
+                if self.candles and candle[0] - self.candles[-1][0] > self.timeframe_ms:
+                    # Perdemos candles durante uma desconexão: bot deve reabastecer via REST
+                    self.gap_detected = True
+                    log.warning(f"[STREAM] Gap de candles detectado ({self.symbol} {self.timeframe})")
+                self.candles.append(candle)
+            self.last_price = candle[4]
+            self._version += 1
+            self._cond.notify_all()
+
+    def apply_ticker(self, data):
+        with self._cond:
+            self.last_price = float(data['c'])
+            if 'P' in data:
+                self.change_24h = float(data['P'])
+            self._version += 1
+            self._cond.notify_all()
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    def is_healthy(self):
+        """Stream conectado, recebendo mensagens e com candles suficientes"""
+        return (self.connected
+                and not self.gap_detected
+                and time.time() - self.last_message_time < STALE_SECONDS
+                and len(self.candles) >= MIN_CANDLES)
+
+    def wait_for_update(self, last_version, timeout):
+        """Bloqueia até chegar uma atualização nova (ou timeout). Retorna a versão atual."""
+        with self._cond:
+            if self._version == last_version and not self._stop.is_set():
+                self._cond.wait(timeout)
+            return self._version
+
+    def get_price(self):
+        """Último preço conhecido se o stream estiver saudável, senão None"""
+        if not self.is_healthy():
+            return None
+        return self.last_price
+
+    def to_dataframe(self, limit=100):
+        """DataFrame no mesmo formato de davinci_bot.fetch_ohlcv"""
+        import candle_buffer  # ohlcv_cache (importado por candle_buffer) importa este módulo
+        with self._cond:
+            rows = list(self.candles)[-limit:]
+        return candle_buffer.update_frame(self.symbol, self.timeframe, rows, limit)
@@ -1,20 +1,24 @@
 """
 Script para migrar operações fechadas do operations.json para o histórico permanente
 Execute uma vez para migrar todas as operações fechadas existentes
+(também converte o antigo closed_operations_history.json para o banco SQLite)
 """
-import json
-import os
 import operations_history
+import state_store
 
 def migrate_closed_operations():
     """Migra todas as operações fechadas do operations.json para o histórico"""
     try:
-        if not os.path.exists('operations.json'):
+        # Converte o histórico JSON antigo (se existir) para o SQLite
+        migrated_json = operations_history.migrate_json_history()
+        if migrated_json:
+            print(f"✅ {migrated_json} operações do {operations_history.HISTORY_FILE} convertidas para {operations_history.HISTORY_DB}")
+
+        if not state_store.exists():
             print("Arquivo operations.json não encontrado.")
             return
         
-        with open('operations.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = state_store.load_operations()
         
         closed_ops = data.get('closed_operations', [])
         
@@ -24,12 +28,9 @@ def migrate_closed_operations():
         
         print(f"Migrando {len(closed_ops)} operações fechadas para o histórico...")
         
-        migrated = 0
-        for op in closed_ops:
-            if operations_history.save_to_history(op):
-                migrated += 1
+        migrated = len(closed_ops) if operations_history.save_many_to_history(closed_ops) else 0
         
-        print(f"✅ {migrated} operações migradas com sucesso para closed_operations_history.json")
+        print(f"✅ {migrated} operações migradas com sucesso para {operations_history.HISTORY_DB}")
         
         # Cria backup também
         operations_history.backup_operations_file()
@@ -0,0 +1,140 @@
+"""
+ohlcv_cache.py - Cache de candles por (símbolo, timeframe) compartilhado no processo
+
+Candles fechados são imutáveis: depois de baixados nunca são buscados de novo.
+Só o candle vivo (o último) expira - após LIVE_TTL segundos ou na virada do candle,
+o que vier primeiro - e a atualização busca apenas a partir dele (`since`).
+Entradas menos usadas são descartadas (LRU) quando passa de MAX_ENTRIES.
+Todo candle fechado vindo da exchange também é gravado no arquivo local (candle_archive),
+exceto os do servidor fake (EXCHANGE_URL).
+"""
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+from market_stream import timeframe_to_ms
+import candle_archive
+import exchange_session
+
+log = logging.getLogger(__name__)
+
+LIVE_TTL = 5            # Segundos que o candle vivo em cache é considerado fresco
+MAX_ENTRIES = 256       # Pares (símbolo, timeframe) mantidos em memória
+MAX_CANDLES = 1000      # Candles mantidos por par
+
+_cache = OrderedDict()  # (symbol, timeframe) -> {'candles': [...], 'fetched_at': float}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0}
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def _is_fresh(entry, tf_ms, max_age):
+    """Candle vivo ainda vale: dentro do TTL e sem virada de candle desde a busca"""
+    live_start = entry['candles'][-1][0]
+    now = time.time()
+    return now - entry['fetched_at'] < max_age and _now_ms() < live_start + tf_ms
+
+
+def _store(key, candles, fetched_at):
+    with _lock:
+        _cache[key] = {'candles': candles[-MAX_CANDLES:], 'fetched_at': fetched_at}
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+            _stats['evictions'] += 1
+
+
+def _archive(exchange, symbol, timeframe, candles):
+    """Grava os candles fechados no arquivo local (falha não afeta a busca)"""
+    if exchange_session.is_fake(exchange):
+        return
+    try:
+        candle_archive.record(symbol, timeframe, candles, exchange=exchange)
+    except Exception as e:
+        log.debug(f"Erro ao arquivar candles de {symbol} {timeframe}: {e}")
+
+
+def fetch_ohlcv(exchange, symbol, timeframe, limit=100, max_age=LIVE_TTL, copy=True):
+    """
+    Mesmo contrato de exchange.fetch_ohlcv(symbol, timeframe, limit=limit), servido do cache.
+    Retorna uma lista nova (o chamador pode modificar sem afetar o cache); com copy=False
+    os candles são os do próprio cache (somente leitura - candle_buffer).
+    """
+    _copy = (lambda rows: [list(c) for c in rows]) if copy else list
+    key = (symbol, timeframe)
+    tf_ms = timeframe_to_ms(timeframe)
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+
+    if entry is not None and len(entry['candles']) >= limit:
+        if _is_fresh(entry, tf_ms, max_age):
+            with _lock:
+                _stats['hits'] += 1
+            return _copy(entry['candles'][-limit:])
+
+        # Atualiza só a partir do candle vivo (que pode ter fechado desde a última busca)
+        live_start = entry['candles'][-1][0]
+        missing = max(0, (_now_ms() - live_start) // tf_ms) + 2
+        if missing < limit:
+            fetched_at = time.time()
+            recent = exchange.fetch_ohlcv(symbol, timeframe, since=live_start, limit=int(missing))
+            if recent and recent[0][0] == live_start:
+                candles = [c for c in entry['candles'] if c[0] < live_start] + [list(c) for c in recent]
+                _store(key, candles, fetched_at)
+                _archive(exchange, symbol, timeframe, recent)
+                with _lock:
+                    _stats['refreshes'] += 1
+                return _copy(candles[-limit:])
+            log.debug(f"Atualização incremental inconsistente para {symbol} {timeframe}, buscando completo")
+
+    fetched_at = time.time()
+    ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+    with _lock:
+        _stats['misses'] += 1
+    if ohlcv:
+        _store(key, [list(c) for c in ohlcv], fetched_at)
+        _archive(exchange, symbol, timeframe, ohlcv)
+    return _copy(ohlcv) if ohlcv else ohlcv
+
+
+def export_entries():
+    """Cópia das entradas do cache (snapshot de warm start)"""
+    with _lock:
+        return {key: {'candles': [list(c) for c in entry['candles']], 'fetched_at': entry['fetched_at']}
+                for key, entry in _cache.items()}
+
+
+def seed(entries):
+    """
+    Restaura entradas de um snapshot. O candle vivo fica expirado (fetched_at antigo):
+    a primeira busca só atualiza a partir dele, como num cache quente.
+    """
+    for key, entry in entries.items():
+        with _lock:
+            if key in _cache:
+                continue
+        if entry.get('candles'):
+            _store(key, [list(c) for c in entry['candles']], entry['fetched_at'])
+
+
+def invalidate(symbol=None, timeframe=None):
+    """Remove entradas do cache (todas, ou as do símbolo/timeframe indicados)"""
+    with _lock:
+        for key in list(_cache):
+            if (symbol is None or key[0] == symbol) and (timeframe is None or key[1] == timeframe):
+                del _cache[key]
+
+
+def stats():
+    """Contadores de hit/miss do cache"""
+    with _lock:
+        total = _stats['hits'] + _stats['misses'] + _stats['refreshes']
+        return dict(_stats, entries=len(_cache),
+                    hit_rate=round(_stats['hits'] / total * 100, 1) if total else 0.0)
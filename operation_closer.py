@@ -0,0 +1,157 @@
+"""
+operation_closer.py - Gravação de operações e saldo demo, compartilhada entre o bot e a web
+
+O bot (exit_position) e a interface web com o bot parado (fechamento manual offline)
+gravam o fechamento do mesmo jeito, sem a web importar davinci_bot (que configuraria
+logging, handlers e cliente da exchange do bot dentro do Flask):
+
+- apply_operation() / save_operation(): operations.json (transação do state_store) e
+  histórico permanente (SQLite) + backup
+- load_demo_balance() / save_demo_balance(): saldo do modo demo
+- close_offline(): fecha uma operação aberta pelo ID quando não há motor em execução
+"""
+import os
+import json
+import logging
+from datetime import datetime
+
+import state_store
+import event_log
+
+log = logging.getLogger(__name__)
+
+DEMO_BALANCE_FILE = 'demo_balance.json'
+DEFAULT_DEMO_BALANCE = 1000.0
+
+
+def load_demo_balance():
+    """Carrega saldo demo do arquivo JSON"""
+    try:
+        if os.path.exists(DEMO_BALANCE_FILE):
+            with open(DEMO_BALANCE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f).get('balance', DEFAULT_DEMO_BALANCE)
+    except Exception:
+        pass
+    return DEFAULT_DEMO_BALANCE
+
+
+def save_demo_balance(balance):
+    """Salva saldo demo no arquivo JSON"""
+    try:
+        with open(DEMO_BALANCE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'balance': balance}, f, indent=4)
+        return True
+    except Exception:
+        return False
+
+
+def apply_operation(data, operation):
+    """Aplica uma operação aberta/fechada ao estado de operations.json"""
+    if operation.get('status') == 'open':
+        data['open_operations'].append(operation)
+    else:
+        # Remove da lista aberta se existir
+        operation_id = operation.get('id')
+        if operation_id:
+            # Remove por ID (mais preciso)
+            data['open_operations'] = [op for op in data['open_operations'] if op.get('id') != operation_id]
+        else:
+            # Fallback: Remove por símbolo, lado e preço de entrada (caso ID não esteja disponível)
+            data['open_operations'] = [
+                op for op in data['open_operations']
+                if not (op.get('symbol') == operation.get('symbol') and
+                        op.get('side') == operation.get('side') and
+                        abs(op.get('entry_price', 0) - operation.get('entry_price', 0)) < 0.01)
+            ]
+        data['closed_operations'].append(operation)
+
+
+def record_history(operation):
+    """Operação fechada no histórico permanente + backup do operations.json (não crítico)"""
+    try:
+        import operations_history
+        operations_history.save_to_history(operation)
+        operations_history.backup_operations_file()
+    except Exception as e:
+        log.warning(f"Erro ao salvar no histórico (não crítico): {e}")
+
+
+def save_operation(operation):
+    """Salva operação no arquivo operations.json e no histórico permanente"""
+    try:
+        # Leitura-modificação-escrita sob o lock: bot e interface web não intercalam escritas
+        with state_store.transaction() as data:
+            apply_operation(data, operation)
+
+        if operation.get('status') != 'open':
+            # Salva no histórico permanente (arquivo separado) fora do lock
+            record_history(operation)
+    except Exception as e:
+        log.error(f"Erro ao salvar operação: {e}")
+
+
+def closed_operation(operation, exit_price, reason, now=None):
+    """Registro fechado (mesmos campos de exit_position) de uma operação aberta"""
+    now = now or datetime.now()
+    entry_price = float(operation['entry_price'])
+    quantity = float(operation.get('quantity') or 0)
+    long = operation['side'].upper() == 'LONG'
+    pnl_percent = ((exit_price - entry_price) if long else (entry_price - exit_price)) / entry_price * 100
+    pnl_usd = ((exit_price - entry_price) if long else (entry_price - exit_price)) * quantity
+    try:
+        entry_time = datetime.strptime(f"{operation['entry_date']} {operation['entry_time']}", '%Y-%m-%d %H:%M')
+        duration_min = max(0, (now - entry_time).total_seconds() / 60)
+    except (KeyError, ValueError):
+        duration_min = 0
+    return {
+        "id": operation.get('id'),
+        "symbol": operation['symbol'],
+        "side": operation['side'].upper(),
+        "entry_price": entry_price,
+        "exit_price": float(exit_price),
+        "quantity": quantity,
+        "leverage": operation.get('leverage'),
+        "entry_time": operation.get('entry_time') or now.strftime("%H:%M"),
+        "exit_time": now.strftime("%H:%M"),
+        "exit_date": now.strftime("%Y-%m-%d"),
+        "duration": f"{int(duration_min)}min",
+        "pnl": float(pnl_usd),
+        "pnl_percent": float(pnl_percent),
+        "reason": reason,
+        "status": "closed"
+    }
+
+
+def close_offline(operation_id, get_price=None, reason="Fechamento Manual pelo Usuário"):
+    """
+    Fecha uma operação aberta pelo ID sem o motor do bot (bot parado, modo demo).
+    get_price(symbol) dá o preço de saída; sem ele ou se falhar, usa o preço de entrada.
+    Busca e remoção acontecem na mesma transação: dois pedidos não fecham a operação duas vezes.
+    Retorna (resultado, mensagem de erro) como davinci_bot.close_operation.
+    """
+    with state_store.file_lock():
+        operation = next((op for op in state_store.load_operations().get('open_operations', [])
+                          if op.get('id') == operation_id and op.get('status') == 'open'), None)
+        if operation is None:
+            return None, "Operação não encontrada ou já está fechada"
+
+        exit_price = float(operation['entry_price'])
+        if get_price is not None:
+            try:
+                exit_price = float(get_price(operation['symbol']))
+            except Exception as e:
+                log.warning(f"Preço de {operation['symbol']} indisponível, fechando no preço de entrada: {e}")
+
+        closed = closed_operation(operation, exit_price, reason)
+        with state_store.transaction() as data:
+            apply_operation(data, closed)
+
+    record_history(closed)
+    if closed['pnl']:
+        save_demo_balance(load_demo_balance() + closed['pnl'])
+    event_log.append('exit', f"SAÍDA {closed['side']} (DEMO) | {reason} | PnL: {closed['pnl_percent']:+.2f}% | "
+                             f"Preço: ${exit_price:.2f}",
+                     symbol=closed['symbol'], side=closed['side'].lower(), reason=reason, price=exit_price,
+                     entry_price=closed['entry_price'], pnl=closed['pnl'], pnl_percent=closed['pnl_percent'],
+                     mode='DEMO', operation_id=operation_id)
+    return {"success": True, "pnl": closed['pnl'], "symbol": closed['symbol'], "side": closed['side']}, None
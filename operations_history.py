@@ -1,76 +1,277 @@
 """
 operations_history.py - Gerencia histórico permanente de operações fechadas
+
+O histórico fica num banco SQLite (append-only, indexado por id e por data), então
+salvar uma operação é O(1) e a leitura paginada não precisa carregar o arquivo todo.
+O ledger de PnL (tabela pnl_ledger, um balde por dia/símbolo/lado) é mantido por
+triggers a cada gravação no histórico, inclusive upserts: o resumo de PnL lê só os
+baldes, sem percorrer as operações. reset_ledger() (reset do saldo demo) zera o ledger:
+só operações gravadas depois do marcador (ledger_meta.reset_seq) entram nos baldes, e o
+histórico em si é mantido.
+O antigo closed_operations_history.json é migrado automaticamente no primeiro uso.
 """
 import json
 import os
 import shutil
+import sqlite3
+import threading
 from datetime import datetime
 import logging
 
 log = logging.getLogger(__name__)
 
-HISTORY_FILE = 'closed_operations_history.json'
+HISTORY_FILE = 'closed_operations_history.json'  # Formato antigo (migrado para HISTORY_DB)
+HISTORY_DB = 'closed_operations_history.db'
 BACKUP_DIR = 'backups'
 OPERATIONS_FILE = 'operations.json'
 
+_local = threading.local()
+
+# Campos da operação usados pelo ledger (dia de saída; registros antigos usam a entrada)
+_DAY = "COALESCE(json_extract({row}.data, '$.exit_date'), json_extract({row}.data, '$.entry_date'), '')"
+_SYMBOL = "COALESCE(json_extract({row}.data, '$.symbol'), '')"
+_SIDE = "UPPER(COALESCE(json_extract({row}.data, '$.side'), ''))"
+_PNL = "COALESCE(CAST(json_extract({row}.data, '$.pnl') AS REAL), 0)"
+
+def _ledger_add(row, sign):
+    """INSERT que soma (sign=1) ou subtrai (sign=-1) a operação `row` (NEW/OLD) do seu balde"""
+    fields = {name: expr.format(row=row) for name, expr in
+              (('day', _DAY), ('symbol', _SYMBOL), ('side', _SIDE), ('pnl', _PNL))}
+    return f"""
+        INSERT INTO pnl_ledger (day, symbol, side, trades, wins, losses, pnl)
+        VALUES ({fields['day']}, {fields['symbol']}, {fields['side']}, {sign},
+                {sign} * ({fields['pnl']} > 0), {sign} * ({fields['pnl']} < 0), {sign} * {fields['pnl']})
+        ON CONFLICT(day, symbol, side) DO UPDATE SET
+            trades = trades + excluded.trades, wins = wins + excluded.wins,
+            losses = losses + excluded.losses, pnl = pnl + excluded.pnl;
+    """
+
+# Só linhas do histórico depois do último reset entram no ledger
+_AFTER_RESET = "{row}.seq > COALESCE((SELECT value FROM ledger_meta WHERE key = 'reset_seq'), 0)"
+
+_LEDGER_SQL = f"""
+    CREATE TABLE IF NOT EXISTS ledger_meta (
+        key TEXT PRIMARY KEY,
+        value
+    );
+    CREATE TABLE IF NOT EXISTS pnl_ledger (
+        day TEXT NOT NULL,
+        symbol TEXT NOT NULL,
+        side TEXT NOT NULL,
+        trades INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        pnl REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, symbol, side)
+    );
+    -- Triggers anteriores ao marcador de reset (bancos existentes) são trocados na mesma transação
+    DROP TRIGGER IF EXISTS history_ledger_insert;
+    DROP TRIGGER IF EXISTS history_ledger_update;
+    DROP TRIGGER IF EXISTS history_ledger_delete;
+    CREATE TRIGGER IF NOT EXISTS ledger_insert_since_reset AFTER INSERT ON history
+    WHEN {_AFTER_RESET.format(row='NEW')} BEGIN
+        {_ledger_add('NEW', 1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS ledger_update_since_reset AFTER UPDATE OF data ON history
+    WHEN {_AFTER_RESET.format(row='NEW')} BEGIN
+        {_ledger_add('OLD', -1)}
+        {_ledger_add('NEW', 1)}
+    END;
+    CREATE TRIGGER IF NOT EXISTS ledger_delete_since_reset AFTER DELETE ON history
+    WHEN {_AFTER_RESET.format(row='OLD')} BEGIN
+        {_ledger_add('OLD', -1)}
+    END;
+"""
+
+_UPSERT_SQL = """
+    INSERT INTO history (op_id, sort_key, data) VALUES (?, ?, ?)
+    ON CONFLICT(op_id) DO UPDATE SET sort_key = excluded.sort_key, data = excluded.data
+"""
+
+def _sort_key(operation):
+    """Mesma chave de ordenação usada no JSON antigo (data + hora de entrada)"""
+    return operation.get('entry_date', '') + ' ' + operation.get('entry_time', '')
+
+def _row(operation):
+    return (operation.get('id') or None, _sort_key(operation), json.dumps(operation, ensure_ascii=False))
+
+def _connect(migrate=True):
+    """Conexão SQLite por thread (reaproveitada entre chamadas)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'path', None) == HISTORY_DB:
+        return conn
+
+    conn = sqlite3.connect(HISTORY_DB, timeout=10)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS history (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op_id INTEGER UNIQUE,
+            sort_key TEXT NOT NULL,
+            data TEXT NOT NULL
+        )
+    """)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_history_sort ON history (sort_key DESC, seq DESC)')
+    new_ledger = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pnl_ledger'").fetchone() is None
+    conn.executescript('BEGIN;' + _LEDGER_SQL + 'COMMIT;')
+    if new_ledger:
+        rebuild_ledger(conn)
+    conn.commit()
+    _local.conn = conn
+    _local.path = HISTORY_DB
+
+    if migrate:
+        migrate_json_history(conn)
+    return conn
+
 def ensure_history_file():
-    """Garante que o arquivo de histórico existe"""
-    if not os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f, indent=4, ensure_ascii=False)
+    """Garante que o banco de histórico existe (e migra o JSON antigo, se houver)"""
+    _connect()
 
-def save_to_history(operation):
-    """Salva operação fechada no histórico permanente"""
+def migrate_json_history(conn=None):
+    """
+    Migração única do closed_operations_history.json para o SQLite.
+    Tudo numa transação; o JSON é renomeado para .migrated ao final.
+    """
+    if not os.path.exists(HISTORY_FILE):
+        return 0
+    conn = conn or _connect(migrate=False)
     try:
-        ensure_history_file()
-        
         with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
             history = json.load(f)
-        
-        # Verifica se já existe (evita duplicatas)
-        operation_id = operation.get('id')
-        if operation_id:
-            existing = [op for op in history if op.get('id') == operation_id]
-            if existing:
-                # Atualiza se já existe
-                for i, op in enumerate(history):
-                    if op.get('id') == operation_id:
-                        history[i] = operation
-                        break
-            else:
-                # Adiciona novo
-                history.append(operation)
-        else:
-            # Adiciona mesmo sem ID (melhor que perder)
-            history.append(operation)
-        
-        # Ordena por data mais recente primeiro
-        history.sort(key=lambda x: x.get('entry_date', '') + ' ' + x.get('entry_time', ''), reverse=True)
-        
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=4, ensure_ascii=False)
-        
+
+        # O JSON está do mais recente para o mais antigo: insere na ordem cronológica
+        with conn:
+            conn.executemany(_UPSERT_SQL, [_row(op) for op in reversed(history)])
+
+        os.replace(HISTORY_FILE, HISTORY_FILE + '.migrated')
+        log.info(f"Histórico migrado para {HISTORY_DB}: {len(history)} operações")
+        return len(history)
+    except Exception as e:
+        log.error(f"Erro ao migrar histórico JSON: {e}")
+        return 0
+
+def save_to_history(operation):
+    """Salva operação fechada no histórico permanente (upsert por id)"""
+    return save_many_to_history([operation])
+
+def save_many_to_history(operations):
+    """Salva várias operações numa única transação"""
+    try:
+        conn = _connect()
+        with conn:
+            conn.executemany(_UPSERT_SQL, [_row(op) for op in operations])
         return True
     except Exception as e:
         log.error(f"Erro ao salvar no histórico: {e}")
         return False
 
-def load_history(limit=None):
-    """Carrega histórico de operações fechadas"""
+def load_history(limit=None, offset=0):
+    """Carrega histórico de operações fechadas (mais recentes primeiro, paginado)"""
     try:
-        if not os.path.exists(HISTORY_FILE):
+        if not os.path.exists(HISTORY_DB) and not os.path.exists(HISTORY_FILE):
             return []
-        
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-        
+
+        conn = _connect()
+        query = 'SELECT data FROM history ORDER BY sort_key DESC, seq DESC'
+        params = ()
         if limit:
-            return history[:limit]
-        return history
+            query += ' LIMIT ? OFFSET ?'
+            params = (int(limit), int(offset))
+        elif offset:
+            query += ' LIMIT -1 OFFSET ?'
+            params = (int(offset),)
+        return [json.loads(row[0]) for row in conn.execute(query, params)]
     except Exception as e:
         log.error(f"Erro ao carregar histórico: {e}")
         return []
 
+def count_history():
+    """Quantidade de operações no histórico"""
+    try:
+        if not os.path.exists(HISTORY_DB) and not os.path.exists(HISTORY_FILE):
+            return 0
+        return _connect().execute('SELECT COUNT(*) FROM history').fetchone()[0]
+    except Exception as e:
+        log.error(f"Erro ao contar histórico: {e}")
+        return 0
+
+def rebuild_ledger(conn=None):
+    """Recalcula o ledger a partir do histórico (desde o último reset; criação do ledger em banco existente)"""
+    conn = conn or _connect()
+    fields = {name: expr.format(row='history') for name, expr in
+              (('day', _DAY), ('symbol', _SYMBOL), ('side', _SIDE), ('pnl', _PNL))}
+    with conn:
+        conn.execute('DELETE FROM pnl_ledger')
+        conn.execute(f"""
+            INSERT INTO pnl_ledger (day, symbol, side, trades, wins, losses, pnl)
+            SELECT day, symbol, side, COUNT(*), SUM(pnl > 0), SUM(pnl < 0), SUM(pnl) FROM (
+                SELECT {fields['day']} AS day, {fields['symbol']} AS symbol,
+                       {fields['side']} AS side, {fields['pnl']} AS pnl FROM history
+                WHERE {_AFTER_RESET.format(row='history')}
+            ) GROUP BY day, symbol, side
+        """)
+
+def reset_ledger():
+    """
+    Zera o PnL realizado (reset do saldo demo): marca a última linha do histórico e esvazia
+    o ledger. As operações continuam no histórico, mas só as gravadas depois entram no PnL.
+    """
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO ledger_meta (key, value) "
+                         "SELECT 'reset_seq', COALESCE(MAX(seq), 0) FROM history")
+            conn.execute("INSERT OR REPLACE INTO ledger_meta (key, value) VALUES ('reset_at', ?)",
+                         (datetime.now().strftime('%Y-%m-%d %H:%M:%S'),))
+            conn.execute('DELETE FROM pnl_ledger')
+        return True
+    except Exception as e:
+        log.error(f"Erro ao zerar ledger de PnL: {e}")
+        return False
+
+def _bucket(row):
+    trades, wins, losses, pnl = row
+    decided = (wins or 0) + (losses or 0)
+    return {
+        "pnl": float(pnl or 0.0),
+        "trades": int(trades or 0),
+        "winning_ops": int(wins or 0),
+        "losing_ops": int(losses or 0),
+        "win_rate": round(wins / decided * 100, 1) if decided else 0.0,
+    }
+
+def pnl_summary(since=None, days=None):
+    """
+    PnL realizado a partir do ledger (sem percorrer as operações).
+    since: 'YYYY-MM-DD' - só dias a partir dele (operações antigas sem data ficam de fora).
+    days: limita o rollup diário aos N dias mais recentes.
+    Retorna total + rollups por símbolo, por lado e por dia, e reset_at (último reset do ledger).
+    """
+    empty = dict(_bucket((0, 0, 0, 0.0)), by_symbol={}, by_side={}, by_day={}, reset_at=None)
+    try:
+        if not os.path.exists(HISTORY_DB) and not os.path.exists(HISTORY_FILE):
+            return empty
+        conn = _connect()
+        where, params = ('WHERE day >= ?', (since,)) if since else ('', ())
+        totals = 'SUM(trades), SUM(wins), SUM(losses), SUM(pnl)'
+        summary = _bucket(conn.execute(f'SELECT {totals} FROM pnl_ledger {where}', params).fetchone())
+        for group, key in (('symbol', 'by_symbol'), ('side', 'by_side')):
+            rows = conn.execute(f'SELECT {group}, {totals} FROM pnl_ledger {where} GROUP BY {group}', params)
+            summary[key] = {row[0]: _bucket(row[1:]) for row in rows}
+        query = f"SELECT day, {totals} FROM pnl_ledger {where} GROUP BY day HAVING day != '' ORDER BY day DESC"
+        if days:
+            query += f' LIMIT {int(days)}'
+        summary['by_day'] = {row[0]: _bucket(row[1:]) for row in conn.execute(query, params)}
+        reset_at = conn.execute("SELECT value FROM ledger_meta WHERE key = 'reset_at'").fetchone()
+        summary['reset_at'] = reset_at[0] if reset_at else None
+        return summary
+    except Exception as e:
+        log.error(f"Erro ao ler ledger de PnL: {e}")
+        return empty
+
 def backup_operations_file():
     """Cria backup do arquivo operations.json"""
     try:
@@ -103,19 +304,18 @@ def backup_operations_file():
 def merge_history_with_operations():
     """Merga operações fechadas do operations.json no histórico"""
     try:
-        if not os.path.exists(OPERATIONS_FILE):
+        import state_store
+        if not state_store.exists():
             return
         
-        with open(OPERATIONS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = state_store.load_operations()
         
         closed_ops = data.get('closed_operations', [])
         if not closed_ops:
             return
         
-        # Salva cada operação no histórico
-        for op in closed_ops:
-            save_to_history(op)
+        # Salva todas as operações no histórico numa única transação
+        save_many_to_history(closed_ops)
         
         log.info(f"Mergidas {len(closed_ops)} operações fechadas no histórico")
         return True
@@ -134,7 +334,10 @@ def restore_from_backup():
             return False
         
         latest_backup = os.path.join(BACKUP_DIR, backups[0])
-        shutil.copy2(latest_backup, OPERATIONS_FILE)
+        # Copia para temporário e troca atomicamente (leitores nunca veem arquivo pela metade)
+        tmp_file = OPERATIONS_FILE + '.restore.tmp'
+        shutil.copy2(latest_backup, tmp_file)
+        os.replace(tmp_file, OPERATIONS_FILE)
         
         log.info(f"Backup restaurado: {backups[0]}")
         return True
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+optimizer.py - Varredura de parâmetros do bot_config.json sobre o backtest
+
+Modos:
+  - grid:   todas as combinações dos valores (min:max:passo) de cada parâmetro
+  - random: amostras aleatórias no mesmo espaço
+  - tpe:    otimização bayesiana (Tree-structured Parzen Estimator): começa aleatório e
+            passa a amostrar perto das melhores combinações já avaliadas
+
+Os indicadores não dependem dos parâmetros varridos (RSI_LONG, STOP_LOSS...), então são
+calculados uma vez por símbolo e gravados em arquivos .npy; os processos do pool abrem
+esses arquivos via memmap (somente leitura, memória compartilhada pelo SO) e cada
+avaliação roda apenas a simulação de backtest.simulate.
+
+Uso:
+    python optimizer.py BTC.csv ETH.csv --mode grid --param RSI_LONG=50:70:5 --param ADX_THRESH=15:30:5
+    python optimizer.py --download --symbols all --timeframe 5m --days 30 --mode tpe --trials 300
+    python optimizer.py --synthetic 200000 --mode random --trials 200 --out sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import backtest
+import indicator_engine
+
+log = logging.getLogger(__name__)
+
+# Espaço padrão: (mínimo, máximo, passo)
+DEFAULT_SPACE = {
+    'RSI_LONG': (50, 70, 5),
+    'RSI_SHORT': (30, 50, 5),
+    'ADX_THRESH': (15, 30, 5),
+    'STOP_LOSS': (0.005, 0.02, 0.0025),
+    'TAKE_PROFIT': (0.01, 0.04, 0.005),
+    'TRAILING_STOP': (0.003, 0.012, 0.001),
+    'EXIT_RSI_LONG': (70, 90, 5),
+    'EXIT_RSI_SHORT': (10, 30, 5),
+}
+
+OBJECTIVES = {
+    'pnl': lambda s: s['total_pnl'],
+    'pnl_dd': lambda s: s['total_pnl'] / max(s['max_drawdown'], 1.0),
+    'profit_factor': lambda s: s['profit_factor'] if s['profit_factor'] is not None else 0.0,
+    'win_rate': lambda s: s['win_rate'],
+}
+
+MAX_WORKERS = os.cpu_count() or 4
+MAX_STALLED_ROUNDS = 20  # Lotes seguidos só com combinações repetidas antes de desistir (random/tpe)
+
+
+# ------------------------------------------------------------------
+# Candles compartilhados (memmap)
+# ------------------------------------------------------------------
+def share_frames(frames, directory):
+    """
+    Grava as colunas (já com indicadores) de cada símbolo em .npy dentro de `directory`.
+    Retorna o manifesto usado pelos processos para abrir os arquivos via memmap.
+    """
+    manifest = {}
+    for number, (symbol, df) in enumerate(frames.items()):
+        folder = os.path.join(directory, str(number))
+        os.makedirs(folder, exist_ok=True)
+        seconds = (df.index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        np.save(os.path.join(folder, 'timestamp.npy'), np.asarray(seconds, dtype=np.int64))
+        for column in df.columns:
+            np.save(os.path.join(folder, f'{column}.npy'), df[column].to_numpy())
+        manifest[symbol] = {'path': folder, 'columns': list(df.columns)}
+    return manifest
+
+
+def open_frames(manifest):
+    """DataFrames sobre os arquivos memmap (sem copiar os dados)"""
+    frames = {}
+    for symbol, info in manifest.items():
+        columns = {c: np.load(os.path.join(info['path'], f'{c}.npy'), mmap_mode='r') for c in info['columns']}
+        seconds = np.load(os.path.join(info['path'], 'timestamp.npy'), mmap_mode='r')
+        index = pd.to_datetime(np.asarray(seconds), unit='s')
+        frames[symbol] = pd.DataFrame(columns, index=index, copy=False)
+    return frames
+
+
+_worker_frames = None
+
+
+def _init_worker(manifest):
+    global _worker_frames
+    _worker_frames = open_frames(manifest)
+
+
+def _evaluate(task):
+    """Roda o backtest de uma combinação em todos os símbolos (executa no processo do pool)"""
+    params, base_config, fee = task
+    config = dict(base_config, **params)
+    per_symbol = {}
+    all_trades = []
+    for symbol, df in _worker_frames.items():
+        trades = backtest.simulate(df, config, fee)
+        per_symbol[symbol] = round(sum(t['pnl'] for t in trades), 4)
+        all_trades.extend(trades)
+    # Métricas combinadas na ordem de saída (drawdown do portfólio)
+    all_trades.sort(key=lambda t: t['exit_time'])
+    summary = backtest.summarize(all_trades, config['DEMO_BALANCE'])
+    return params, summary, per_symbol
+
+
+# ------------------------------------------------------------------
+# Espaço de busca
+# ------------------------------------------------------------------
+def _snap(value, low, high, step):
+    value = min(max(value, low), high)
+    if step:
+        value = low + round((value - low) / step) * step
+    return round(value, 10)
+
+
+def grid_points(space):
+    names = list(space)
+    axes = []
+    for low, high, step in space.values():
+        count = int(math.floor((high - low) / step + 1e-9)) + 1
+        axes.append([round(low + k * step, 10) for k in range(count)])
+    return [dict(zip(names, combo)) for combo in itertools.product(*axes)]
+
+
+def space_size(space):
+    """Quantidade de combinações distintas (None se algum parâmetro é contínuo, passo 0)"""
+    size = 1
+    for low, high, step in space.values():
+        if not step:
+            return None
+        size *= int(math.floor((high - low) / step + 1e-9)) + 1
+    return size
+
+
+def random_points(space, count, rng):
+    return [{name: _snap(rng.uniform(low, high), low, high, step) for name, (low, high, step) in space.items()}
+            for _ in range(count)]
+
+
+def tpe_points(space, history, count, rng, gamma=0.25, candidates=64):
+    """
+    Propõe `count` pontos: amostra candidatos perto dos melhores resultados (l(x)) e
+    escolhe os que maximizam l(x)/g(x), onde g(x) é a densidade dos piores.
+    history: lista de (params, score).
+    """
+    if len(history) < 10:
+        return random_points(space, count, rng)
+
+    ranked = sorted(history, key=lambda item: item[1], reverse=True)
+    n_good = max(2, int(len(ranked) * gamma))
+    good = [p for p, _ in ranked[:n_good]]
+    bad = [p for p, _ in ranked[n_good:]]
+
+    def density(x, points, name, width):
+        values = np.array([p[name] for p in points], dtype=float)
+        return float(np.mean(np.exp(-0.5 * ((x - values) / width) ** 2))) + 1e-12
+
+    proposals = []
+    for _ in range(count):
+        best, best_ratio = None, -1.0
+        for _ in range(candidates):
+            base = good[rng.integers(len(good))]
+            point, ratio = {}, 1.0
+            for name, (low, high, step) in space.items():
+                width = max((high - low) / math.sqrt(len(good) + 1), step or 1e-9)
+                value = _snap(rng.normal(base[name], width), low, high, step)
+                point[name] = value
+                ratio *= density(value, good, name, width) / density(value, bad, name, width)
+            if ratio > best_ratio:
+                best, best_ratio = point, ratio
+        proposals.append(best)
+    return proposals
+
+
+# ------------------------------------------------------------------
+# Varredura
+# ------------------------------------------------------------------
+def run_sweep(frames, space, mode='random', trials=100, base_config=None, fee=0.0,
+              objective='pnl', min_trades=1, workers=MAX_WORKERS, seed=42, progress=None):
+    """
+    Avalia as combinações em paralelo e retorna os resultados ordenados (melhor primeiro).
+    frames: {símbolo: DataFrame de candles (open/high/low/close/volume)}
+    """
+    base_config = dict(backtest.DEFAULT_CONFIG, **(base_config or {}))
+    score_of = OBJECTIVES[objective]
+    rng = np.random.default_rng(seed)
+
+    # Indicadores uma vez por símbolo (não dependem dos parâmetros varridos)
+    prepared = {symbol: backtest.prepare(df) for symbol, df in frames.items()}
+
+    workdir = tempfile.mkdtemp(prefix='davinci_sweep_')
+    results = []
+    seen = set()
+    try:
+        manifest = share_frames(prepared, workdir)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(manifest,)) as pool:
+
+            def evaluate(points):
+                tasks = []
+                for point in points:
+                    key = tuple(sorted(point.items()))
+                    if key not in seen:
+                        seen.add(key)
+                        tasks.append((point, base_config, fee))
+                for params, summary, per_symbol in pool.map(_evaluate, tasks, chunksize=max(1, len(tasks) // (workers * 4))):
+                    valid = summary['total_operations'] >= min_trades
+                    score = score_of(summary) if valid else float('-inf')
+                    results.append({'params': params, 'score': score, 'summary': summary, 'per_symbol': per_symbol})
+                if progress:
+                    progress(len(results))
+
+            if mode == 'grid':
+                evaluate(grid_points(space))
+            elif mode in ('random', 'tpe'):
+                # Repetidos não contam: amostra até usar o orçamento. Depois de um lote sem
+                # combinação nova, o TPE (concentrado nos melhores) amostra aleatoriamente
+                size = space_size(space)
+                budget = min(trials, size) if size else trials
+                if budget < trials:
+                    log.warning(f"Espaço com {size} combinações: {budget} avaliações em vez de {trials}")
+                batch = max(workers, 8) if mode == 'tpe' else budget
+                stalled = 0
+                while len(results) < budget:
+                    count = min(batch, budget - len(results))
+                    if mode == 'tpe' and not stalled:
+                        history = [(r['params'], r['score']) for r in results if r['score'] != float('-inf')]
+                        points = tpe_points(space, history, count, rng)
+                    else:
+                        points = random_points(space, count, rng)
+                    before = len(results)
+                    evaluate(points)
+                    stalled = stalled + 1 if len(results) == before else 0
+                    if stalled >= MAX_STALLED_ROUNDS:
+                        log.warning(f"Amostragem encerrada com {len(results)}/{budget} avaliações: "
+                                    f"{MAX_STALLED_ROUNDS} lotes seguidos só com combinações repetidas")
+                        break
+            else:
+                raise ValueError(f"Modo desconhecido: {mode}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return sorted(results, key=lambda r: r['score'], reverse=True)
+
+
+def format_table(results, top=20):
+    """Tabela ranqueada dos melhores resultados"""
+    if not results:
+        return "Nenhum resultado."
+    names = list(results[0]['params'])
+    header = ['#'] + names + ['PnL', 'Ops', 'Win%', 'PF', 'DD']
+    rows = []
+    for rank, r in enumerate(results[:top], 1):
+        s = r['summary']
+        pf = f"{s['profit_factor']:.2f}" if s['profit_factor'] is not None else '-'
+        rows.append([str(rank)] + [f"{r['params'][n]:g}" for n in names] +
+                    [f"{s['total_pnl']:+.2f}", str(s['total_operations']), f"{s['win_rate']:.1f}", pf,
+                     f"{s['max_drawdown']:.2f}"])
+    widths = [max(len(h), *(len(row[i]) for row in rows)) for i, h in enumerate(header)]
+    lines = [' '.join(h.rjust(w) for h, w in zip(header, widths))]
+    lines += [' '.join(c.rjust(w) for c, w in zip(row, widths)) for row in rows]
+    return '\n'.join(lines)
+
+
+def save_results(results, path):
+    if not results:
+        return
+    names = list(results[0]['params'])
+    symbols = list(results[0]['per_symbol'])
+    metrics = ['score', 'total_pnl', 'total_operations', 'win_rate', 'profit_factor', 'max_drawdown', 'max_drawdown_pct']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank'] + names + metrics + [f'pnl_{s}' for s in symbols])
+        for rank, r in enumerate(results, 1):
+            s = dict(r['summary'], score=r['score'])
+            writer.writerow([rank] + [r['params'][n] for n in names] + [s[m] for m in metrics] +
+                            [r['per_symbol'][sym] for sym in symbols])
+
+
+# ------------------------------------------------------------------
+# Dados
+# ------------------------------------------------------------------
+def fetch_history(symbol, timeframe, days):
+    """
+    `days` dias de candles: completa o arquivo local (candle_archive) com a Binance e lê
+    de lá - rodadas seguintes só baixam o que chegou desde a última.
+    """
+    import exchange_session
+    import candle_archive
+
+    candle_archive.backfill(exchange_session.get_exchange(), symbol, timeframe, days)
+    since = int(time.time() * 1000) - days * 86_400_000
+    return candle_archive.load_frame(symbol, timeframe, start=since)
+
+
+def parse_space(items):
+    """['RSI_LONG=50:70:5', ...] -> {'RSI_LONG': (50, 70, 5)}; sem itens usa DEFAULT_SPACE"""
+    if not items:
+        return dict(DEFAULT_SPACE)
+    space = {}
+    for item in items:
+        name, _, spec = item.partition('=')
+        name = name.strip()
+        if not spec:
+            space[name] = DEFAULT_SPACE[name]
+            continue
+        parts = [float(v) for v in spec.split(':')]
+        low, high = parts[0], parts[1] if len(parts) > 1 else parts[0]
+        step = parts[2] if len(parts) > 2 else 0
+        space[name] = (low, high, step)
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Otimização de parâmetros do Da Vinci Bot')
+    parser.add_argument('candles', nargs='*', help='arquivos CSV/Parquet (um por símbolo)')
+    parser.add_argument('--mode', choices=['grid', 'random', 'tpe'], default='random')
+    parser.add_argument('--param', action='append', metavar='CHAVE=MIN:MAX:PASSO',
+                        help='parâmetro varrido (repetível; padrão: %s)' % ', '.join(DEFAULT_SPACE))
+    parser.add_argument('--trials', type=int, default=200, help='avaliações (random/tpe)')
+    parser.add_argument('--objective', choices=list(OBJECTIVES), default='pnl')
+    parser.add_argument('--min-trades', type=int, default=10)
+    parser.add_argument('--fee', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--config', default='bot_config.json')
+    parser.add_argument('--set', action='append', metavar='CHAVE=VALOR', help='config fixa')
+    parser.add_argument('--download', action='store_true', help='baixa o histórico da Binance')
+    parser.add_argument('--symbols', default='all', help="'all' (SUPPORTED_SYMBOLS) ou lista separada por vírgula")
+    parser.add_argument('--timeframe', default='5m')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--synthetic', type=int, metavar='N', help='usa N candles sintéticos')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--out', metavar='ARQUIVO.csv', help='salva todos os resultados ranqueados')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    frames = {}
+    if args.synthetic:
+        from market_stream import timeframe_to_ms
+        minutes = timeframe_to_ms(args.timeframe) // 60_000
+        frames = {f'SYN{k}': indicator_engine._synthetic_candles(args.synthetic, minutes, seed=k) for k in range(2)}
+    elif args.download:
+        if args.symbols == 'all':
+            from analyzer import SUPPORTED_SYMBOLS
+            symbols = SUPPORTED_SYMBOLS
+        else:
+            symbols = [s.strip() for s in args.symbols.split(',') if s.strip()]
+        for symbol in symbols:
+            print(f"Baixando {symbol} {args.timeframe} ({args.days} dias)...")
+            frames[symbol] = fetch_history(symbol, args.timeframe, args.days)
+    else:
+        for path in args.candles:
+            frames[os.path.splitext(os.path.basename(path))[0]] = backtest.load_candles(path)
+    if not frames:
+        parser.error('informe arquivos de candles, --download ou --synthetic N')
+
+    space = parse_space(args.param)
+    base_config = backtest.load_config(args.config, backtest._parse_overrides(args.set))
+    total = len(grid_points(space)) if args.mode == 'grid' else min(args.trials, space_size(space) or args.trials)
+    print(f"Varredura {args.mode}: {total} combinações x {len(frames)} símbolos | {args.workers} processos")
+
+    started = time.time()
+    results = run_sweep(frames, space, args.mode, args.trials, base_config, args.fee, args.objective,
+                        args.min_trades, args.workers, args.seed,
+                        progress=lambda n: print(f"  {n} avaliadas ({time.time() - started:.1f}s)", flush=True))
+    print(f"\nConcluído em {time.time() - started:.1f}s - top {args.top} por {args.objective}:\n")
+    print(format_table(results, args.top))
+    if args.out:
+        save_results(results, args.out)
+        print(f"\nResultados salvos em {args.out}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
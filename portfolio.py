@@ -0,0 +1,254 @@
+"""
+portfolio.py - Modo portfólio: opera N símbolos num único processo do bot
+
+Cada símbolo tem seu próprio objeto Position (lado, preço de entrada, picos, cooldown...)
+em vez das variáveis globais de davinci_bot. Todos compartilham:
+  - o cliente ccxt do processo (exchange_session) e o cache de candles (ohlcv_cache)
+  - a engine de indicadores (uma instância incremental por símbolo/timeframe)
+  - um único tick do scheduler: candles buscados em paralelo, depois cada símbolo
+    é avaliado em sequência e o PnL de todas as operações é atualizado uma vez
+
+A lógica de sinal/saída continua sendo a de davinci_bot: durante a avaliação de um
+símbolo o estado da Position e as configurações do símbolo são carregados nas globais
+do bot (mesmo mecanismo usado por web_interface.close_operation) e salvos de volta depois.
+
+Config (bot_config.json):
+    "SYMBOLS": ["BTC/USDT", "ETH/USDT", "SOL/USDT"],
+    "SYMBOL_OVERRIDES": {"ETH/USDT": {"LEVERAGE": 5, "TIMEFRAME": "15m"}}
+"""
+import time
+import logging
+import supervisor
+import warm_start
+import scheduler
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+MAX_WORKERS = 8  # Buscas de candles em paralelo (limitadas pelo rate limit compartilhado)
+
+# Estado de posição que vive nas globais de davinci_bot durante a avaliação
+POSITION_FIELDS = ('in_position', 'position_side', 'entry_price', 'entry_time',
+                   'highest_price', 'lowest_price', 'last_candle_time', 'last_signal_time')
+
+# Configurações que podem ser sobrescritas por símbolo (mesmo nome da global em davinci_bot)
+OVERRIDABLE = ('TIMEFRAME', 'POSITION_SIZE_USD', 'LEVERAGE',
+               'RSI_LONG', 'RSI_SHORT', 'USE_VOL', 'USE_ADX', 'ADX_THRESH',
+               'STOP_LOSS', 'TAKE_PROFIT', 'TRAILING_STOP', 'USE_FIXED_EXIT', 'USE_TRAILING',
+               'EXIT_RSI_LONG', 'EXIT_RSI_SHORT', 'USE_EXIT_RSI', 'EXIT_ADX_THRESHOLD', 'USE_EXIT_ADX',
+               'EXIT_AFTER_MINUTES', 'USE_TIME_EXIT', 'EXIT_ON_VOLUME_SPIKE', 'EXIT_VOLUME_MULTIPLIER',
+               'TRAIL_OFFSET')
+
+
+class Position:
+    """Estado de posição de um símbolo"""
+
+    def __init__(self, symbol, overrides=None):
+        self.symbol = symbol
+        self.overrides = {k: v for k, v in (overrides or {}).items() if k in OVERRIDABLE}
+        if 'TRAILING_STOP' in self.overrides and 'TRAIL_OFFSET' not in self.overrides:
+            self.overrides['TRAIL_OFFSET'] = self.overrides['TRAILING_STOP']
+        self.in_position = False
+        self.position_side = None
+        self.entry_price = 0.0
+        self.entry_time = None
+        self.highest_price = 0.0
+        self.lowest_price = 0.0
+        self.last_candle_time = None
+        self.last_signal_time = None
+
+    def timeframe(self, default):
+        return self.overrides.get('TIMEFRAME', default)
+
+    def __repr__(self):
+        side = self.position_side.upper() if self.in_position and self.position_side else 'FLAT'
+        return f"Position({self.symbol} {side} entry={self.entry_price})"
+
+
+class Portfolio:
+    """Conjunto de posições avaliadas num único tick"""
+
+    def __init__(self, bot, symbols, overrides=None):
+        self.bot = bot
+        self.positions = {}
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='portfolio')
+        self.configure(symbols, overrides)
+
+    def configure(self, symbols, overrides=None):
+        """Aplica lista de símbolos/overrides do config, mantendo o estado dos que continuam"""
+        overrides = overrides or {}
+        positions = {}
+        for symbol in dict.fromkeys(symbols):
+            position = self.positions.get(symbol) or Position(symbol)
+            new = Position(symbol, overrides.get(symbol))
+            position.overrides = new.overrides
+            positions[symbol] = position
+        for symbol in self.positions:
+            if symbol not in positions:
+                if self.positions[symbol].in_position:
+                    # Mantém até fechar: removido do config com operação aberta
+                    positions[symbol] = self.positions[symbol]
+                else:
+                    log.info(f"[PORTFÓLIO] {symbol} removido")
+        for symbol in positions:
+            if symbol not in self.positions:
+                log.info(f"[PORTFÓLIO] {symbol} adicionado")
+        self.positions = positions
+
+    @contextmanager
+    def bind(self, position):
+        """
+        Carrega posição e config do símbolo nas globais do bot durante o bloco.
+        Segura engine_lock: comandos do canal de controle não intercalam com a avaliação.
+        """
+        bot = self.bot
+        with bot.engine_lock:
+            base = {name: getattr(bot, name) for name in OVERRIDABLE}
+            base_symbol = bot.SYMBOL
+            bot.SYMBOL = position.symbol
+            for name, value in position.overrides.items():
+                setattr(bot, name, value)
+            for name in POSITION_FIELDS:
+                setattr(bot, name, getattr(position, name))
+            try:
+                yield position
+            finally:
+                for name in POSITION_FIELDS:
+                    setattr(position, name, getattr(bot, name))
+                for name, value in base.items():
+                    setattr(bot, name, value)
+                bot.SYMBOL = base_symbol
+
+    def fetch_all(self):
+        """Busca os candles de todos os símbolos em paralelo (cliente e cache compartilhados)"""
+        futures = {
+            symbol: self._executor.submit(self.bot.fetch_ohlcv, symbol, position.timeframe(self.bot.TIMEFRAME))
+            for symbol, position in self.positions.items()
+        }
+        frames = {}
+        for symbol, future in futures.items():
+            try:
+                frames[symbol] = future.result()
+            except Exception as e:
+                log.error(f"[PORTFÓLIO] Erro ao buscar candles de {symbol}: {e}")
+        return frames
+
+    def sync_from_file(self):
+        for position in self.positions.values():
+            with self.bind(position):
+                self.bot.sync_position_from_file()
+
+    def set_leverage(self):
+        for position in self.positions.values():
+            with self.bind(position):
+                self.bot.set_leverage()
+
+    def tick(self, full_tick=True):
+        """Um tick para todos os símbolos; retorna os símbolos que ficaram sem candles"""
+        frames = self.fetch_all()
+        missing = []
+        for symbol, position in self.positions.items():
+            df = frames.get(symbol)
+            if df is None or len(df) == 0:
+                missing.append(symbol)
+                continue
+            try:
+                with self.bind(position):
+                    self.bot.process_tick(df, full_tick, update_pnl=False)
+            except Exception as e:
+                log.error(f"[PORTFÓLIO] Erro ao processar {symbol}: {e}")
+
+        # Uma única atualização de PnL (e uma escrita de operations.json) para todos
+        if full_tick:
+            self.bot.update_open_operations_pnl()
+        return missing
+
+    def check_exits(self):
+        """Verificação só de saída dos símbolos em posição (entre os ticks completos)"""
+        positions = {symbol: p for symbol, p in self.positions.items() if p.in_position}
+        if not positions:
+            return
+        futures = {
+            symbol: self._executor.submit(self.bot.fetch_ohlcv, symbol, position.timeframe(self.bot.TIMEFRAME))
+            for symbol, position in positions.items()
+        }
+        for symbol, position in positions.items():
+            try:
+                df = futures[symbol].result()
+                if df is not None and len(df) > 0:
+                    with self.bind(position):
+                        self.bot.process_exit_tick(df)
+            except Exception as e:
+                log.error(f"[PORTFÓLIO] Erro ao verificar saída de {symbol}: {e}")
+
+    def close(self):
+        """Libera o pool de buscas (saída do modo portfólio)"""
+        self._executor.shutdown(wait=False)
+
+    def summary(self):
+        open_positions = [p for p in self.positions.values() if p.in_position]
+        return f"{len(self.positions)} símbolos | {len(open_positions)} em posição"
+
+
+def run(bot, snapshot=None):
+    """
+    Loop principal do modo portfólio (chamado por davinci_bot.main; snapshot de warm_start).
+    Retorna quando SYMBOLS fica vazio e não resta posição aberta (volta ao modo de um símbolo).
+    """
+    portfolio = Portfolio(bot, bot.SYMBOLS, bot.SYMBOL_OVERRIDES)
+    bot.active_portfolio = portfolio  # Fechamentos pelo canal de controle usam a Position do símbolo
+    log.info(f"[PORTFÓLIO] Modo portfólio: {', '.join(portfolio.positions)}")
+    if bot.USE_STREAM:
+        log.info("[PORTFÓLIO] Streaming WebSocket não é usado no modo portfólio (REST compartilhado)")
+
+    # Verifica e limpa operações abertas ao iniciar (exceto as retomadas pelo snapshot)
+    if not warm_start.covers(snapshot, list(portfolio.positions)):
+        bot.cleanup_open_operations()
+    portfolio.set_leverage()
+    bot.get_balance()
+    portfolio.sync_from_file()
+    for symbol, position in portfolio.positions.items():
+        warm_start.restore_position(snapshot, symbol, position)
+
+    # Ticks completos na grade do horário da exchange; saídas em cadência rápida entre eles
+    schedule = scheduler.TickScheduler(bot.clock, bot.CHECK_INTERVAL)
+    while True:
+        kind, skew = schedule.poll()
+        started = time.time()
+        tick_error = None
+        missing = []
+        try:
+            if kind == 'full':
+                bot.tick_skew_ms = skew * 1000
+                # Recarrega configuração para pegar mudanças da interface
+                bot.reload_config()
+                # SYMBOLS vazio: símbolos sem posição saem já; os em posição ficam até fechar
+                portfolio.configure(bot.SYMBOLS or [], bot.SYMBOL_OVERRIDES)
+                if not portfolio.positions:
+                    log.info(f"[PORTFÓLIO] SYMBOLS vazio: voltando ao modo de um símbolo ({bot.SYMBOL})")
+                    bot.active_portfolio = None
+                    portfolio.close()
+                    return
+                missing = portfolio.tick(full_tick=True)
+                if missing:
+                    tick_error = f"Sem candles: {', '.join(missing)}"
+                with bot.engine_lock:
+                    warm_start.save(bot, portfolio.positions)
+                log.info(f"[PORTFÓLIO] {portfolio.summary()} | tick em {time.time() - started:.2f}s | "
+                         f"atraso {bot.tick_skew_ms:+.0f}ms")
+            elif kind == 'exit':
+                portfolio.check_exits()
+                log.debug(f"[PORTFÓLIO] Verificação de saídas com atraso de {skew * 1000:+.0f}ms")
+        except Exception as e:
+            tick_error = str(e)
+            log.error(f"Erro crítico no loop: {e}")
+
+        if kind == 'full':
+            # Heartbeat em todo tick completo, também quando o tick falhou (last_error diz por quê)
+            supervisor.heartbeat(time.time() - started, bot.CHECK_INTERVAL, symbols=list(portfolio.positions),
+                                 mode=bot.get_log_mode(), skew_ms=round(bot.tick_skew_ms, 1),
+                                 in_position=[p.symbol for p in portfolio.positions.values() if p.in_position],
+                                 last_fetch_ok=not missing and tick_error is None, last_error=tick_error)
+
+        time.sleep(schedule.wait_time())
@@ -0,0 +1,108 @@
+"""
+scheduler.py - Agenda dos ticks do bot alinhada ao relógio da exchange
+
+Em vez de dormir CHECK_INTERVAL a partir do fim do tick anterior (que desliza em relação
+aos candles), os ticks completos caem numa grade fixa do horário do SERVIDOR:
+
+    múltiplos de CHECK_INTERVAL (60s) + CLOSE_OFFSET
+
+Todo timeframe do bot (1m, 5m, 15m, 1h...) é múltiplo de 1 minuto, então a grade inclui
+todos os fechamentos de candle: o sinal do candle recém-fechado é avaliado CLOSE_OFFSET
+segundos depois do fechamento (tempo para a exchange consolidar o candle), não de 0 a 60s
+depois. Entre os ticks completos, com posição aberta, as saídas são verificadas a cada
+EXIT_CHECK_INTERVAL segundos.
+
+ExchangeClock mede a diferença entre o relógio local e o da exchange (fetch_time, corrigido
+pela metade da ida e volta) e ressincroniza a cada CLOCK_SYNC_INTERVAL.
+"""
+import math
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+CLOSE_OFFSET = 1.5            # Segundos após o fechamento do candle
+EXIT_CHECK_INTERVAL = 10      # Segundos entre verificações só de saída (com posição aberta)
+CLOCK_SYNC_INTERVAL = 1800    # Ressincronização do relógio
+CLOCK_RETRY_INTERVAL = 60     # Nova tentativa após falha
+MAX_CLOCK_RTT = 2.0           # Amostra com ida e volta maior é descartada (imprecisa)
+
+
+class ExchangeClock:
+    """Horário do servidor da exchange estimado a partir do relógio local"""
+
+    def __init__(self, get_exchange, resync=CLOCK_SYNC_INTERVAL):
+        self.get_exchange = get_exchange
+        self.resync = resync
+        self.offset = 0.0        # Segundos: servidor - local
+        self.rtt = None
+        self.synced_at = None
+        self._next_sync = 0.0
+
+    def sync(self):
+        """Mede a diferença para o servidor. Retorna True se a amostra foi aceita"""
+        self._next_sync = time.time() + CLOCK_RETRY_INTERVAL
+        try:
+            exchange = self.get_exchange()
+            started = time.time()
+            server_ms = exchange.fetch_time()
+            finished = time.time()
+        except Exception as e:
+            log.warning(f"[RELÓGIO] Erro ao sincronizar com a exchange: {e}")
+            return False
+        rtt = finished - started
+        if not server_ms or rtt > MAX_CLOCK_RTT:
+            log.warning(f"[RELÓGIO] Amostra descartada (ida e volta {rtt * 1000:.0f}ms)")
+            return False
+
+        offset = server_ms / 1000 - (started + finished) / 2
+        if self.synced_at is None or abs(offset - self.offset) > 0.5:
+            log.info(f"[RELÓGIO] Diferença para a exchange: {offset * 1000:+.0f}ms (ida e volta {rtt * 1000:.0f}ms)")
+        self.offset = offset
+        self.rtt = rtt
+        self.synced_at = finished
+        self._next_sync = finished + self.resync
+        return True
+
+    def now(self):
+        """Horário do servidor (segundos, epoch)"""
+        if time.time() >= self._next_sync:
+            self.sync()
+        return time.time() + self.offset
+
+
+class TickScheduler:
+    """
+    Próximo tick devido: 'full' (grade do servidor) ou 'exit' (cadência rápida de saídas).
+    O primeiro tick é imediato; os seguintes seguem a grade (slots perdidos são pulados).
+    """
+
+    def __init__(self, clock, interval=60, exit_interval=EXIT_CHECK_INTERVAL, offset=CLOSE_OFFSET):
+        self.clock = clock
+        self.interval = interval
+        self.exit_interval = exit_interval
+        self.offset = offset
+        now = clock.now()
+        self.next_full = now
+        self.next_exit = now + exit_interval
+
+    def _next_slot(self, now):
+        return (math.floor((now - self.offset) / self.interval) + 1) * self.interval + self.offset
+
+    def poll(self):
+        """(tipo, atraso em segundos em relação ao horário agendado) ou (None, None)"""
+        now = self.clock.now()
+        if now >= self.next_full:
+            skew = now - self.next_full
+            self.next_full = self._next_slot(now)
+            self.next_exit = now + self.exit_interval
+            return 'full', skew
+        if now >= self.next_exit:
+            skew = now - self.next_exit
+            self.next_exit = now + self.exit_interval
+            return 'exit', skew
+        return None, None
+
+    def wait_time(self):
+        """Segundos até o próximo tick agendado"""
+        return max(0.0, min(self.next_full, self.next_exit) - self.clock.now())
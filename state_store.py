@@ -0,0 +1,174 @@
+"""
+state_store.py - Acesso ao operations.json compartilhado entre o bot e a interface web
+
+- Escrita atômica: grava num arquivo temporário e faz os.replace (nunca deixa o
+  arquivo pela metade, mesmo se o processo morrer no meio)
+- Lock de arquivo entre processos (operations.json.lock) para leitura-modificação-escrita
+- Cache em memória para leitores, validado pelo mtime/tamanho do arquivo
+"""
+import copy
+import json
+import os
+import sys
+import threading
+import logging
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+OPERATIONS_FILE = 'operations.json'
+LOCK_FILE = OPERATIONS_FILE + '.lock'
+
+_cache = {'key': None, 'data': None}
+_thread_lock = threading.RLock()
+_local = threading.local()
+
+
+def empty_state():
+    return {"open_operations": [], "closed_operations": []}
+
+
+if sys.platform == 'win32':
+    import msvcrt
+
+    def _lock_fd(fh):
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_fd(fh):
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_fd(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_fd(fh):
+        fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def file_lock():
+    """
+    Lock exclusivo entre processos (reentrante dentro da mesma thread).
+    Cada thread abre o seu descritor do arquivo de lock, então o próprio lock de arquivo
+    também exclui as threads deste processo; _thread_lock (cache dos leitores) não fica
+    preso enquanto se espera outro processo.
+    """
+    depth = getattr(_local, 'depth', 0)
+    if depth:
+        _local.depth = depth + 1
+        try:
+            yield
+        finally:
+            _local.depth -= 1
+        return
+
+    with open(LOCK_FILE, 'a+') as fh:
+        _lock_fd(fh)
+        _local.depth = 1
+        try:
+            yield
+        finally:
+            _local.depth = 0
+            _unlock_fd(fh)
+
+
+def _key(st):
+    # os.replace gera um novo inode a cada escrita: cache nunca fica obsoleto
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _stat_key():
+    try:
+        return _key(os.stat(OPERATIONS_FILE))
+    except FileNotFoundError:
+        return None
+
+
+def _parse(f):
+    """Conteúdo + chave do arquivo efetivamente lido (fstat do mesmo handle)"""
+    return json.load(f), _key(os.fstat(f.fileno()))
+
+
+def _read_file():
+    """
+    Lê o arquivo do disco; se estiver corrompido tenta restaurar o último backup.
+    Retorna (dados, chave do cache); chave None quando nada foi lido do arquivo.
+    """
+    try:
+        with open(OPERATIONS_FILE, 'r', encoding='utf-8') as f:
+            data, key = _parse(f)
+    except json.JSONDecodeError as e:
+        log.error(f"operations.json corrompido ({e}), tentando restaurar backup")
+        import operations_history
+        if not operations_history.restore_from_backup():
+            return empty_state(), None
+        with open(OPERATIONS_FILE, 'r', encoding='utf-8') as f:
+            data, key = _parse(f)
+
+    data.setdefault('open_operations', [])
+    data.setdefault('closed_operations', [])
+    return data, key
+
+
+def _load_cached():
+    """Retorna o objeto em cache (sem cópia) - relê o disco se o arquivo mudou"""
+    key = _stat_key()
+    if key is None:
+        return None
+    with _thread_lock:
+        if _cache['key'] != key:
+            try:
+                data, key = _read_file()
+            except FileNotFoundError:
+                return None
+            # Chave do handle lido, não um novo stat: se outro processo trocou o arquivo
+            # depois da leitura, a próxima chamada vê a diferença e relê
+            _cache['key'] = key
+            _cache['data'] = data
+        return _cache['data']
+
+
+def exists():
+    return os.path.exists(OPERATIONS_FILE)
+
+
+def load_operations():
+    """
+    Retorna uma cópia do estado atual (open_operations / closed_operations).
+    Só lê o disco quando o arquivo foi alterado desde a última leitura.
+    """
+    data = _load_cached()
+    return copy.deepcopy(data) if data is not None else empty_state()
+
+
+def save_operations(data):
+    """Grava o estado inteiro de forma atômica (temp + fsync + rename)"""
+    with file_lock():
+        tmp_file = f"{OPERATIONS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, OPERATIONS_FILE)
+        with _thread_lock:
+            _cache['key'] = _stat_key()
+            _cache['data'] = copy.deepcopy(data)
+
+
+@contextmanager
+def transaction():
+    """
+    Leitura-modificação-escrita protegida pelo lock entre processos:
+
+        with state_store.transaction() as data:
+            data['open_operations'].append(op)
+
+    O arquivo só é gravado se o bloco terminar sem exceção.
+    """
+    with file_lock():
+        data = load_operations()
+        yield data
+        save_operations(data)
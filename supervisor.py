@@ -0,0 +1,246 @@
+"""
+supervisor.py - PID, heartbeat e reinício do processo do bot
+
+Lado do bot:
+    register()            grava davinci_bot.pid (PID + início) e remove ao sair
+    heartbeat(latency)    grava bot_heartbeat.json a cada tick (latência do tick, contagem...)
+
+Lado da interface web (Supervisor):
+    status()   vivo/morto em O(1): lê o pidfile e verifica só aquele PID (sem varrer os
+               processos da máquina nem ler o log)
+    start()    inicia o bot (parando o anterior) e passa a vigiá-lo
+    stop()     para o bot pelo PID do pidfile
+    vigia      bot iniciado pela interface que morreu ou travou (heartbeat parado) é
+               reiniciado, no máximo MAX_RESTARTS vezes em RESTART_WINDOW segundos
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import subprocess
+
+PID_FILE = 'davinci_bot.pid'
+HEARTBEAT_FILE = 'bot_heartbeat.json'
+BOT_SCRIPT = 'davinci_bot.py'
+OUTPUT_LOG = 'bot_output.log'
+
+STALE_AFTER_TICKS = 3       # Heartbeat mais velho que 3 ticks = travado
+MIN_STALE_SECONDS = 180
+WATCH_INTERVAL = 10         # Verificação do vigia
+MAX_RESTARTS = 5
+RESTART_WINDOW = 600        # Segundos
+STOP_TIMEOUT = 5            # Espera pelo encerramento antes de matar
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# ===================== LADO DO BOT =====================
+_ticks = 0
+
+
+def register():
+    """Grava o pidfile do processo atual (chamado no início do bot)"""
+    _write_json(PID_FILE, {"pid": os.getpid(), "started": time.time()})
+    atexit.register(_unregister)
+
+
+def _unregister():
+    info = _read_json(PID_FILE)
+    if info and info.get('pid') == os.getpid():
+        _remove(PID_FILE)
+
+
+def heartbeat(tick_latency, interval, **fields):
+    """Grava o heartbeat após um tick completo (latência em segundos)"""
+    global _ticks
+    _ticks += 1
+    try:
+        _write_json(HEARTBEAT_FILE, dict(fields, pid=os.getpid(), time=time.time(), ticks=_ticks,
+                                         interval=interval, tick_latency_ms=round(tick_latency * 1000, 1)))
+    except OSError:
+        pass
+
+
+# ===================== LADO DA INTERFACE =====================
+class Supervisor:
+    def __init__(self, workdir=None):
+        self.workdir = workdir or os.getcwd()
+        self.process = None          # Popen do bot iniciado por esta interface
+        self.wanted = False          # Bot deve ficar rodando (iniciado pela interface)
+        self.restarts = []           # Horários dos reinícios automáticos
+        self._lock = threading.RLock()
+        self._watcher = None
+
+    def _path(self, name):
+        return os.path.join(self.workdir, name)
+
+    def pid(self):
+        """PID do bot em execução (validado) ou None"""
+        info = _read_json(self._path(PID_FILE))
+        if not info:
+            return None
+        try:
+            import psutil
+            process = psutil.Process(info['pid'])
+            # PID reaproveitado por outro processo: criado depois do pidfile
+            if process.create_time() > info.get('started', 0) + 1 or not process.is_running():
+                return None
+            if process.status() == psutil.STATUS_ZOMBIE:
+                return None
+            return info['pid']
+        except ImportError:
+            try:
+                os.kill(info['pid'], 0)
+                return info['pid']
+            except OSError:
+                return None
+        except Exception:
+            return None
+
+    def heartbeat(self):
+        return _read_json(self._path(HEARTBEAT_FILE))
+
+    def is_stale(self, beat):
+        """Bot vivo mas sem heartbeat recente (travado)"""
+        if not beat:
+            return False
+        limit = max(MIN_STALE_SECONDS, STALE_AFTER_TICKS * beat.get('interval', 60))
+        return time.time() - beat.get('time', 0) > limit
+
+    def status(self):
+        pid = self.pid()
+        status = {"running": pid is not None, "pid": pid, "restarts": len(self._recent_restarts())}
+        beat = self.heartbeat()
+        if pid is not None and beat and beat.get('pid') == pid:
+            status.update({
+                "heartbeat_age": round(time.time() - beat.get('time', 0), 1),
+                "tick_latency_ms": beat.get('tick_latency_ms'),
+                "ticks": beat.get('ticks'),
+                "stale": self.is_stale(beat),
+                "last_fetch_ok": beat.get('last_fetch_ok', True),
+                "last_error": beat.get('last_error'),
+            })
+        return status
+
+    def is_running(self):
+        return self.pid() is not None
+
+    def start(self):
+        """Inicia o bot (parando o anterior) e liga o vigia"""
+        with self._lock:
+            self.stop(keep_wanted=True)
+            self._spawn()
+            self.wanted = True
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(target=self._watch, name='bot-supervisor', daemon=True)
+                self._watcher.start()
+
+    def _spawn(self):
+        bot_path = self._path(BOT_SCRIPT)
+        if not os.path.exists(bot_path):
+            raise FileNotFoundError(f"Arquivo {BOT_SCRIPT} não encontrado em {self.workdir}")
+        print(f"Iniciando bot: {sys.executable} {bot_path}")
+        with open(self._path(OUTPUT_LOG), 'a') as log_file:
+            self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], cwd=self.workdir,
+                                            stdout=log_file, stderr=log_file, shell=False)
+
+    def stop(self, keep_wanted=False):
+        """Para o bot do pidfile (e o iniciado por esta interface). Retorna True se parou algum"""
+        import psutil
+        with self._lock:
+            if not keep_wanted:
+                self.wanted = False
+            targets = []
+            pid = self.pid()
+            if pid is not None:
+                targets.append(psutil.Process(pid))
+            elif self.process is None or self.process.poll() is not None:
+                targets.extend(self._legacy_processes())
+            if self.process is not None and self.process.poll() is None and self.process.pid != pid:
+                targets.append(psutil.Process(self.process.pid))
+
+            for process in targets:
+                try:
+                    process.terminate()
+                except psutil.NoSuchProcess:
+                    pass
+            gone, alive = psutil.wait_procs(targets, timeout=STOP_TIMEOUT)
+            for process in alive:
+                process.kill()
+            if self.process is not None:
+                try:
+                    self.process.wait(timeout=1)  # Evita processo zumbi
+                except subprocess.TimeoutExpired:
+                    pass
+                self.process = None
+            _remove(self._path(PID_FILE))
+            return bool(targets)
+
+    def _legacy_processes(self):
+        """Bot sem pidfile (iniciado antes do supervisor): busca pela linha de comando"""
+        import psutil
+        found = []
+        for proc in psutil.process_iter(['pid', 'cmdline']):
+            try:
+                cmdline = proc.info.get('cmdline') or []
+                # Interpretador python rodando o script (não qualquer linha que cite o nome)
+                if (cmdline and 'python' in os.path.basename(cmdline[0]).lower()
+                        and any(os.path.basename(arg) == BOT_SCRIPT for arg in cmdline[1:3])
+                        and proc.pid != os.getpid()):
+                    found.append(proc)
+            except Exception:
+                pass
+        return found
+
+    def _recent_restarts(self):
+        cutoff = time.time() - RESTART_WINDOW
+        self.restarts = [t for t in self.restarts if t > cutoff]
+        return self.restarts
+
+    def _watch(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            with self._lock:
+                if not self.wanted:
+                    return
+                starting = self.process is not None and self.process.poll() is None and self.pid() is None
+                if starting:
+                    continue  # Ainda importando/gravando o pidfile
+                beat = self.heartbeat()
+                dead = self.pid() is None
+                hung = not dead and beat and beat.get('pid') == self.pid() and self.is_stale(beat)
+                if not (dead or hung):
+                    continue
+                if len(self._recent_restarts()) >= MAX_RESTARTS:
+                    print(f"Bot caiu {MAX_RESTARTS}x em {RESTART_WINDOW}s, reinício automático desativado")
+                    self.wanted = False
+                    return
+                print(f"Bot {'travado (sem heartbeat)' if hung else 'parou'}, reiniciando...")
+                self.restarts.append(time.time())
+                try:
+                    self.stop(keep_wanted=True)
+                    self._spawn()
+                except Exception as e:
+                    print(f"Erro ao reiniciar bot: {e}")
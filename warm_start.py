@@ -0,0 +1,131 @@
+"""
+warm_start.py - Snapshot do estado do bot para reinício rápido (warm start)
+
+A cada tick completo o bot grava bot_snapshot.pkl (gravação atômica) com:
+  - as engines de indicadores (estado das médias + histórico) e o cache de candles
+  - por símbolo: posição (lado, entrada, picos do trailing), último candle visto e
+    cooldown de sinais, ligados ao ID da operação aberta
+
+Ao iniciar, restore() valida o snapshot (versão, modo DEMO/LIVE, idade) e semeia os
+caches: a primeira busca traz só os candles desde o snapshot e a engine continua de
+onde parou. Operações abertas cobertas pelo snapshot são retomadas com os picos do
+trailing em vez de fechadas pelo cleanup de reinício.
+
+O arquivo é local e gravado só pelo próprio bot (pickle).
+"""
+import os
+import time
+import pickle
+import logging
+
+import indicator_engine
+import ohlcv_cache
+import state_store
+import portfolio
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'bot_snapshot.pkl'
+VERSION = 1
+MAX_AGE = 900  # Segundos: snapshot mais velho = início a frio (posições fechadas pelo cleanup)
+
+
+def _open_operations():
+    return [op for op in state_store.load_operations().get('open_operations', [])
+            if op.get('status') == 'open']
+
+
+def save(bot, positions):
+    """
+    Grava o snapshot. `positions`: {símbolo: objeto com portfolio.POSITION_FIELDS}
+    (o módulo do bot no modo de um símbolo, Position no modo portfólio).
+    """
+    try:
+        operations = {op.get('symbol'): op for op in _open_operations()}
+        states = {}
+        for symbol, target in positions.items():
+            state = {name: getattr(target, name) for name in portfolio.POSITION_FIELDS}
+            operation = operations.get(symbol) if state['in_position'] else None
+            state['operation_id'] = operation.get('id') if operation else None
+            states[symbol] = state
+        snapshot = {
+            'version': VERSION,
+            'saved_at': time.time(),
+            'mode': 'DEMO' if bot.USE_DEMO else 'LIVE',
+            'positions': states,
+            'engines': indicator_engine.export_engines(),
+            'candles': ohlcv_cache.export_entries(),
+        }
+        tmp_path = f"{SNAPSHOT_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, SNAPSHOT_FILE)
+    except Exception as e:
+        log.warning(f"[WARM START] Erro ao gravar snapshot: {e}")
+
+
+def restore(mode):
+    """Carrega e valida o snapshot; se válido semeia engines e cache de candles e o retorna"""
+    try:
+        with open(SNAPSHOT_FILE, 'rb') as f:
+            snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning(f"[WARM START] Snapshot ilegível, iniciando a frio: {e}")
+        return None
+
+    age = time.time() - snapshot.get('saved_at', 0) if isinstance(snapshot, dict) else None
+    if age is None or snapshot.get('version') != VERSION:
+        reason = "versão diferente"
+    elif snapshot.get('mode') != mode:
+        reason = f"modo {snapshot.get('mode')} (atual: {mode})"
+    elif not 0 <= age <= MAX_AGE:
+        reason = f"snapshot de {age:.0f}s atrás"
+    else:
+        reason = None
+    if reason:
+        log.info(f"[WARM START] Iniciando a frio: {reason}")
+        return None
+
+    # Engines e candles se validam sozinhos: sem continuidade com os candles novos,
+    # a busca completa / o recálculo acontecem como num início a frio
+    indicator_engine.seed_engines(snapshot.get('engines', {}))
+    ohlcv_cache.seed(snapshot.get('candles', {}))
+    log.info(f"[WARM START] Snapshot de {age:.0f}s atrás: {len(snapshot.get('engines', {}))} engines, "
+             f"{len(snapshot.get('positions', {}))} símbolos")
+    return snapshot
+
+
+def _matches(state, operation):
+    return (state is not None and state.get('in_position') and state.get('operation_id') == operation.get('id')
+            and (state.get('position_side') or '').upper() == operation.get('side'))
+
+
+def covers(snapshot, symbols):
+    """True se toda operação aberta no arquivo é retomável pelo snapshot (dispensa o cleanup)"""
+    if not snapshot:
+        return False
+    states = snapshot.get('positions', {})
+    return all(op.get('symbol') in symbols and _matches(states.get(op.get('symbol')), op)
+               for op in _open_operations())
+
+
+def restore_position(snapshot, symbol, target):
+    """
+    Aplica o estado do símbolo em `target` (após sync_position_from_file): cooldown e último
+    candle sempre; posição e picos do trailing só se a operação aberta é a mesma do snapshot.
+    """
+    state = (snapshot or {}).get('positions', {}).get(symbol)
+    if not state:
+        return False
+    target.last_candle_time = state.get('last_candle_time')
+    target.last_signal_time = state.get('last_signal_time')
+    operation = next((op for op in _open_operations() if op.get('symbol') == symbol), None)
+    if operation is None or not _matches(state, operation):
+        return False
+    for name in portfolio.POSITION_FIELDS:
+        setattr(target, name, state[name])
+    log.info(f"[WARM START] {symbol} {state['position_side'].upper()} retomado | Entry: ${state['entry_price']:.2f} | "
+             f"Máx: ${state['highest_price']:.2f} | Mín: ${state['lowest_price']:.2f}")
+    return True
@@ -1,14 +1,34 @@
 import os
 import json
 import threading
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_cors import CORS
+import exchange_session
+import ohlcv_cache
+import candle_archive
+import state_store
+import operation_closer
+import log_tail
+import event_log
+import dashboard_stream
+import bot_control
+import supervisor
 from analyzer import analyze_all_symbols
 
 app = Flask(__name__, static_folder='templates/static')
 CORS(app)
 
 CONFIG_FILE = 'bot_config.json'
+LOG_SOURCES = ['davinci_bot.log', 'bot_output.log']  # Texto (bots antigos sem bot_events.jsonl)
+EVENTS_FILE = event_log.EVENTS_FILE
+DEMO_BALANCE_FILE = operation_closer.DEMO_BALANCE_FILE
+STATUS_INTERVAL = 5  # Segundos entre verificações do processo do bot no stream
+STREAM_HISTORY_LIMIT = 50  # Operações fechadas por página no stream (o resto via /api/operations)
+CHART_CANDLES = 300  # Candles do gráfico: os 50 recentes da exchange + anteriores do arquivo local
+MAX_CHART_CANDLES = 5000
+PNL_DAYS = 30  # Dias no rollup diário de /api/pnl sem ?since=
+
+bot_supervisor = supervisor.Supervisor()
 
 def load_config():
     """Carrega configuração do arquivo JSON ou usa padrão se não existir"""
@@ -41,31 +61,14 @@ def load_config():
         "EXIT_AFTER_MINUTES": 60,
         "USE_TIME_EXIT": False,
         "EXIT_ON_VOLUME_SPIKE": True,
-        "EXIT_VOLUME_MULTIPLIER": 2.0
+        "EXIT_VOLUME_MULTIPLIER": 2.0,
+        "USE_STREAM": False,
+        "STREAM_URL": "wss://fstream.binance.com",
+        "EXCHANGE_URL": "",
+        "SYMBOLS": [],
+        "SYMBOL_OVERRIDES": {}
     }
 
-def load_demo_balance():
-    """Carrega saldo demo do arquivo JSON"""
-    demo_file = 'demo_balance.json'
-    if os.path.exists(demo_file):
-        try:
-            with open(demo_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('balance', 1000.0)
-        except:
-            pass
-    return 1000.0  # Saldo inicial padrão
-
-def save_demo_balance(balance):
-    """Salva saldo demo no arquivo JSON"""
-    demo_file = 'demo_balance.json'
-    try:
-        with open(demo_file, 'w', encoding='utf-8') as f:
-            json.dump({'balance': balance}, f, indent=4)
-        return True
-    except:
-        return False
-
 def save_config(config):
     """Salva configuração no arquivo JSON"""
     with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -92,7 +95,8 @@ def update_config():
         allowed_keys = ['SYMBOL', 'TIMEFRAME', 'POSITION_SIZE_USD', 'LEVERAGE', 'USE_DEMO', 'DEMO_BALANCE', 'RSI_LONG', 'RSI_SHORT', 'USE_VOL', 'USE_ADX', 'ADX_THRESH', 'SIGNAL_COOLDOWN', 'LOG_LEVEL',
                    'STOP_LOSS', 'TAKE_PROFIT', 'TRAILING_STOP', 'USE_FIXED_EXIT', 'USE_TRAILING',
                    'EXIT_RSI_LONG', 'EXIT_RSI_SHORT', 'USE_EXIT_RSI', 'EXIT_ADX_THRESHOLD', 'USE_EXIT_ADX',
-                   'EXIT_AFTER_MINUTES', 'USE_TIME_EXIT', 'EXIT_ON_VOLUME_SPIKE', 'EXIT_VOLUME_MULTIPLIER']
+                   'EXIT_AFTER_MINUTES', 'USE_TIME_EXIT', 'EXIT_ON_VOLUME_SPIKE', 'EXIT_VOLUME_MULTIPLIER',
+                   'USE_STREAM', 'STREAM_URL', 'SYMBOLS', 'SYMBOL_OVERRIDES']
         for key in allowed_keys:
             if key in data:
                 current_config[key] = data[key]
@@ -102,269 +106,197 @@ def update_config():
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 400
 
+def is_bot_running():
+    """Verifica se o processo do bot está em execução (pidfile, sem varrer processos)"""
+    try:
+        return bot_supervisor.is_running()
+    except Exception as e:
+        return False
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
-    """Retorna status do bot (se está em execução)"""
+    """Retorna status do bot (em execução, PID, idade do heartbeat e latência do último tick)"""
     try:
-        import psutil
-        bot_running = False
-        
-        # Verifica processos rodando
-        for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-            try:
-                cmdline = ' '.join(proc.info.get('cmdline', []))
-                if 'davinci_bot.py' in cmdline and 'python' in cmdline.lower():
-                    bot_running = True
-                    break
-            except:
-                pass
-        
-        # Fallback: verifica log se processo não encontrado
-        if not bot_running and os.path.exists('davinci_bot.log'):
-            try:
-                with open('davinci_bot.log', 'r', encoding='utf-8') as f:
-                    logs = f.readlines()
-                    if logs and any('DA VINCI SNIPER BOT INICIADO' in line for line in logs[-5:]):
-                        # Verifica se é recente (últimas 2 horas)
-                        from datetime import datetime, timedelta
-                        cutoff = datetime.now() - timedelta(hours=2)
-                        
-                        for line in logs[-10:]:
-                            try:
-                                date_str = line.split(' | ')[0]
-                                log_time = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S,%f')
-                                if log_time > cutoff and 'INICIADO' in line:
-                                    bot_running = True
-                                    break
-                            except:
-                                pass
-            except:
-                pass
-        
-        return jsonify({"running": bot_running})
+        return jsonify(bot_supervisor.status())
     except Exception as e:
         return jsonify({"running": False})
 
+def read_dashboard_logs(after=None):
+    """Logs do dashboard depois do cursor: (logs, cursor, reset)"""
+    source = 'events' if os.path.exists(EVENTS_FILE) else 'text'
+    prefix, _, after = (after or '').partition('/')
+    after = after if prefix == source else None
+    if source == 'events':
+        logs, cursor, reset = log_tail.read_logs([EVENTS_FILE], after=after, limit=150,
+                                                 parser=event_log.parse_event)
+        logs = [{k: v for k, v in entry.items() if k != 'event'} for entry in logs]
+    else:
+        logs, cursor, reset = log_tail.read_logs(LOG_SOURCES, after=after, limit=150)
+    return logs, f"{source}/{cursor}", reset
+
+def read_events(after=None, limit=log_tail.CAPACITY):
+    """Eventos tipados depois do cursor: (eventos, cursor, reset)"""
+    entries, cursor, reset = log_tail.read_logs([EVENTS_FILE], after=after, limit=limit,
+                                                parser=event_log.parse_event)
+    return [entry['event'] for entry in entries], cursor, reset
+
 @app.route('/api/logs', methods=['GET'])
 def get_logs():
-    """Retorna últimos logs do bot"""
-    logs = []
-    log_sources = ['davinci_bot.log', 'bot_output.log']
-    seen_messages = set()  # Evita duplicatas
+    """
+    Retorna últimos logs do bot (mais recentes primeiro).
+    ?after=<cursor> devolve só as linhas novas desde a chamada anterior; a resposta traz
+    o próximo cursor e reset=True quando o cliente deve substituir a lista inteira.
+    Lê o log estruturado (bot_events.jsonl) quando existe; senão interpreta o texto.
+    """
+    try:
+        logs, cursor, reset = read_dashboard_logs(request.args.get('after'))
+        return jsonify({"logs": logs, "cursor": cursor, "reset": reset})
+    except Exception as e:
+        print(f"Erro ao ler logs: {e}")
+        return jsonify({"logs": [], "cursor": None, "reset": True})
+
+@app.route('/api/events', methods=['GET'])
+def get_events():
+    """
+    Eventos tipados do bot (mais recentes primeiro).
+    ?after=<cursor> como em /api/logs, ?type=entry,exit filtra por tipo, ?limit= (máx. 1000).
+    """
+    try:
+        types = set(filter(None, request.args.get('type', '').split(',')))
+        limit = min(int(request.args.get('limit', 200)), 1000)
+        events, cursor, reset = read_events(request.args.get('after'))
+        events = [event for event in events if not types or event.get('event') in types]
+        return jsonify({"events": events[:limit], "cursor": cursor, "reset": reset})
+    except Exception as e:
+        print(f"Erro ao ler eventos: {e}")
+        return jsonify({"events": [], "cursor": None, "reset": True})
+
+def operations_payload(history_limit=None, history_offset=0):
+    """
+    Operações abertas e fechadas (incluindo histórico permanente). Com history_limit, as
+    fechadas vêm paginadas (mais recentes primeiro) e has_more diz se há outra página.
+    """
+    open_ops = []
+    closed_ops = []
     
-    for log_file in log_sources:
-        if os.path.exists(log_file):
-            try:
-                # Lê arquivo de forma mais eficiente (do final para o início)
-                with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    # Lê todas as linhas (mais eficiente para arquivos menores)
-                    lines = f.readlines()
-                    
-                    # Filtra apenas logs das últimas 24 horas
-                    from datetime import datetime, timedelta
-                    cutoff_time = datetime.now() - timedelta(hours=24)
+    # Carrega configuração para calcular trailing stop
+    config = load_config()
+    trailing_stop_pct = config.get('TRAILING_STOP', 0.007)
+    use_trailing = config.get('USE_TRAILING', True)
+    
+    # Carrega operações do arquivo principal
+    if state_store.exists():
+        try:
+            data = state_store.load_operations()
+            open_ops = data.get('open_operations', [])
+            closed_ops = data.get('closed_operations', [])
+            
+            # Calcula trailing stop para cada operação aberta
+            for op in open_ops:
+                if op.get('status') == 'open':
+                    entry_price = op.get('entry_price', 0)
+                    current_price = op.get('current_price', entry_price)
+                    side = op.get('side', '').upper()
                     
-                    # Processa últimas linhas primeiro (mais recentes)
-                    # Aumenta para 500 linhas para garantir que pegamos todos os logs recentes
-                    for line in lines[-500:]:  # Últimas 500 linhas para ter mais contexto
-                        line = line.strip()
-                        if not line or line.startswith('fatal:'):
-                            continue
-                        
-                        # Ignora linhas que não são logs válidos
-                        if ' | ' not in line and not line.startswith('2025-'):
-                            continue
-                        
-                        # Tenta parsear a data (apenas para extração, não filtra)
-                        log_time = None
-                        try:
-                            # Formato: 2025-11-02 21:30:13,955
-                            if line.startswith('2025-'):
-                                date_str = line.split(' | ')[0]
-                                log_time = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S,%f')
-                                # Não filtra por data - sempre inclui logs das últimas 500 linhas
-                                # Isso garante que não perdemos logs recentes mesmo se o timestamp estiver errado
-                        except:
-                            pass  # Se não conseguir parsear, inclui mesmo assim (logs recentes)
-                        
-                        # Remove timestamp e nível de log, mantém apenas a mensagem
-                        clean_line = line
-                        timestamp_str = ""
-                        
-                        if ' | INFO | ' in line:
-                            parts = line.split(' | ', 2)
-                            if len(parts) >= 3:
-                                timestamp_str = parts[0] if len(parts[0]) < 25 else ""
-                                clean_line = parts[2]
-                        elif ' | WARNING | ' in line:
-                            parts = line.split(' | ', 2)
-                            if len(parts) >= 3:
-                                timestamp_str = parts[0] if len(parts[0]) < 25 else ""
-                                clean_line = parts[2]
-                        elif ' | ERROR | ' in line:
-                            parts = line.split(' | ', 2)
-                            if len(parts) >= 3:
-                                timestamp_str = parts[0] if len(parts[0]) < 25 else ""
-                                clean_line = parts[2]
-                        elif line.startswith('2025-') and ' | ' in line:
-                            # Formato alternativo
-                            parts = line.split(' | ', 1)
-                            if len(parts) >= 2:
-                                timestamp_str = parts[0]
-                                clean_line = parts[1]
-                        
-                        # Remove timestamp do início se ainda estiver presente
-                        if clean_line.startswith('2025-'):
-                            parts = clean_line.split(' | ', 2)
-                            if len(parts) >= 3:
-                                clean_line = ' | '.join(parts[2:])
+                    # Calcula trailing stop
+                    if 'highest_price' in op and 'trailing_stop' in op:
+                        pass  # Nível real: picos mantidos pelo bot no registro da operação
+                    elif use_trailing and entry_price > 0:
+                        if side == 'LONG':
+                            # Para LONG: trailing stop abaixo do pico (maior preço desde entrada)
+                            # Usa current_price como aproximação do pico (melhor que temos)
+                            peak_price = max(current_price, entry_price)  # Pelo menos entry_price
+                            trailing_stop_price = peak_price * (1 - trailing_stop_pct)
+                        else:  # SHORT
+                            # Para SHORT: trailing stop acima do mínimo (menor preço desde entrada)
+                            # Usa current_price como aproximação do mínimo
+                            low_price = min(current_price, entry_price)  # Pelo menos entry_price
+                            trailing_stop_price = low_price * (1 + trailing_stop_pct)
                         
-                        # Ignora logs do Flask
-                        if any(ignored in clean_line for ignored in ['Started HTTP', 'Debug mode', 'Running on']):
-                            continue
-                        
-                        # Evita duplicatas
-                        message_hash = clean_line[:100]  # Primeiros 100 chars para identificar duplicatas
-                        if message_hash in seen_messages:
-                            continue
-                        seen_messages.add(message_hash)
-                        
-                        # Determina tipo do log
-                        log_type = "info"
-                        if '>>> ENTRADA LONG <<<' in clean_line or 'ENTRADA LONG' in clean_line:
-                            log_type = "entry-long"
-                        elif '>>> ENTRADA SHORT <<<' in clean_line or 'ENTRADA SHORT' in clean_line:
-                            log_type = "entry-short"
-                        elif '[SAÍDA LONG]' in clean_line or 'SAÍDA LONG' in clean_line:
-                            log_type = "exit-long"
-                        elif '[SAÍDA SHORT]' in clean_line or 'SAÍDA SHORT' in clean_line:
-                            log_type = "exit-short"
-                        elif '*** CROSSOVER' in clean_line:
-                            log_type = "signal-long"
-                        elif '*** CROSSUNDER' in clean_line:
-                            log_type = "signal-short"
-                        elif '[BLOQUEADO]' in clean_line or 'filtrado' in clean_line.lower():
-                            log_type = "warning"
-                        elif 'ERROR' in line or 'Erro' in clean_line or 'Traceback' in clean_line:
-                            log_type = "error"
-                        elif 'WARNING' in line:
-                            log_type = "warning"
-                        elif 'DA VINCI SNIPER BOT INICIADO' in clean_line:
-                            log_type = "success"
-                        elif '[CHECK]' in clean_line:
-                            log_type = "info"
-                        
-                        # Extrai timestamp simplificado (HH:MM:SS)
-                        display_time = ""
-                        if timestamp_str:
-                            try:
-                                dt = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S,%f')
-                                display_time = dt.strftime('%H:%M:%S')
-                            except:
-                                pass
-                        
-                        logs.append({
-                            "message": clean_line,
-                            "type": log_type,
-                            "time": display_time,
-                            "full_time": timestamp_str
-                        })
-            except Exception as e:
-                print(f"Erro ao ler logs de {log_file}: {e}")
-    
-    # Remove duplicatas finais e ordena por timestamp
-    unique_logs = []
-    seen = set()
-    for log in logs:
-        # Usa timestamp + mensagem para evitar duplicatas mais eficientemente
-        msg_key = f"{log.get('full_time', '')}:{log['message'][:80]}"
-        if msg_key not in seen:
-            seen.add(msg_key)
-            unique_logs.append(log)
+                        op['trailing_stop'] = round(trailing_stop_price, 4)
+                    else:
+                        op['trailing_stop'] = None
+        except Exception as e:
+            print(f"Erro ao ler operations.json: {e}")
     
-    # Ordena por timestamp completo (mais recente primeiro - mais recentes no topo)
+    # Carrega histórico permanente (arquivo separado)
     try:
-        unique_logs.sort(key=lambda x: x.get('full_time', ''), reverse=True)
-    except:
-        # Se não conseguiu ordenar por timestamp, mantém ordem original
-        pass
+        import operations_history
+        # Paginação opcional do histórico: ?history_limit=&history_offset=
+        # Com página, lê do histórico só até o fim dela (+1 para saber se há mais); o recorte
+        # é feito depois de juntar com as fechadas de operations.json
+        history = operations_history.load_history(
+            history_offset + history_limit + 1 if history_limit else None
+        )
+        
+        # Combina histórico com operações fechadas (evita duplicatas)
+        history_ids = {op.get('id') for op in history if op.get('id')}
+        closed_ids = {op.get('id') for op in closed_ops if op.get('id')}
+        
+        # Adiciona operações do histórico que não estão em closed_ops
+        for hist_op in history:
+            hist_id = hist_op.get('id')
+            if hist_id and hist_id not in closed_ids:
+                closed_ops.append(hist_op)
+    except Exception as e:
+        print(f"Erro ao carregar histórico (não crítico): {e}")
     
-    # Retorna últimos 150 logs únicos (os mais recentes ficam no início da lista)
-    return jsonify({"logs": unique_logs[:150]})
+    # Ordena operações fechadas por data (mais recentes primeiro)
+    closed_ops.sort(key=lambda x: (
+        x.get('entry_date', ''),
+        x.get('entry_time', '')
+    ), reverse=True)
+    
+    payload = {
+        "open_operations": open_ops,
+        "closed_operations": closed_ops
+    }
+    if history_limit:
+        payload["closed_operations"] = closed_ops[history_offset:history_offset + history_limit]
+        payload["has_more"] = len(closed_ops) > history_offset + history_limit
+    return payload
+
+def stream_operations_payload():
+    """Operações enviadas pelo /api/stream: abertas + primeira página do histórico"""
+    return operations_payload(STREAM_HISTORY_LIMIT)
+
+def stream_snapshot():
+    """Estado completo enviado a cada nova conexão de /api/stream"""
+    logs, cursor, _ = read_dashboard_logs()
+    return [
+        ('status', {"running": is_bot_running()}),
+        ('operations', stream_operations_payload()),
+        ('pnl', pnl_payload(refresh=False)),
+        ('balance', {"balance": operation_closer.load_demo_balance()}),
+        ('logs', {"logs": logs, "cursor": cursor, "reset": True}),
+    ]
+
+broadcaster = dashboard_stream.Broadcaster([
+    dashboard_stream.LogWatch(read_dashboard_logs, read_events),
+    dashboard_stream.FileWatch(state_store.OPERATIONS_FILE, 'operations', stream_operations_payload),
+    dashboard_stream.FileWatch(state_store.OPERATIONS_FILE, 'pnl', lambda: pnl_payload(refresh=False)),
+    dashboard_stream.FileWatch(DEMO_BALANCE_FILE, 'balance', lambda: {"balance": operation_closer.load_demo_balance()}),
+    dashboard_stream.PeriodicWatch('status', lambda: {"running": is_bot_running()}, STATUS_INTERVAL),
+], snapshot=stream_snapshot)
+
+@app.route('/api/stream', methods=['GET'])
+def stream():
+    """
+    Server-Sent Events com o estado do dashboard (logs, operações, PnL, status, saldo,
+    entradas/saídas, ticks e novos candles). Substitui o polling de cada aba.
+    """
+    return Response(broadcaster.stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/operations', methods=['GET'])
 def get_operations():
     """Retorna operações abertas e fechadas (incluindo histórico permanente)"""
     try:
-        open_ops = []
-        closed_ops = []
-        
-        # Carrega configuração para calcular trailing stop
-        config = load_config()
-        trailing_stop_pct = config.get('TRAILING_STOP', 0.007)
-        use_trailing = config.get('USE_TRAILING', True)
-        
-        # Carrega operações do arquivo principal
-        if os.path.exists('operations.json'):
-            try:
-                with open('operations.json', 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                open_ops = data.get('open_operations', [])
-                closed_ops = data.get('closed_operations', [])
-                
-                # Calcula trailing stop para cada operação aberta
-                for op in open_ops:
-                    if op.get('status') == 'open':
-                        entry_price = op.get('entry_price', 0)
-                        current_price = op.get('current_price', entry_price)
-                        side = op.get('side', '').upper()
-                        
-                        # Calcula trailing stop
-                        if use_trailing and entry_price > 0:
-                            if side == 'LONG':
-                                # Para LONG: trailing stop abaixo do pico (maior preço desde entrada)
-                                # Usa current_price como aproximação do pico (melhor que temos)
-                                peak_price = max(current_price, entry_price)  # Pelo menos entry_price
-                                trailing_stop_price = peak_price * (1 - trailing_stop_pct)
-                            else:  # SHORT
-                                # Para SHORT: trailing stop acima do mínimo (menor preço desde entrada)
-                                # Usa current_price como aproximação do mínimo
-                                low_price = min(current_price, entry_price)  # Pelo menos entry_price
-                                trailing_stop_price = low_price * (1 + trailing_stop_pct)
-                            
-                            op['trailing_stop'] = round(trailing_stop_price, 4)
-                        else:
-                            op['trailing_stop'] = None
-            except Exception as e:
-                print(f"Erro ao ler operations.json: {e}")
-        
-        # Carrega histórico permanente (arquivo separado)
-        try:
-            import operations_history
-            history = operations_history.load_history()
-            
-            # Combina histórico com operações fechadas (evita duplicatas)
-            history_ids = {op.get('id') for op in history if op.get('id')}
-            closed_ids = {op.get('id') for op in closed_ops if op.get('id')}
-            
-            # Adiciona operações do histórico que não estão em closed_ops
-            for hist_op in history:
-                hist_id = hist_op.get('id')
-                if hist_id and hist_id not in closed_ids:
-                    closed_ops.append(hist_op)
-        except Exception as e:
-            print(f"Erro ao carregar histórico (não crítico): {e}")
-        
-        # Ordena operações fechadas por data (mais recentes primeiro)
-        closed_ops.sort(key=lambda x: (
-            x.get('entry_date', ''),
-            x.get('entry_time', '')
-        ), reverse=True)
-        
-        return jsonify({
-            "open_operations": open_ops,
-            "closed_operations": closed_ops
-        })
+        # Paginação opcional do histórico: ?history_limit=&history_offset=
+        return jsonify(operations_payload(
+            request.args.get('history_limit', type=int),
+            request.args.get('history_offset', 0, type=int)
+        ))
     except Exception as e:
         return jsonify({
             "open_operations": [],
@@ -376,12 +308,7 @@ def get_operations():
 def get_price(symbol):
     """Retorna preço atual do símbolo"""
     try:
-        import ccxt
-        exchange = ccxt.binance({
-            'enableRateLimit': True,
-            'options': {'defaultType': 'future'},
-            'timeout': 10000
-        })
+        exchange = exchange_session.get_exchange()
         
         ticker = exchange.fetch_ticker(symbol)
         price = ticker['last']
@@ -397,48 +324,13 @@ def get_price(symbol):
 
 @app.route('/api/start-bot', methods=['POST'])
 def start_bot():
-    """Inicia o bot em background"""
-    import subprocess
-    import sys
-    import time
-    
+    """Inicia o bot em background (parando o anterior); o supervisor reinicia se cair"""
     try:
-        # Verifica se o bot já está rodando e PARAR versões antigas
-        try:
-            import psutil
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    cmdline = ' '.join(proc.info.get('cmdline', []))
-                    if 'davinci_bot.py' in cmdline:
-                        print(f"Encontrado bot rodando, parando PID: {proc.info['pid']}")
-                        proc.terminate()
-                        time.sleep(1)
-                except:
-                    pass
-        except ImportError:
-            print("psutil não disponível, pulando verificação de processo")
-        
-        # Verifica se o arquivo existe
-        bot_path = os.path.join(os.getcwd(), 'davinci_bot.py')
-        if not os.path.exists(bot_path):
-            return jsonify({"success": False, "message": f"Arquivo davinci_bot.py não encontrado em {os.getcwd()}"}), 500
-        
-        # Inicia o bot em background (sem criar nova janela)
-        print(f"Iniciando bot: {sys.executable} {bot_path}")
-        
-        # Cria arquivo de log para o bot
-        log_file = open('bot_output.log', 'a')
-        
-        subprocess.Popen(
-            [sys.executable, 'davinci_bot.py'],
-            cwd=os.getcwd(),
-            stdout=log_file,
-            stderr=log_file,
-            shell=False
-        )
-        
+        bot_supervisor.start()
         print("Bot iniciado com sucesso")
         return jsonify({"success": True, "message": "Bot iniciado com sucesso!"})
+    except FileNotFoundError as e:
+        return jsonify({"success": False, "message": str(e)}), 500
     except Exception as e:
         import traceback
         error_msg = traceback.format_exc()
@@ -447,14 +339,9 @@ def start_bot():
 
 @app.route('/api/chart/<path:symbol>', methods=['GET'])
 def get_chart_data(symbol):
-    """Retorna dados OHLCV para o gráfico"""
+    """Retorna dados OHLCV para o gráfico (?limit= candles; além dos 50 recentes vêm do arquivo local)"""
     try:
-        import ccxt
-        exchange = ccxt.binance({
-            'enableRateLimit': True,
-            'options': {'defaultType': 'future'},
-            'timeout': 10000
-        })
+        exchange = exchange_session.get_exchange()
         
         # Lê timeframe do query parameter (dinâmico) ou do config (fallback)
         timeframe = request.args.get('timeframe')
@@ -468,7 +355,13 @@ def get_chart_data(symbol):
                 timeframe = '5m'
         
         # Busca candles
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=50)
+        ohlcv = ohlcv_cache.fetch_ohlcv(exchange, symbol, timeframe, limit=50)
+
+        # Histórico anterior do arquivo local (sem chamadas extras à exchange)
+        limit = min(request.args.get('limit', CHART_CANDLES, type=int), MAX_CHART_CANDLES)
+        if ohlcv and limit > len(ohlcv):
+            older = candle_archive.load(symbol, timeframe, end=ohlcv[0][0] - 1, limit=limit - len(ohlcv))
+            ohlcv = older.tolist() + ohlcv
         
         candles = []
         for candle in ohlcv:
@@ -504,29 +397,21 @@ def get_chart_data(symbol):
         print(f"Erro ao buscar dados do gráfico: {e}")
         return jsonify({"error": str(e)}), 400
 
+@app.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Retorna contadores do cache de candles (hits/misses)"""
+    return jsonify(ohlcv_cache.stats())
+
 @app.route('/api/stop-bot', methods=['POST'])
 def stop_bot():
     """Para o bot"""
     try:
-        import psutil
-        
-        stopped = False
-        try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    cmdline = ' '.join(proc.info.get('cmdline', []))
-                    if 'davinci_bot.py' in cmdline:
-                        proc.terminate()
-                        stopped = True
-                except:
-                    pass
-        except ImportError:
-            return jsonify({"success": False, "message": "psutil não disponível"}), 500
-        
-        if stopped:
+        if bot_supervisor.stop():
             return jsonify({"success": True, "message": "Bot parado com sucesso!"})
         else:
             return jsonify({"success": False, "message": "Nenhum bot em execução encontrado!"})
+    except ImportError:
+        return jsonify({"success": False, "message": "psutil não disponível"}), 500
     except Exception as e:
         import traceback
         print(f"Erro ao parar bot: {traceback.format_exc()}")
@@ -536,14 +421,14 @@ def stop_bot():
 def clear_logs():
     """Limpa os arquivos de log"""
     try:
-        log_files = ['davinci_bot.log', 'bot_output.log']
         cleared_files = []
         
-        for log_file in log_files:
+        for log_file in LOG_SOURCES + [EVENTS_FILE]:
             if os.path.exists(log_file):
                 try:
                     with open(log_file, 'w') as f:
                         f.write('')  # Limpa o arquivo
+                    log_tail.get_tail(log_file).reset()
                     cleared_files.append(log_file)
                 except Exception as e:
                     print(f"Erro ao limpar {log_file}: {e}")
@@ -562,7 +447,7 @@ def clear_logs():
 def get_demo_balance():
     """Retorna saldo demo atual"""
     try:
-        balance = load_demo_balance()
+        balance = operation_closer.load_demo_balance()
         return jsonify({"balance": balance})
     except Exception as e:
         return jsonify({"balance": 1000.0})
@@ -573,88 +458,80 @@ def reset_demo():
     try:
         config = load_config()
         initial_balance = config.get('DEMO_BALANCE', 1000.0)
-        save_demo_balance(initial_balance)
+        operation_closer.save_demo_balance(initial_balance)
 
         # Limpa operações demo
-        if os.path.exists('operations.json'):
-            with open('operations.json', 'w', encoding='utf-8') as f:
-                json.dump({"open_operations": [], "closed_operations": []}, f, indent=4, ensure_ascii=False)
+        if state_store.exists():
+            state_store.save_operations(state_store.empty_state())
+
+        # PnL realizado recomeça do zero (o histórico de operações é mantido)
+        import operations_history
+        operations_history.reset_ledger()
 
         return jsonify({"success": True, "message": f"Saldo demo resetado para ${initial_balance:.2f}"})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
-@app.route('/api/pnl', methods=['GET'])
-def get_pnl():
-    """Retorna PnL total do dia"""
+def parse_since(value):
+    """?since= de /api/pnl: 'YYYY-MM-DD', 'today' ou 'Nd' (últimos N dias) -> 'YYYY-MM-DD'"""
+    from datetime import datetime, timedelta
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value == 'today':
+        return datetime.now().strftime('%Y-%m-%d')
+    if value.endswith('d') and value[:-1].isdigit():
+        return (datetime.now() - timedelta(days=int(value[:-1]) - 1)).strftime('%Y-%m-%d')
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+def pnl_payload(refresh=True, since=None):
+    """
+    PnL realizado (ledger do histórico permanente, sem percorrer as operações) + PnL aberto.
+    refresh=True pede ao bot em execução o PnL das operações abertas com os últimos preços
+    dele (canal de controle, sem chamadas à exchange); o stream usa refresh=False e fica com
+    o que o bot gravou no último tick. since: 'YYYY-MM-DD' (janela pelos baldes diários).
+    """
     try:
-        # Atualiza P&L das operações abertas antes de calcular (garante preços atualizados)
-        try:
-            import davinci_bot
-            if hasattr(davinci_bot, 'update_open_operations_pnl'):
-                davinci_bot.update_open_operations_pnl()
-        except Exception as e:
-            # Se não conseguir atualizar, continua mesmo assim (não é crítico)
-            pass
-        
-        if os.path.exists('operations.json'):
-            with open('operations.json', 'r', encoding='utf-8') as f:
-                data = json.load(f)
-
-            total_pnl = 0.0
-            total_operations = 0
-            winning_ops = 0
-            losing_ops = 0
-
-            # Soma operações fechadas
-            for op in data.get('closed_operations', []):
-                if op.get('pnl'):
-                    total_pnl += float(op['pnl'])
-                    total_operations += 1
-                    if float(op['pnl']) > 0:
-                        winning_ops += 1
-                    elif float(op['pnl']) < 0:
-                        losing_ops += 1
-
-            # Soma operações abertas
-            open_pnl = 0.0
-            for op in data.get('open_operations', []):
-                if op.get('pnl'):
-                    open_pnl += float(op['pnl'])
-
-            # Saldo demo se disponível
-            demo_balance = None
-            if os.path.exists('demo_balance.json'):
-                with open('demo_balance.json', 'r', encoding='utf-8') as f:
-                    demo_data = json.load(f)
-                    demo_balance = demo_data.get('balance')
-
-            # Win rate
-            win_rate = (winning_ops / total_operations * 100) if total_operations > 0 else 0
+        import operations_history
+        open_ops = []
+        if state_store.exists():
+            open_ops = state_store.load_operations().get('open_operations', [])
 
-            return jsonify({
-                "total_pnl": total_pnl,
-                "open_pnl": open_pnl,
-                "all_pnl": total_pnl + open_pnl,
-                "total_operations": total_operations,
-                "winning_ops": winning_ops,
-                "losing_ops": losing_ops,
-                "win_rate": round(win_rate, 1),
-                "demo_balance": demo_balance
-            })
-        else:
-            return jsonify({
-                "total_pnl": 0.0,
-                "open_pnl": 0.0,
-                "all_pnl": 0.0,
-                "total_operations": 0,
-                "winning_ops": 0,
-                "losing_ops": 0,
-                "win_rate": 0.0,
-                "demo_balance": None
-            })
+            # PnL ao vivo do bot (se estiver rodando); senão os valores gravados no arquivo
+            if refresh:
+                try:
+                    live = bot_control.request('GET', '/pnl', timeout=2)
+                except bot_control.NoResponse:
+                    live = None  # Bot ocupado: fica com os valores do arquivo
+                if live and live[0] == 200:
+                    open_ops = live[1].get('open_operations', open_ops)
+
+        summary = operations_history.pnl_summary(since, days=None if since else PNL_DAYS)
+        open_pnl = sum(float(op.get('pnl') or 0) for op in open_ops)
+
+        # Saldo demo se disponível
+        demo_balance = None
+        if os.path.exists(DEMO_BALANCE_FILE):
+            with open(DEMO_BALANCE_FILE, 'r', encoding='utf-8') as f:
+                demo_balance = json.load(f).get('balance')
+
+        return {
+            "total_pnl": summary['pnl'],
+            "open_pnl": open_pnl,
+            "all_pnl": summary['pnl'] + open_pnl,
+            "total_operations": summary['winning_ops'] + summary['losing_ops'],
+            "winning_ops": summary['winning_ops'],
+            "losing_ops": summary['losing_ops'],
+            "win_rate": summary['win_rate'],
+            "demo_balance": demo_balance,
+            "since": since,
+            "reset_at": summary.get('reset_at'),
+            "by_symbol": summary['by_symbol'],
+            "by_side": summary['by_side'],
+            "by_day": summary['by_day'],
+        }
     except Exception as e:
-        return jsonify({
+        return {
             "total_pnl": 0.0,
             "open_pnl": 0.0,
             "all_pnl": 0.0,
@@ -664,77 +541,69 @@ def get_pnl():
             "win_rate": 0.0,
             "demo_balance": None,
             "error": str(e)
-        })
+        }
+
+@app.route('/api/pnl', methods=['GET'])
+def get_pnl():
+    """
+    PnL realizado + aberto, com rollups por símbolo, lado e dia.
+    ?since=YYYY-MM-DD | today | 7d limita à janela (baldes diários pré-calculados).
+    """
+    try:
+        since = parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({"error": "since inválido (use YYYY-MM-DD, today ou Nd)"}), 400
+    return jsonify(pnl_payload(since=since))
 
 @app.route('/api/close-operation/<int:operation_id>', methods=['POST'])
 def close_operation(operation_id):
     """Fecha uma operação manualmente pelo ID"""
     try:
-        # Importa função exit_position do bot
-        import davinci_bot
-        
-        # Verifica se operação existe e está aberta
-        if not os.path.exists('operations.json'):
-            return jsonify({"success": False, "message": "Arquivo operations.json não encontrado"}), 404
-        
-        with open('operations.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        # Encontra operação pelo ID
-        open_ops = data.get('open_operations', [])
-        operation = None
-        for op in open_ops:
-            if op.get('id') == operation_id and op.get('status') == 'open':
-                operation = op
-                break
-        
-        if not operation:
-            return jsonify({"success": False, "message": "Operação não encontrada ou já está fechada"}), 404
-        
-        # Verifica se está na mesma moeda que o bot está configurado
-        # Se não estiver, precisamos temporariamente mudar o SYMBOL do bot
-        original_symbol = davinci_bot.SYMBOL
+        # Bot em execução: o fechamento vai para o motor ao vivo pelo canal de controle
         try:
-            # Sincroniza estado global com operação encontrada
-            davinci_bot.SYMBOL = operation['symbol']
-            davinci_bot.in_position = True
-            davinci_bot.position_side = operation['side'].lower()
-            davinci_bot.entry_price = operation['entry_price']
-            
-            # Tenta parsear entry_time
-            try:
-                if 'entry_date' in operation and 'entry_time' in operation:
-                    entry_time_str = f"{operation['entry_date']} {operation['entry_time']}"
-                    from datetime import datetime
-                    davinci_bot.entry_time = datetime.strptime(entry_time_str, '%Y-%m-%d %H:%M')
-                else:
-                    davinci_bot.entry_time = None
-            except:
-                davinci_bot.entry_time = None
-            
-            # Chama exit_position com motivo manual
-            result = davinci_bot.exit_position(reason="Fechamento Manual pelo Usuário")
-            
-            # Restaura símbolo original
-            davinci_bot.SYMBOL = original_symbol
-            
-            if result:
-                return jsonify({
-                    "success": True,
-                    "message": f"Operação {operation['symbol']} {operation['side']} fechada com sucesso!",
-                    "pnl": result.get('pnl', 0)
-                })
-            else:
-                return jsonify({"success": False, "message": "Erro ao fechar operação"}), 500
-                
-        except Exception as e:
-            # Restaura símbolo original em caso de erro
-            davinci_bot.SYMBOL = original_symbol
-            return jsonify({"success": False, "message": str(e)}), 500
-        
+            response = bot_control.request('POST', '/close', {"id": operation_id})
+        except bot_control.NoResponse as e:
+            # O bot recebeu o comando e pode ter fechado: fechar aqui de novo duplicaria
+            return jsonify({"success": False, "message": f"O bot não respondeu a tempo ({e}). "
+                            "Confira as operações antes de tentar novamente."}), 504
+        if response is None:
+            if bot_supervisor.is_running():
+                return jsonify({"success": False, "message": "Bot em execução, mas o canal de controle "
+                                "não está disponível. Tente novamente em alguns segundos."}), 409
+            return close_operation_offline(operation_id)
+
+        status, result = response
+        if result.get('success'):
+            return jsonify({
+                "success": True,
+                "message": f"Operação {result.get('symbol')} {result.get('side')} fechada com sucesso!",
+                "pnl": result.get('pnl', 0)
+            })
+        return jsonify({"success": False, "message": result.get('message') or result.get('error', "Erro ao fechar operação")}), status
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+def close_operation_offline(operation_id):
+    """
+    Bot parado: fecha no próprio processo com operation_closer (mesma gravação do bot,
+    sem importar davinci_bot no Flask). Em modo LIVE a posição está na exchange: só o bot fecha.
+    """
+    if not load_config().get('USE_DEMO', True):
+        return jsonify({"success": False, "message": "Bot parado em modo LIVE: inicie o bot para "
+                        "fechar a posição na exchange"}), 409
+
+    def last_price(symbol):
+        return exchange_session.get_exchange().fetch_ticker(symbol)['last']
+
+    result, error = operation_closer.close_offline(operation_id, last_price)
+    if result:
+        return jsonify({
+            "success": True,
+            "message": f"Operação {result['symbol']} {result['side']} fechada com sucesso!",
+            "pnl": result.get('pnl', 0)
+        })
+    return jsonify({"success": False, "message": error}), 404 if 'não encontrada' in error else 500
+
 @app.route('/api/analyze', methods=['GET'])
 def analyze_market():
     """Endpoint para analisar todas as moedas e retornar oportunidades"""
@@ -744,13 +613,16 @@ def analyze_market():
         if timeframe not in ['3m', '5m', '15m', '30m', '1h']:
             return jsonify({"error": "Timeframe inválido. Use: 3m, 5m, 15m, 30m ou 1h"}), 400
         
-        results = analyze_all_symbols(timeframe)
+        # ?universe=all varre todos os perpétuos USDT (padrão: SUPPORTED_SYMBOLS)
+        symbols = 'all' if request.args.get('universe') == 'all' else None
+        results, scan = analyze_all_symbols(timeframe, symbols)
         
         return jsonify({
             "success": True,
             "timeframe": timeframe,
             "results": results,
-            "total_opportunities": len(results)
+            "total_opportunities": len(results),
+            "scan": scan
         })
         
     except Exception as e:
@@ -759,4 +631,4 @@ def analyze_market():
 if __name__ == '__main__':
     # Cria diretório templates se não existir
     os.makedirs('templates', exist_ok=True)
-    app.run(host='127.0.0.1', port=5000, debug=True)
+    app.run(host='127.0.0.1', port=5000, debug=True, threaded=True)  # threaded: uma conexão /api/stream por aba